@@ -1,24 +1,37 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS, cross_origin
 from dotenv import load_dotenv
 import googlemaps
 import os
 import json
+import base64
 from datetime import datetime
-import math
 import requests
 from bs4 import BeautifulSoup
 import re
-from urllib.parse import urlparse
 import logging
-import time
-import pandas as pd
-import base64
-from io import BytesIO
 import concurrent.futures
+import queue
+import threading
 from typing import List, Dict, Any
-import dns.resolver
-import smtplib
+from concurrency import bounded_imap, bounded_map, host_limiter, submit_in_context, MAPS_HOST, MAX_WORKERS
+from geocache import cached_geocode, cached_reverse_geocode, geocode_cache
+from geo import calculate_distance
+from place_cache import place_cache
+from pagination import PageTokenPending, pipelined_pages
+from crawler import crawler
+from mx_cache import mx_cache
+from postal_codes import get_pincode_from_address
+from candidates import CandidateSet
+from relevance import is_relevant_place, passes_prefilter
+from tiling import summarize_tiles, tiled_search
+from quota import maps_quota, parse_budget
+from maps_clients import maps_clients
+from list_store import ITEM_SORTS, list_store
+from export import RESULT_COLUMNS, export_base64, export_response
+from columnar import columnar_response, iter_saved_list_items
+from whatsapp import template_messages, whatsapp_dispatcher
+from templates import TemplateError, load_template
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,7 +40,8 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 load_dotenv()
-gmaps = googlemaps.Client(key=os.getenv('GOOGLE_MAPS_API_KEY'))
+
+gmaps = maps_clients.client()
 
 # Add these constants at the top of the file
 SAVE_DIRECTORIES = {
@@ -38,30 +52,12 @@ SAVE_DIRECTORIES = {
     'email': 'saved_lists'
 }
 
-def get_pincode_from_address(address):
-    """Extract pincode from an address string."""
-    pincode_match = re.search(r'\b\d{6}\b', address)
-    return pincode_match.group(0) if pincode_match else None
-
 def is_same_pincode(address1, address2):
     """Check if two addresses have the same pincode."""
     pincode1 = get_pincode_from_address(address1)
     pincode2 = get_pincode_from_address(address2)
     return pincode1 and pincode2 and pincode1 == pincode2
     
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth's radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-
-    a = math.sin(delta_phi/2) * math.sin(delta_phi/2) + \
-        math.cos(phi1) * math.cos(phi2) * \
-        math.sin(delta_lambda/2) * math.sin(delta_lambda/2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
 def get_search_keywords_for_indian_sweets():
     """Get specific keywords for searching Indian sweet shops."""
     return [
@@ -87,313 +83,256 @@ def get_excluded_types():
         'grocery_or_supermarket'
     ]
 
-def is_cake_shop(business_name, business_type, business_types):
-    """Check if a business is a cake shop based on its name, type description, and Google Place types"""
-    cake_shop_indicators = [
-        'cake', 'bakery', 'bake', 'pastry', 'patisserie',
-        'mio amore', 'monginis', 'ribbons and balloons',
-        'britannia', 'karachi bakery', 'snacks', 'canteen',
-        'cafe', 'coffee', 'tea', 'restaurant', 'hotel',
-        'catering', 'ice cream', 'gelato', 'frozen'
-    ]
-    
-    excluded_types = get_excluded_types()
-    
-    # Convert to lowercase for comparison
-    business_name = business_name.lower()
-    business_type = business_type.lower()
-    
-    # Check name and type description for cake shop indicators
-    has_cake_indicator = any(indicator in business_name or indicator in business_type 
-                           for indicator in cake_shop_indicators)
-    
-    # Check if any of the Google Place types match excluded types
-    has_excluded_type = any(excluded_type in business_types 
-                          for excluded_type in excluded_types)
-    
-    return has_cake_indicator or has_excluded_type
-
-def is_sweet_shop(business_name, business_type, business_types):
-    """Check if a business is a traditional Indian sweet shop"""
-    sweet_shop_indicators = [
-        'mithai', 'mishtan', 'mishtann', 
-        'halwai', 'confectioner',
-        'mistan', 'bhandar', 'bhog', 'naivedyam',
-        'bengali sweet', 'gujarati sweet',
-        'indian sweet', 'traditional sweet'
-    ]
-    
-    # Convert to lowercase for comparison
-    business_name = business_name.lower()
-    business_type = business_type.lower()
-    
-    # Check for sweet shop indicators
-    has_sweet_indicator = any(indicator in business_name or indicator in business_type 
-                            for indicator in sweet_shop_indicators)
-    
-    # Check if it's explicitly a sweet shop (but not a cake shop)
-    is_generic_sweet_shop = ('sweet' in business_name and 
-                           not is_cake_shop(business_name, business_type, business_types))
-    
-    return has_sweet_indicator or is_generic_sweet_shop
-
-def is_cake_shop(place):
-    cake_shop_indicators = [
-        'cake', 'bakery', 'bake', 'pastry', 'patisserie',
-        'mio amore', 'monginis', 'ribbons and balloons',
-        'britannia', 'karachi bakery', 'snacks', 'canteen',
-        'cafe', 'coffee', 'tea', 'restaurant', 'hotel',
-        'catering', 'ice cream', 'gelato', 'frozen'
-    ]
-    business_name = place.get('name', '').lower()
-    return any(indicator in business_name for indicator in cake_shop_indicators)
-
-def is_sweet_shop(place):
-    sweet_shop_indicators = [
-        'mithai', 'mishtan', 'mishtann', 
-        'halwai', 'confectioner',
-        'mistan', 'bhandar', 'bhog', 'naivedyam',
-        'bengali sweet', 'gujarati sweet',
-        'indian sweet', 'traditional sweet'
-    ]
-    business_name = place.get('name', '').lower()
-    return any(indicator in business_name for indicator in sweet_shop_indicators)
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371000  # Earth's radius in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-
-    a = math.sin(delta_phi/2) * math.sin(delta_phi/2) + \
-        math.cos(phi1) * math.cos(phi2) * \
-        math.sin(delta_lambda/2) * math.sin(delta_lambda/2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-def get_pincode_from_address(address):
-    """Extract pincode from an address string."""
-    import re
-    pincode_match = re.search(r'\b\d{6}\b', address)
-    return pincode_match.group(0) if pincode_match else None
-
-def is_same_pincode(address1, address2):
-    """Check if two addresses have the same pincode."""
-    pincode1 = get_pincode_from_address(address1)
-    pincode2 = get_pincode_from_address(address2)
-    return pincode1 and pincode2 and pincode1 == pincode2
-
-def search_places(keyword, location, radius_km=3, exact_pincode=False):
-    try:
-        # Initialize the Google Maps client
-        gmaps = googlemaps.Client(key=os.getenv('GOOGLE_MAPS_API_KEY'))
-        
-        print(f"Searching for '{keyword}' in '{location}' within {radius_km}km")
-        
-        # First, geocode the location to get coordinates
+def geocode_location(gmaps, location):
+    """Return (lat, lng) for a location string, or None if it can't be found."""
+    def lookup(location):
         geocode_result = gmaps.geocode(location)
         if not geocode_result:
-            print(f"Location not found: {location}")
-            return {'error': f'Location not found: {location}'}, 400
-        
-        lat = geocode_result[0]['geometry']['location']['lat']
-        lng = geocode_result[0]['geometry']['location']['lng']
-        
-        print(f"Location coordinates: {lat}, {lng}")
-        
-        # If exact_pincode is True, verify the pincode
-        if exact_pincode and location.isdigit():
-            location_pincode = get_pincode_from_coords(lat, lng)
-            if location_pincode != location:
-                return {'results': [], 'message': f'No results in exact pincode {location}'}
+            return None
+        coords = geocode_result[0]['geometry']['location']
+        return coords['lat'], coords['lng']
 
-        all_results = []
-        seen_places = set()  # To track unique places
+    return cached_geocode(location, lookup)
+
+def get_place_details(gmaps, place_id, fields):
+    """Place details for the given fields, fetching only those not already cached."""
+    return place_cache.get(place_id, fields,
+                           lambda place_id, missing: gmaps.place(place_id, fields=missing)['result'])
+
+# The details /api/search has always fetched for each nearby hit
+SEARCH_DETAILS_FIELDS = [
+    'name', 'formatted_address', 'formatted_phone_number',
+    'website', 'geometry', 'opening_hours'
+]
+
+def search_location_nearby(gmaps, keyword, location, lat, lng, radius, exact_pincode=False, candidates=None):
+    """
+    Yield the /api/search results for one geocoded location, in nearby-search order.
+
+    These are the calls /api/search has always made: one nearby-search page
+    and one details call per distinct place, only now the details calls run
+    concurrently. radius is in meters. With exact_pincode, only results whose
+    address is in the location's postal code are kept.
+    """
+    candidates = candidates if candidates is not None else CandidateSet(per_origin=True)
+    places_result = gmaps.places_nearby(location=(lat, lng), radius=radius, keyword=keyword)
+    fresh = candidates.add(places_result.get('results', []), location, lat, lng, 'nearby')
+
+    def build(candidate):
+        try:
+            return build_nearby_result(candidate.place_id, lat, lng, gmaps)
+        except Exception as e:
+            logging.error(f"Error processing place: {str(e)}")
+            return None
+
+    for result in bounded_imap(build, fresh, host=MAPS_HOST):
+        if result and (not exact_pincode or result.get('postal_code') == location):
+            yield result
+
+def build_nearby_result(place_id, lat, lng, gmaps):
+    """Fetch details for a nearby hit and build its /api/search result, measured from (lat, lng)."""
+    place_details = get_place_details(gmaps, place_id, SEARCH_DETAILS_FIELDS)
+
+    place_lat = place_details['geometry']['location']['lat']
+    place_lng = place_details['geometry']['location']['lng']
+
+    # Calculate distance in kilometers
+    distance = round(calculate_distance(lat, lng, place_lat, place_lng) / 1000, 2)
+
+    result = {
+        'business_name': place_details.get('name', ''),
+        'address': place_details.get('formatted_address', ''),
+        'phone': place_details.get('formatted_phone_number', ''),
+        'website': place_details.get('website', ''),
+        'distance': distance,
+        'google_maps_url': f"https://www.google.com/maps/place/?q=place_id:{place_id}",
+        'opening_hours': place_details.get('opening_hours', {}).get('weekday_text', [])
+    }
+
+    # Extract postal code from address
+    postal_code = get_pincode_from_address(result['address'])
+    if postal_code:
+        result['postal_code'] = postal_code
+    return result
+
+def search_location(gmaps, keyword, location, lat, lng, radius_km, exact_pincode=False, tiles=None,
+                    candidates=None):
+    """
+    Yield the thorough-search results for one geocoded location as their details resolve.
+
+    With exact_pincode, a postal code location only keeps the results whose
+    address is in that postal code, and none at all if the code itself
+    geocodes somewhere outside it.
+    """
+    if exact_pincode and location.isdigit():
+        location_pincode = get_pincode_from_coords(lat, lng)
+        if location_pincode != location:
+            print(f"No results in exact pincode {location}")
+            return
+
+    for result in iter_search_results(gmaps, keyword, location, lat, lng, radius_km, tiles, candidates):
+        if not exact_pincode or result.get('postal_code') == location:
+            yield result
+
+def iter_search_results(gmaps, keyword, location, lat, lng, radius_km, tiles=None, candidates=None):
+    """
+    Yield relevant results for a location as soon as their details resolve.
+
+    This is the thorough search: every nearby page plus a text search, with
+    the hits clipped to radius_km and checked for relevance to keyword.
+
+    The text search starts straight away, nearby-search pages are fetched in
+    a pipeline so page N is processed while page N+1's token matures, and the
+    details calls for each page run concurrently.
+
+    If tiles is a list, the nearby search covers the radius with an adaptive
+    tile plan instead of one query capped at 60 results, and the report for
+    every tile searched is appended to it.
+
+    Hits from every source go through one CandidateSet (pass your own to
+    read its report afterwards), so each place gets at most one details call.
+    """
+    candidates = candidates if candidates is not None else CandidateSet()
+
+    def next_nearby_page(token):
+        try:
+            return gmaps.places_nearby(location=(lat, lng), page_token=token)
+        except googlemaps.exceptions.ApiError as e:
+            # The API answers INVALID_REQUEST until the token becomes valid
+            if e.status == 'INVALID_REQUEST':
+                raise PageTokenPending(token)
+            raise
+
+    def search_tile(tile_lat, tile_lng, radius):
+        places = []
+        calls = 0
+        first_page = gmaps.places_nearby(location=(tile_lat, tile_lng), radius=radius, keyword=keyword)
+        for page in pipelined_pages(first_page, next_nearby_page):
+            calls += 1
+            places.extend(page.get('results', []))
+        return places, calls
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        # Second search: Text search for more results, started early so it
+        # overlaps the nearby pages but processed after them as before
+        text_search = submit_in_context(
+            executor,
+            gmaps.places,
+            query=f"{keyword} in {location}",
+            location=(lat, lng),
+            radius=radius_km * 1000
+        )
 
         # First search: Direct keyword search without type restriction
         try:
-            places_result = gmaps.places_nearby(
-                location=(lat, lng),
-                radius=radius_km * 1000,  # Convert km to meters
-                keyword=keyword
-            )
-            
-            if places_result.get('results'):
-                process_places_results(places_result['results'], keyword, lat, lng, radius_km, seen_places, all_results, gmaps)
-                
-            # Get next page of results if available
-            while 'next_page_token' in places_result:
-                time.sleep(2)  # Wait for next page token to become valid
+            if tiles is not None:
+                places, tile_report = tiled_search(lat, lng, radius_km * 1000, search_tile)
+                tiles.extend(tile_report)
+                yield from iter_places_results(places, keyword, location, lat, lng, radius_km, candidates, gmaps,
+                                               'nearby')
+            else:
                 places_result = gmaps.places_nearby(
                     location=(lat, lng),
-                    page_token=places_result['next_page_token']
+                    radius=radius_km * 1000,  # Convert km to meters
+                    keyword=keyword
                 )
-                if places_result.get('results'):
-                    process_places_results(places_result['results'], keyword, lat, lng, radius_km, seen_places, all_results, gmaps)
+                for page in pipelined_pages(places_result, next_nearby_page):
+                    yield from iter_places_results(page.get('results', []), keyword, location, lat, lng,
+                                                   radius_km, candidates, gmaps, 'nearby')
                     
         except Exception as e:
             print(f"Error in places search: {str(e)}")
 
-        # Second search: Text search for more results
         try:
-            text_results = gmaps.places(
-                query=f"{keyword} in {location}",
-                location=(lat, lng),
-                radius=radius_km * 1000
-            )
-            
-            if text_results.get('results'):
-                process_places_results(text_results['results'], keyword, lat, lng, radius_km, seen_places, all_results, gmaps)
+            text_results = text_search.result()
+            yield from iter_places_results(text_results.get('results', []), keyword, location, lat, lng,
+                                           radius_km, candidates, gmaps, 'text')
                 
         except Exception as e:
             print(f"Error in text search: {str(e)}")
-            
-        print(f"Found {len(all_results)} results")
-        
-        # Sort results by distance
-        all_results.sort(key=lambda x: x['distance'])
-        
-        return {
-            'results': all_results,
-            'location': location,
-            'total': len(all_results)
-        }
-        
-    except Exception as e:
-        print(f"Error in search_places: {str(e)}")
-        return {'error': str(e)}, 500
 
-def process_places_results(places, keyword, lat, lng, radius_km, seen_places, all_results, gmaps):
-    """Process and filter places results."""
-    for place in places:
+def iter_places_results(places, keyword, location, lat, lng, radius_km, candidates, gmaps, source='nearby'):
+    """
+    Filter places results and yield them as their details calls complete.
+
+    Only places that are new to candidates, within radius_km and not ruled
+    out by the name and types in the search hit itself get a details call;
+    the details then confirm relevance.
+    """
+    fresh = candidates.add(places, location, lat, lng, source, radius_km,
+                           prefilter=lambda place: passes_prefilter(place, keyword))
+
+    def build(candidate):
         try:
-            place_id = place.get('place_id')
-            
-            # Skip if we've seen this place
-            if not place_id or place_id in seen_places:
-                continue
-            seen_places.add(place_id)
-            
-            # Calculate distance
-            place_lat = place['geometry']['location']['lat']
-            place_lng = place['geometry']['location']['lng']
-            distance = calculate_distance(lat, lng, place_lat, place_lng)
-            
-            # Skip if beyond radius
-            if distance > radius_km:
-                continue
-            
-            # Get detailed place information
-            place_details = gmaps.place(place_id, fields=[
-                'name', 'formatted_address', 'formatted_phone_number',
-                'website', 'business_status', 'types', 'url', 'rating',
-                'user_ratings_total', 'opening_hours'
-            ])['result']
-            
-            # Check if the place matches the search criteria
-            if not is_relevant_place(place_details, keyword):
-                continue
-            
-            result = {
-                'name': place_details.get('name', ''),
-                'address': place_details.get('formatted_address', ''),
-                'phone': place_details.get('formatted_phone_number', ''),
-                'website': place_details.get('website', ''),
-                'business_status': place.get('business_status', 'unknown'),
-                'distance': round(distance * 1000),  # Convert to meters
-                'google_maps_url': place_details.get('url', ''),
-                'place_id': place_id,
-                'types': place_details.get('types', []),
-                'rating': place_details.get('rating'),
-                'user_ratings_total': place_details.get('user_ratings_total'),
-                'opening_hours': place_details.get('opening_hours', {}).get('weekday_text', [])
-            }
-            
-            all_results.append(result)
-            
+            return build_place_result(candidate.place, candidate.origin[3], keyword, gmaps)
         except Exception as e:
             print(f"Error processing place: {str(e)}")
-            continue
+            return None
 
-def is_relevant_place(place_details, keyword):
+    for result in bounded_imap(build, fresh, host=MAPS_HOST):
+        if result:
+            yield result
+
+def build_place_result(place, distance, keyword, gmaps):
     """
-    Determine if a place is relevant to the search keyword.
-    Uses Google Places types and name matching.
+    Fetch details for a place and build its /api/search result, or None if it
+    isn't relevant. distance is in kilometers.
     """
-    if not place_details:
-        return False
-        
-    keyword_lower = keyword.lower()
-    name = place_details.get('name', '').lower()
-    types = place_details.get('types', [])
+    place_id = place['place_id']
+
+    # Get detailed place information
+    place_details = get_place_details(gmaps, place_id, [
+        'name', 'formatted_address', 'formatted_phone_number',
+        'website', 'business_status', 'types', 'rating',
+        'user_ratings_total', 'opening_hours'
+    ])
     
-    # Direct name match
-    if keyword_lower in name:
-        return True
-    
-    # Check if the keyword is a business type
-    if keyword_lower in types:
-        return True
+    # Check if the place matches the search criteria
+    if not is_relevant_place(place_details, keyword):
+        return None
     
-    # Common business type mappings
-    type_mappings = {
-        'school': ['school', 'primary_school', 'secondary_school', 'education'],
-        'college': ['university', 'college', 'education'],
-        'hospital': ['hospital', 'doctor', 'health', 'medical_care'],
-        'restaurant': ['restaurant', 'food', 'meal_delivery', 'meal_takeaway'],
-        'shop': ['store', 'shop', 'shopping_mall', 'retail'],
-        'cafe': ['cafe', 'restaurant', 'food', 'coffee'],
-        'gym': ['gym', 'health', 'fitness_center'],
-        'hotel': ['lodging', 'hotel', 'resort'],
-        'bank': ['bank', 'finance', 'atm'],
-        'pharmacy': ['pharmacy', 'drugstore', 'health'],
-        'market': ['market', 'grocery_or_supermarket', 'store'],
-        'salon': ['beauty_salon', 'hair_care', 'spa'],
-        'dentist': ['dentist', 'health', 'doctor'],
-        'park': ['park', 'amusement_park', 'tourist_attraction'],
-        'library': ['library', 'book_store', 'education'],
-        'cinema': ['movie_theater', 'entertainment'],
-        'mall': ['shopping_mall', 'store', 'retail'],
-        'temple': ['hindu_temple', 'place_of_worship', 'religious'],
-        'church': ['church', 'place_of_worship', 'religious'],
-        'mosque': ['mosque', 'place_of_worship', 'religious']
+    result = {
+        'business_name': place_details.get('name', ''),
+        'address': place_details.get('formatted_address', ''),
+        'phone': place_details.get('formatted_phone_number', ''),
+        'website': place_details.get('website', ''),
+        'business_status': place.get('business_status', 'unknown'),
+        'distance': round(distance, 2),
+        'google_maps_url': f"https://www.google.com/maps/place/?q=place_id:{place_id}",
+        'place_id': place_id,
+        'types': place_details.get('types', []),
+        'rating': place_details.get('rating'),
+        'user_ratings_total': place_details.get('user_ratings_total'),
+        'opening_hours': place_details.get('opening_hours', {}).get('weekday_text', [])
     }
-    
-    # Check if any of the place's types match our mapped types
-    for key, mapped_types in type_mappings.items():
-        if keyword_lower in key or key in keyword_lower:
-            return any(t in types for t in mapped_types)
-    
-    # If no specific mapping, check if it's a valid business
-    return 'establishment' in types and (
-        keyword_lower in name or
-        any(keyword_lower in t for t in types)
-    )
+
+    # Extract postal code from address
+    postal_code = get_pincode_from_address(result['address'])
+    if postal_code:
+        result['postal_code'] = postal_code
+    return result
 
 def get_pincode_from_coords(lat, lng):
     """
     Get pincode from coordinates using reverse geocoding
     """
     try:
-        gmaps = googlemaps.Client(key=os.getenv('GOOGLE_MAPS_API_KEY'))
-        result = gmaps.reverse_geocode((lat, lng))
-        
-        for component in result[0]['address_components']:
-            if 'postal_code' in component['types']:
-                return component['long_name']
-        return None
+        def lookup(lat, lng):
+            gmaps = maps_clients.client()
+            result = gmaps.reverse_geocode((lat, lng))
+            
+            for component in result[0]['address_components']:
+                if 'postal_code' in component['types']:
+                    return component['long_name']
+            return None
+
+        return cached_reverse_geocode(lat, lng, lookup)
     except Exception as e:
         print(f"Error getting pincode: {str(e)}")
         return None
 
 def extract_pincode(address: str) -> str:
-    # First try to find a 6-digit number in the address
-    import re
-    pincode_match = re.search(r'\b\d{6}\b', address)
-    if pincode_match:
-        return pincode_match.group(0)
-    return ''
+    return get_pincode_from_address(address) or ''
 
 def verify_email(email: str, domain: str) -> float:
     """Verify email and return confidence score."""
@@ -402,14 +341,14 @@ def verify_email(email: str, domain: str) -> float:
         if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
             return 0.0
 
-        # Verify domain has MX records
-        mx_records = dns.resolver.resolve(domain, 'MX')
+        # Verify domain has MX records (cached per domain for the record's TTL)
+        mx_records = mx_cache.lookup(domain)
         if not mx_records:
             return 0.0
 
         # SMTP verification (optional, commented out to avoid being blocked)
         # import smtplib
-        # server = smtplib.SMTP(mx_records[0].exchange.to_text())
+        # server = smtplib.SMTP(mx_records[0])
         # server.verify(email)
         # server.quit()
 
@@ -418,6 +357,17 @@ def verify_email(email: str, domain: str) -> float:
         print(f"Email verification error for {email}: {str(e)}")
         return 0.0
 
+def verify_emails(emails: List[tuple]) -> List[float]:
+    """
+    Verify many (email, domain) pairs and return their confidence scores.
+
+    The MX records of every distinct domain are resolved concurrently up
+    front, so each domain costs a single lookup however many addresses
+    share it.
+    """
+    mx_cache.resolve_many(domain for _, domain in emails)
+    return [verify_email(email, domain) for email, domain in emails]
+
 def find_personal_emails(domain: str) -> List[Dict[str, Any]]:
     personal_emails = []
     seen_emails = set()
@@ -625,8 +575,8 @@ def find_generic_emails(domain: str) -> List[Dict[str, Any]]:
     ]
     
     try:
-        for email, base_confidence in patterns:
-            verified = verify_email(email, domain)
+        scores = verify_emails([(email, domain) for email, _ in patterns])
+        for (email, base_confidence), verified in zip(patterns, scores):
             if verified > 0:
                 generic_emails.append({
                     "email": email,
@@ -666,39 +616,20 @@ def save_leads():
         if not leads:
             return jsonify({'error': 'No leads provided'}), 400
             
-        # Create timestamp for filename
+        # Create timestamp for the default name
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        # Create filename based on category and timestamp
         if not name:
             name = f"search_{category}_{timestamp}"
-        filename = f"{name}.json"
         
-        # Ensure the saved_lists directory exists
-        os.makedirs('saved_lists', exist_ok=True)
-        
-        # Create the full filepath
-        filepath = os.path.join('saved_lists', filename)
-        
-        # Add metadata to the save
-        save_data = {
-            'id': filename.replace('.json', ''),
-            'name': name,
-            'searchTerm': data.get('searchTerm', ''),
-            'locations': data.get('locations', []),
-            'createdAt': datetime.now().isoformat(),
-            'results': leads,
-            'category': category,
-            'count': len(leads)
-        }
-        
-        # Save the data
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, indent=2, ensure_ascii=False)
+        # A list saved again under the same name replaces the old one
+        list_id = name
+        list_store.save(list_id, name, leads, search_term=data.get('searchTerm', ''),
+                        locations=data.get('locations', []), category=category)
             
         return jsonify({
             'message': 'Leads saved successfully',
-            'filepath': filepath,
+            'id': list_id,
             'count': len(leads)
         })
         
@@ -706,6 +637,7 @@ def save_leads():
         logging.error(f"Error in save_leads: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+
 @app.route('/api/search', methods=['GET'])
 @cross_origin()
 def search():
@@ -714,90 +646,227 @@ def search():
         locations = json.loads(request.args.get('locations', '[]'))
         radius = int(request.args.get('radius', 3000))  # Default 3km
         exact_pincode_search = request.args.get('exactPincodeSearch', 'false').lower() == 'true'
+        # Cover each radius with adaptive tiles instead of one 60-result query
+        tiled = request.args.get('tiled', 'false').lower() == 'true'
+        # Every nearby page plus a text search, kept to the radius and to
+        # places relevant to the query; tiling needs every page, so implies it
+        thorough = tiled or request.args.get('thorough', 'false').lower() == 'true'
+        # Optional cap on Maps calls for this search, e.g. {"details": 40}
+        budget = parse_budget(request.args.get('budget'))
         
         if not search_term or not locations:
             return jsonify({"error": "Search term and locations are required"}), 400
 
-        results = []
-        gmaps = googlemaps.Client(key=os.getenv('GOOGLE_MAPS_API_KEY'))
-        
-        for location in locations:
-            # Get location coordinates
-            geocode_result = gmaps.geocode(location)
-            if not geocode_result:
-                continue
-                
-            lat = geocode_result[0]['geometry']['location']['lat']
-            lng = geocode_result[0]['geometry']['location']['lng']
-            
-            # Search for places
-            places_result = gmaps.places_nearby(
-                location=(lat, lng),
-                radius=radius,
-                keyword=search_term
-            )
-            
-            seen_places = set()
-            
-            # Process results
-            if 'results' in places_result:
-                for place in places_result['results']:
-                    try:
-                        # Get place details
-                        place_id = place['place_id']
-                        if place_id in seen_places:
-                            continue
-                            
-                        seen_places.add(place_id)
-                        
-                        place_details = gmaps.place(place_id, fields=[
-                            'name', 'formatted_address', 'formatted_phone_number',
-                            'website', 'geometry', 'opening_hours'
-                        ])['result']
+        tiles = [] if tiled else None
+        candidates = CandidateSet(per_origin=exact_pincode_search or not thorough)
+        with maps_quota.budget(**budget):
+            results = run_search(search_term, locations, radius, exact_pincode_search, candidates, tiles,
+                                 thorough)
 
-                        place_lat = place_details['geometry']['location']['lat']
-                        place_lng = place_details['geometry']['location']['lng']
-                        
-                        # Calculate distance in kilometers
-                        distance = round(calculate_distance(lat, lng, place_lat, place_lng) / 1000, 2)
-                        
-                        result = {
-                            'business_name': place_details.get('name', ''),
-                            'address': place_details.get('formatted_address', ''),
-                            'phone': place_details.get('formatted_phone_number', ''),
-                            'website': place_details.get('website', ''),
-                            'distance': distance,
-                            'google_maps_url': f"https://www.google.com/maps/place/?q=place_id:{place_id}",
-                            'opening_hours': place_details.get('opening_hours', {}).get('weekday_text', [])
-                        }
-                        
-                        # Extract postal code from address
-                        postal_code = get_pincode_from_address(result['address'])
-                        if postal_code:
-                            result['postal_code'] = postal_code
-                        
-                        # Only add if exact pincode search is off or if pincode matches
-                        if not exact_pincode_search:
-                            results.append(result)
-                        elif postal_code and location == postal_code:
-                            results.append(result)
-                        
-                    except Exception as place_error:
-                        logging.error(f"Error processing place: {str(place_error)}")
-                        continue
-        
-        # Sort results by distance
-        results.sort(key=lambda x: x['distance'])
-        
-        return jsonify({
+        response = {
             'results': results,
             'next_page_token': None  # We'll implement pagination later if needed
-        })
+        }
+        if thorough:
+            response['candidates'] = candidates.report()
+        if tiled:
+            response['tiles'] = tiles
+            response['tiling'] = summarize_tiles(tiles)
+        return jsonify(response)
         
     except Exception as e:
         logging.error(f"Error in search: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def run_search(search_term, locations, radius, exact_pincode_search, candidates=None, tiles=None, thorough=False):
+    """
+    Search every location and return the results sorted by distance.
+
+    The locations are geocoded and searched concurrently. By default each
+    location gets one nearby page and a details call per place, as
+    /api/search always has. With thorough (implied by tiles), each
+    location's nearby pages are fetched in a pipeline alongside a text
+    search, hits are kept to the radius and to places relevant to the
+    search term, and a place found from several locations is kept once.
+    Pass a CandidateSet as candidates to read its report afterwards. If
+    tiles is a list, each nearby search is tiled and the report for every
+    tile is appended to it.
+    """
+    gmaps = maps_clients.client()
+    thorough = thorough or tiles is not None
+    if candidates is None:
+        candidates = CandidateSet(per_origin=exact_pincode_search or not thorough)
+
+    coordinates = bounded_map(lambda location: geocode_location(gmaps, location),
+                              locations, host=MAPS_HOST)
+    located = [(location, coords) for location, coords in zip(locations, coordinates) if coords]
+
+    def search_one(item):
+        location, (lat, lng) = item
+        if thorough:
+            return list(search_location(gmaps, search_term, location, lat, lng, radius / 1000,
+                                        exact_pincode_search, tiles, candidates))
+        return list(search_location_nearby(gmaps, search_term, location, lat, lng, radius,
+                                           exact_pincode_search, candidates))
+
+    # No host here: the searches take their own Maps slots for each call
+    found = bounded_map(search_one, located)
+
+    results = []
+    seen = set()
+    for location_results in found:
+        if not thorough:
+            results.extend(location_results)
+            continue
+        # A place found from several pincodes is kept once, measured from the one it's in
+        for result in location_results:
+            if result['place_id'] not in seen:
+                seen.add(result['place_id'])
+                results.append(result)
+    
+    # Sort results by distance
+    results.sort(key=lambda x: x['distance'])
+    return results
+
+def stream_search(search_term, locations, radius, exact_pincode_search, candidates=None, tiles=None,
+                  thorough=False):
+    """
+    Run a search and yield (event, data) pairs as the work completes.
+
+    Emits a 'progress' event as each location is geocoded, searched and
+    finished, a 'result' event for every business as soon as its details
+    resolve (the results of run_search, but unsorted), and a final
+    'summary' event with the totals. thorough and tiles work as in
+    run_search, and tiles adds the tiling totals to the summary. Every
+    location is searched on its own thread; if the caller stops reading,
+    the searches stop after the details calls already in flight.
+    """
+    gmaps = maps_clients.client()
+    thorough = thorough or tiles is not None
+    if candidates is None:
+        candidates = CandidateSet(per_origin=exact_pincode_search or not thorough)
+    events = queue.Queue()
+    stopped = threading.Event()
+
+    def search_one(location):
+        try:
+            with host_limiter.slot(MAPS_HOST):
+                coords = geocode_location(gmaps, location)
+            if not coords:
+                events.put(('progress', {'location': location, 'stage': 'not_found'}))
+                return
+            events.put(('progress', {'location': location, 'stage': 'geocoded'}))
+            found = 0
+            if thorough:
+                results = search_location(gmaps, search_term, location, *coords, radius / 1000,
+                                          exact_pincode_search, tiles, candidates)
+            else:
+                results = search_location_nearby(gmaps, search_term, location, *coords, radius,
+                                                 exact_pincode_search, candidates)
+            for result in results:
+                if stopped.is_set():
+                    return
+                events.put(('result', result))
+                found += 1
+            events.put(('progress', {'location': location, 'stage': 'done', 'results': found}))
+        except Exception as e:
+            print(f"Error searching {location}: {str(e)}")
+            events.put(('progress', {'location': location, 'stage': 'error', 'error': str(e)}))
+        finally:
+            events.put(None)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(locations))))
+    try:
+        for location in locations:
+            submit_in_context(executor, search_one, location)
+        remaining = len(locations)
+        total = 0
+        seen = set()
+        while remaining:
+            item = events.get()
+            if item is None:
+                remaining -= 1
+                continue
+            event, data = item
+            if event == 'result':
+                if thorough:
+                    if data['place_id'] in seen:
+                        continue
+                    seen.add(data['place_id'])
+                total += 1
+            yield event, data
+
+        summary = {
+            'total': total,
+            'locations': len(locations),
+            'next_page_token': None,
+            'candidates': candidates.report()
+        }
+        if tiles is not None:
+            summary['tiling'] = summarize_tiles(tiles)
+        yield 'summary', summary
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/search/stream', methods=['GET'])
+@cross_origin()
+def search_stream():
+    search_term = request.args.get('query', '')
+    locations = json.loads(request.args.get('locations', '[]'))
+    radius = int(request.args.get('radius', 3000))
+    exact_pincode_search = request.args.get('exactPincodeSearch', 'false').lower() == 'true'
+    tiled = request.args.get('tiled', 'false').lower() == 'true'
+    thorough = tiled or request.args.get('thorough', 'false').lower() == 'true'
+    budget = parse_budget(request.args.get('budget'))
+
+    if not search_term or not locations:
+        return jsonify({"error": "Search term and locations are required"}), 400
+
+    def generate():
+        try:
+            with maps_quota.budget(**budget):
+                for event, data in stream_search(search_term, locations, radius, exact_pincode_search,
+                                                 tiles=[] if tiled else None, thorough=thorough):
+                    yield sse_event(event, data)
+        except Exception as e:
+            logging.error(f"Error in search stream: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/geocode-cache/stats', methods=['GET'])
+@cross_origin()
+def get_geocode_cache_stats():
+    return jsonify(geocode_cache.get_stats())
+
+@app.route('/api/place-cache/stats', methods=['GET'])
+@cross_origin()
+def get_place_cache_stats():
+    return jsonify(place_cache.get_stats())
+
+@app.route('/api/maps-clients/stats', methods=['GET'])
+@cross_origin()
+def get_maps_client_stats():
+    return jsonify(maps_clients.get_stats())
+
+@app.route('/api/maps-quota/stats', methods=['GET'])
+@cross_origin()
+def get_maps_quota_stats():
+    return jsonify(maps_quota.get_stats())
+
+@app.route('/api/mx-cache/stats', methods=['GET'])
+@cross_origin()
+def get_mx_cache_stats():
+    return jsonify(mx_cache.get_stats())
+
 @app.route('/api/find-email', methods=['POST'])
 @cross_origin()
 def find_email():
@@ -813,7 +882,7 @@ def find_email():
             website = 'https://' + website
 
         try:
-            response = requests.get(website, timeout=10)
+            response = crawler.get(website, timeout=10)
             html_content = response.text
             
             # Regular expressions for finding emails
@@ -851,60 +920,55 @@ def export_excel():
     try:
         data = request.json
         results = data.get('results', [])
+        fmt = data.get('format', request.args.get('format', 'xlsx'))
+        # The file itself as an attachment; without this the response is the
+        # original {"status", "file" (base64), "filename"} JSON
+        download = str(data.get('download', request.args.get('download', 'false'))).lower() == 'true'
         
         if not results:
             return jsonify({"error": "No data to export"}), 400
 
-        # Create a pandas DataFrame
-        df = pd.DataFrame(results)
-        
-        # Reorder and rename columns
-        columns = {
-            'business_name': 'Business Name',
-            'address': 'Address',
-            'phone': 'Phone',
-            'website': 'Website',
-            'email': 'Email',
-            'distance': 'Distance (m)',
-            'status': 'Status',
-            'google_maps_url': 'Google Maps URL'
-        }
-        
-        df = df.reindex(columns=list(columns.keys()))
-        df = df.rename(columns=columns)
-        
-        # Convert distance to kilometers
-        df['Distance (m)'] = df['Distance (m)'].apply(lambda x: f"{x/1000:.2f} km")
-        
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Search Results', index=False)
-            
-            # Auto-adjust columns' width
-            worksheet = writer.sheets['Search Results']
-            for idx, col in enumerate(df.columns):
-                series = df[col]
-                max_len = max(
-                    series.astype(str).apply(len).max(),
-                    len(str(series.name))
-                ) + 2
-                worksheet.set_column(idx, idx, max_len)
-
-        output.seek(0)
-        
-        # Convert to base64
-        excel_b64 = base64.b64encode(output.read()).decode()
-        
-        return jsonify({
-            "status": "success",
-            "file": excel_b64,
-            "filename": f"lead_getter_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        })
+        filename = f"lead_getter_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if download:
+            return export_response(results, RESULT_COLUMNS, fmt, filename)
+        return jsonify(export_base64(results, RESULT_COLUMNS, fmt, filename))
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/saved-lists/<list_id>/export', methods=['GET'])
+@cross_origin()
+def export_saved_list(list_id):
+    """Download a saved list straight from the store as xlsx, csv or ndjson."""
+    try:
+        fmt = request.args.get('format', 'xlsx')
+        if list_store.get_summary(list_id) is None:
+            return jsonify({'error': 'List not found'}), 404
+        return export_response(list_store.iter_items(list_id), RESULT_COLUMNS, fmt, list_id)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error in export_saved_list: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/columnar-export', methods=['GET'])
+@cross_origin()
+def columnar_export():
+    """Saved lists as typed Parquet or Arrow; see columnar.py for since and the watermark."""
+    try:
+        fmt = request.args.get('format', 'parquet')
+        records = iter_saved_list_items(list_store, request.args.get('since'), request.args.get('list_id'))
+        return columnar_response(records, fmt, f"saved_lists_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error in columnar_export: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/save-list', methods=['POST'])
 @cross_origin()
 def save_list():
@@ -925,19 +989,7 @@ def save_list():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         list_id = f"{name}_{timestamp}"
         
-        # Save the list to a JSON file
-        list_data = {
-            'id': list_id,
-            'name': name,
-            'searchTerm': search_term,
-            'locations': locations,
-            'results': results,
-            'createdAt': datetime.now().isoformat()
-        }
-        
-        filename = f"saved_lists/{list_id}.json"
-        with open(filename, 'w') as f:
-            json.dump(list_data, f, indent=2)
+        list_store.save(list_id, name, results, search_term=search_term, locations=locations)
         
         return jsonify({
             'message': 'List saved successfully',
@@ -951,48 +1003,92 @@ def save_list():
 @cross_origin()
 def get_saved_lists():
     try:
-        # Ensure the saved_lists directory exists
-        if not os.path.exists('saved_lists'):
-            os.makedirs('saved_lists')
-            return jsonify([])
-
-        saved_lists = []
-        for filename in os.listdir('saved_lists'):
-            if filename.endswith('.json'):
-                try:
-                    with open(os.path.join('saved_lists', filename), 'r', encoding='utf-8') as f:
-                        list_data = json.load(f)
-                        # Add filename as id if not present
-                        if 'id' not in list_data:
-                            list_data['id'] = filename.replace('.json', '')
-                        # Add createdAt if not present
-                        if 'createdAt' not in list_data:
-                            list_data['createdAt'] = datetime.fromtimestamp(
-                                os.path.getctime(os.path.join('saved_lists', filename))
-                            ).isoformat()
-                        saved_lists.append(list_data)
-                except json.JSONDecodeError as je:
-                    logging.error(f"Error decoding JSON from {filename}: {str(je)}")
-                    continue
-                except Exception as e:
-                    logging.error(f"Error reading file {filename}: {str(e)}")
-                    continue
-
-        # Sort by creation date, newest first
-        saved_lists.sort(key=lambda x: x.get('createdAt', ''), reverse=True)
-        return jsonify(saved_lists)
+        # Metadata and counts only; a list's results come from /api/saved-lists/<list_id>/items
+        return jsonify(list_store.overview())
 
     except Exception as e:
         logging.error(f"Error in get_saved_lists: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/saved-lists/<list_id>', methods=['GET'])
+@cross_origin()
+def get_saved_list(list_id):
+    try:
+        saved_list = list_store.get(list_id)
+        if saved_list is None:
+            return jsonify({'error': 'List not found'}), 404
+        return jsonify(saved_list)
+
+    except Exception as e:
+        logging.error(f"Error in get_saved_list: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+SAVED_ITEM_PAGE_SIZE = 50
+SAVED_ITEM_MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('Invalid cursor')
+    return values
+
+def saved_item_filters(args):
+    """list_store.item_filters() arguments for the item filters in the query string."""
+    return {
+        'has_website': args.get('hasWebsite', 'false').lower() == 'true',
+        'has_email': args.get('hasEmail', 'false').lower() == 'true',
+        'postal_code': args.get('postalCode') or None,
+        'status': args.get('status') or None,
+        'min_distance': float(args['minDistance']) if args.get('minDistance') else None,
+        'max_distance': float(args['maxDistance']) if args.get('maxDistance') else None
+    }
+
+@app.route('/api/saved-lists/<list_id>/items', methods=['GET'])
+@cross_origin()
+def get_saved_list_items(list_id):
+    """
+    One page of a saved list, filtered and sorted in the database.
+
+    Takes the same parameters as the backend's items endpoint: sort is one of
+    list_store.ITEM_SORTS (saved order, 'oldest', by default), the filters
+    are hasWebsite, hasEmail, postalCode, status, minDistance and maxDistance
+    (km), and cursor is the previous page's nextCursor. The first page also
+    carries the filtered total.
+    """
+    try:
+        sort = request.args.get('sort', 'oldest')
+        if sort not in ITEM_SORTS:
+            return jsonify({'error': f'Unknown sort {sort}'}), 400
+        limit = min(max(int(request.args.get('limit', SAVED_ITEM_PAGE_SIZE)), 1), SAVED_ITEM_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        filters = saved_item_filters(request.args)
+
+        # One extra item says whether there is a next page
+        page = list_store.find_items(list_id, sort, decode_cursor(cursor) if cursor else None, limit + 1,
+                                     **filters)
+        next_cursor = encode_cursor(list(page[limit - 1][0])) if len(page) > limit else None
+        response = {'items': [item for _, item in page[:limit]], 'nextCursor': next_cursor, 'sort': sort}
+        if not cursor:
+            response['total'] = list_store.count_items(list_id, **filters)
+        return jsonify(response)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error in get_saved_list_items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/saved-lists/<list_id>', methods=['DELETE'])
 @cross_origin()
 def delete_saved_list(list_id):
     try:
-        filename = f"saved_lists/{list_id}.json"
-        if os.path.exists(filename):
-            os.remove(filename)
+        if list_store.delete(list_id):
             return jsonify({'message': 'List deleted successfully'})
         else:
             return jsonify({'error': 'List not found'}), 404
@@ -1004,20 +1100,7 @@ def delete_saved_list(list_id):
 @cross_origin()
 def get_lists():
     try:
-        # Create the directory if it doesn't exist
-        os.makedirs('saved_lists', exist_ok=True)
-        
-        lists = []
-        # List all JSON files in the saved_lists directory
-        for filename in os.listdir('saved_lists'):
-            if filename.endswith('.json'):
-                list_id = filename[:-5]  # Remove .json extension
-                lists.append({
-                    'id': list_id,
-                    'name': list_id.replace('_', ' ').title()
-                })
-        
-        return jsonify(lists)
+        return jsonify(list_store.names())
     except Exception as e:
         logging.error(f"Error getting lists: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -1048,90 +1131,41 @@ def update_whatsapp_config():
 def send_whatsapp():
     try:
         data = request.json
-        print(f"Received request data: {data}")  # Debug log
-        
         numbers = data.get('numbers', [])
         message = data.get('message', '')
         sender_number = data.get('senderNumber', '')
 
         if not numbers or not message or not sender_number:
-            print(f"Missing fields - numbers: {bool(numbers)}, message: {bool(message)}, sender: {bool(sender_number)}")
             return jsonify({'error': 'Missing required fields'}), 400
 
         if not whatsapp_config['token']:
-            print("WhatsApp token not configured")
             return jsonify({'error': 'WhatsApp token not configured'}), 400
 
-        # Send messages using WhatsApp Business API
-        headers = {
-            'Authorization': f'Bearer {whatsapp_config["token"]}',
-            'Content-Type': 'application/json'
-        }
-        print(f"Using headers: {headers}")  # Debug log (token partially masked)
-
-        results = []
-        for number in numbers:
-            try:
-                # Clean the phone number - ensure it starts with country code
-                cleaned_number = ''.join(filter(str.isdigit, number))
-                if not cleaned_number.startswith('91'):  # Add country code if missing
-                    cleaned_number = '91' + cleaned_number
-                
-                if len(cleaned_number) != 12:  # Expected format: 91XXXXXXXXXX
-                    print(f"Invalid number format: {cleaned_number}")
-                    results.append({
-                        'number': number,
-                        'status': 'failed',
-                        'error': 'Invalid phone number format - must be 10 digits with country code 91'
-                    })
-                    continue
-
-                # WhatsApp API endpoint
-                url = f'https://graph.facebook.com/v17.0/{sender_number}/messages'
-                print(f"Sending to URL: {url}")  # Debug log
-                
-                payload = {
-                    'messaging_product': 'whatsapp',
-                    'to': cleaned_number,
-                    'type': 'text',
-                    'text': {'body': message}
-                }
-                print(f"Request payload: {payload}")  # Debug log
-
-                response = requests.post(url, headers=headers, json=payload)
-                response_data = response.json()
-                print(f"API Response: {response_data}")  # Debug log
-                
-                if response.status_code == 200:
-                    results.append({
-                        'number': number,
-                        'status': 'success',
-                        'message_id': response_data.get('messages', [{}])[0].get('id', 'unknown')
-                    })
-                else:
-                    error_message = response_data.get('error', {}).get('message', 'Unknown error')
-                    print(f"API Error: {error_message}")
-                    results.append({
-                        'number': number,
-                        'status': 'failed',
-                        'error': error_message
-                    })
-
-            except Exception as e:
-                print(f"Exception while sending message: {str(e)}")
-                results.append({
-                    'number': number,
-                    'status': 'failed',
-                    'error': str(e)
-                })
-
+        # Queued in the outbox and sent in the background; progress is polled
+        # from /api/whatsapp-campaigns/<id>
+        campaign_id = whatsapp_dispatcher.submit(sender_number, whatsapp_config['token'], numbers, message)
         return jsonify({
-            'message': 'Messages processed',
-            'results': results
-        })
+            'message': 'Campaign queued',
+            'campaignId': campaign_id,
+            'campaign': whatsapp_dispatcher.get(campaign_id)
+        }), 202
 
     except Exception as e:
-        print(f"Global exception in send_whatsapp: {str(e)}")
+        logging.error(f"Error in send_whatsapp: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/whatsapp-campaigns/<campaign_id>', methods=['GET'])
+def get_whatsapp_campaign(campaign_id):
+    try:
+        # Picks up campaigns left unfinished by a restart
+        whatsapp_dispatcher.start()
+        details = request.args.get('details', '').lower() in ('1', 'true', 'yes')
+        campaign = whatsapp_dispatcher.get(campaign_id, details=details)
+        if campaign is None:
+            return jsonify({'error': 'Campaign not found'}), 404
+        return jsonify(campaign)
+    except Exception as e:
+        logging.error(f"Error getting WhatsApp campaign: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/email-templates', methods=['GET'])
@@ -1155,18 +1189,41 @@ def save_email_template():
 
 @app.route('/api/send-emails', methods=['POST'])
 def send_emails():
+    """
+    Render an email template's subject and content for each recipient.
+
+    There is no email delivery in this app, so nothing is sent: the
+    response is 501 with how many emails rendered and which recipients
+    are missing values, rather than a success for mail that never left.
+    """
     try:
         data = request.json
         template_id = data.get('templateId')
         recipients = data.get('recipients', [])
-        
-        # TODO: Implement email sending functionality
-        # 1. Fetch template from database
-        # 2. Process template with variables
-        # 3. Send emails using SMTP or email service
-        
-        return jsonify({'message': 'Emails sent successfully'}), 200
+        mapping = data.get('mapping')
+        # Constant values, and fallbacks for recipients that leave a variable empty
+        variables = data.get('variables', {})
+
+        if not template_id:
+            return jsonify({'error': 'Missing required fields'}), 400
+
+        subject = load_template('email', template_id, 'subject')
+        content = load_template('email', template_id)
+        rendered, failed = 0, []
+        for batch in content.render_all(recipients, mapping, variables):
+            subjects = subject.render_batch(batch.rows, mapping, variables)
+            for row, title, body in zip(batch.rows, subjects.messages, batch.messages):
+                if title is None or body is None:
+                    failed.append(row.get('email'))
+                else:
+                    rendered += 1
+
+        return jsonify({'error': 'Email delivery is not available', 'rendered': rendered,
+                        'missingValues': failed}), 501
+    except TemplateError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
+        logging.error(f"Error in send_emails: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/whatsapp-templates', methods=['GET'])
@@ -1188,21 +1245,42 @@ def save_whatsapp_template():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/send-whatsapp', methods=['POST'])
+@app.route('/api/send-whatsapp-template', methods=['POST'])
 def send_whatsapp_messages():
     try:
         data = request.json
         template_id = data.get('templateId')
-        recipients = data.get('recipients', [])
+        sender_number = data.get('senderNumber', '') or whatsapp_config['senderNumber']
+        # Constant values, and fallbacks for rows that leave a variable empty
         variables = data.get('variables', {})
-        
-        # TODO: Implement WhatsApp sending functionality
-        # 1. Fetch template from database
-        # 2. Process template with variables
-        # 3. Send messages using WhatsApp Business API
-        
-        return jsonify({'message': 'Messages sent successfully'}), 200
+
+        if not template_id or not sender_number:
+            return jsonify({'error': 'Missing required fields'}), 400
+        if not whatsapp_config['token']:
+            return jsonify({'error': 'WhatsApp token not configured'}), 400
+
+        # Recipients are a saved list's results, or dicts of number and values
+        if data.get('listId'):
+            if list_store.get_summary(data['listId']) is None:
+                return jsonify({'error': 'List not found'}), 404
+            rows = list_store.iter_items(data['listId'])
+        else:
+            rows = data.get('recipients', [])
+
+        compiled = load_template('whatsapp', template_id)
+        messages = template_messages(compiled, rows, number_key=data.get('numberField', 'phone'),
+                                     mapping=data.get('mapping'), defaults=variables)
+        campaign_id = whatsapp_dispatcher.submit_messages(sender_number, whatsapp_config['token'], messages,
+                                                          template_id=template_id)
+        campaign = whatsapp_dispatcher.get(campaign_id)
+        if campaign is None:
+            return jsonify({'error': 'No recipients'}), 400
+        return jsonify({'message': 'Campaign queued', 'campaignId': campaign_id, 'campaign': campaign}), 202
+
+    except TemplateError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
+        logging.error(f"Error in send_whatsapp_messages: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/generate-whatsapp-content', methods=['POST'])
@@ -1308,4 +1386,8 @@ def business_search():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Send whatever the outbox still holds; only the reloader's child serves
+    # requests and holds campaign tokens, so only it runs the dispatcher
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        whatsapp_dispatcher.start()
     app.run(debug=True, port=3001)
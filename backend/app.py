@@ -1,141 +1,124 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import sqlite3
-import requests
 from dotenv import load_dotenv
 import json
 from datetime import datetime
-import math
 import os
-import re
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import sys
+import base64
+
+# Shared helpers live in the repository root next to the main app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from concurrency import bounded_map, host_limiter, host_of, submit_in_context, MAX_WORKERS
+from geocache import cached_geocode, geocode_cache
+from place_cache import place_cache
+from crawler import crawler
+from enrichment import EnrichmentRunner
+from postal_codes import annotate_postal_codes, extract_postal_code
+import geo
+from pagination import PageTokenPending, pipelined_pages
+from tiling import summarize_tiles, tiled_search
+from quota import OverQueryLimit, QUOTA_STATUSES, maps_quota, parse_budget
+from maps_clients import MAPS_TIMEOUT, maps_clients
+from candidates import CandidateSet
+from leads_db import db
+from export import SAVED_LEAD_COLUMNS, export_response
+from columnar import columnar_response, iter_saved_leads as iter_columnar_leads
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
-# Create database directory if it doesn't exist
-os.makedirs('data', exist_ok=True)
-
-# Initialize SQLite database
-def init_db():
-    conn = sqlite3.connect('data/leads.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS saved_leads (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            list_name TEXT NOT NULL,
-            business_name TEXT NOT NULL,
-            address TEXT,
-            phone TEXT,
-            website TEXT,
-            distance REAL,
-            status TEXT,
-            google_maps_url TEXT,
-            scraped_emails TEXT,
-            postal_code TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-init_db()
-
-GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
-
-def get_place_details(place_id):
-    url = f"https://maps.googleapis.com/maps/api/place/details/json"
+db.migrate()
+enrichment_runner = EnrichmentRunner(db)
+
+# Overridable so the search pipeline can be pointed at a local stub server
+GOOGLE_MAPS_API_BASE = os.getenv('GOOGLE_MAPS_API_BASE', 'https://maps.googleapis.com')
+MAPS_HOST = host_of(GOOGLE_MAPS_API_BASE)
+
+PLACE_DETAILS_FIELDS = [
+    'name', 'formatted_address', 'formatted_phone_number', 'website',
+    'opening_hours', 'url', 'business_status'
+]
+
+def maps_get(api, path, params):
+    """
+    GET a Maps web service endpoint through the shared quota limiter.
+
+    The key and keep-alive session come from the shared client registry.
+    Quota errors, which Google reports either as HTTP 429 or as a status in
+    the body, are raised as OverQueryLimit so the limiter can retry them.
+    """
+    entry = maps_clients.entry()
+    params = dict(params, key=entry.key)
+
+    def get():
+        with host_limiter.slot(MAPS_HOST):
+            response = entry.session.get(f"{GOOGLE_MAPS_API_BASE}{path}", params=params, timeout=MAPS_TIMEOUT)
+        if response.status_code == 429 or (
+                response.status_code == 200 and response.json().get('status') in QUOTA_STATUSES):
+            raise OverQueryLimit(f"{path}: quota exceeded")
+        return response
+
+    return maps_quota.call(api, get)
+
+def fetch_place_details(place_id, fields):
+    """Call the Place Details API for just the given fields."""
     params = {
         'place_id': place_id,
-        'key': GOOGLE_MAPS_API_KEY,
-        'fields': 'name,formatted_address,formatted_phone_number,website,opening_hours,url,business_status'
+        'fields': ','.join(fields)
     }
     
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        result = response.json().get('result', {})
-        return {
-            'business_name': result.get('name'),
-            'address': result.get('formatted_address'),
-            'phone': result.get('formatted_phone_number'),
-            'website': result.get('website'),
-            'status': result.get('business_status'),
-            'google_maps_url': result.get('url'),
-            'opening_hours': result.get('opening_hours', {}).get('weekday_text', [])
-        }
-    return None
+    response = maps_get('details', '/maps/api/place/details/json', params)
+    if response.status_code != 200:
+        return None
+    body = response.json()
+    # Don't let quota or server errors be cached as a place with no details
+    if body.get('status', 'OK') != 'OK':
+        raise RuntimeError(f"Place details failed for {place_id}: {body['status']}")
+    return body.get('result', {})
+
+def get_place_details(place_id):
+    result = place_cache.get(place_id, PLACE_DETAILS_FIELDS, fetch_place_details)
+    if not result:
+        return None
+    return {
+        'business_name': result.get('name'),
+        'address': result.get('formatted_address'),
+        'phone': result.get('formatted_phone_number'),
+        'website': result.get('website'),
+        'status': result.get('business_status'),
+        'google_maps_url': result.get('url'),
+        'opening_hours': result.get('opening_hours', {}).get('weekday_text', [])
+    }
 
 def get_location_coordinates(location):
-    url = f"https://maps.googleapis.com/maps/api/geocode/json"
+    return cached_geocode(location, geocode_location)
+
+def geocode_location(location):
     params = {
-        'address': location,
-        'key': GOOGLE_MAPS_API_KEY
+        'address': location
     }
     
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        results = response.json().get('results', [])
-        if results:
-            location = results[0]['geometry']['location']
-            return location['lat'], location['lng']
+    response = maps_get('geocode', '/maps/api/geocode/json', params)
+    body = response.json() if response.status_code == 200 else {}
+    # Only a definite answer may be cached; quota and server errors must not be
+    if body.get('status') not in ('OK', 'ZERO_RESULTS'):
+        raise RuntimeError(f"Geocoding failed for {location}: {body.get('status', response.status_code)}")
+    results = body.get('results', [])
+    if results:
+        location = results[0]['geometry']['location']
+        return location['lat'], location['lng']
     return None
 
 def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # Earth's radius in kilometers
-
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-
-    a = math.sin(delta_lat/2) * math.sin(delta_lat/2) + \
-        math.cos(lat1_rad) * math.cos(lat2_rad) * \
-        math.sin(delta_lon/2) * math.sin(delta_lon/2)
-    
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    distance = R * c
-
-    return distance
+    """Distance in kilometers between two points."""
+    return geo.calculate_distance(lat1, lon1, lat2, lon2) / 1000
 
 def scrape_emails_from_url(url):
-    try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find all text content
-        text = soup.get_text()
-        
-        # Regular expression for email addresses
-        email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        emails = set(re.findall(email_pattern, text))
-        
-        # Also check for contact page links
-        contact_links = []
-        for link in soup.find_all('a', href=True):
-            href = link.get('href')
-            text = link.text.lower()
-            if 'contact' in text or 'about' in text:
-                contact_links.append(urljoin(url, href))
-        
-        # Scrape contact pages
-        for contact_url in contact_links[:2]:  # Limit to first 2 contact pages
-            try:
-                contact_response = requests.get(contact_url, timeout=5)
-                contact_soup = BeautifulSoup(contact_response.text, 'html.parser')
-                contact_text = contact_soup.get_text()
-                emails.update(re.findall(email_pattern, contact_text))
-            except:
-                continue
-        
-        return list(emails)
-    except Exception as e:
-        print(f"Error scraping emails: {str(e)}")
-        return []
+    return crawler.scrape(url)
 
 @app.route('/api/search', methods=['GET', 'POST'])
 def search_places():
@@ -145,6 +128,10 @@ def search_places():
         radius = int(request.args.get('radius', '50000'))  # Default to 50km for regular search
         exact_pincode = request.args.get('exactPincodeSearch', 'false').lower() == 'true'
         page_token = request.args.get('pageToken', None)
+        country = request.args.get('country')
+        nearest_origin = request.args.get('nearestOrigin', 'false').lower() == 'true'
+        tiled = request.args.get('tiled', 'false').lower() == 'true'
+        budget = parse_budget(request.args.get('budget'))
     else:
         data = request.json
         keyword = data.get('keyword', '')
@@ -152,101 +139,208 @@ def search_places():
         radius = data.get('radius', 50000)
         exact_pincode = data.get('exactPincodeSearch', False)
         page_token = data.get('pageToken', None)
+        country = data.get('country')
+        nearest_origin = data.get('nearestOrigin', False)
+        tiled = data.get('tiled', False)
+        budget = parse_budget(data.get('budget'))
+
+    tiles = [] if tiled else None
+    candidates = CandidateSet()
+    # An optional cap on Maps calls for this search, e.g. {"details": 40}
+    with maps_quota.budget(**budget):
+        results, next_page_token = run_search(keyword, locations, radius, exact_pincode, page_token,
+                                              country=country, nearest_origin=nearest_origin, tiles=tiles,
+                                              candidates=candidates)
+
+    response = {
+        'results': results,
+        'next_page_token': next_page_token,
+        'candidates': candidates.report()
+    }
+    if tiled:
+        response['tiles'] = tiles
+        response['tiling'] = summarize_tiles(tiles)
+    return jsonify(response)
+
+def nearby_search(lat, lng, keyword, radius, page_token=None):
+    """Run one nearby search page, returning the parsed response or None."""
+    search_params = {
+        'location': f"{lat},{lng}",
+        'radius': radius,
+        'keyword': keyword,
+        'type': 'establishment'
+    }
 
-    all_results = []
-    next_page_token = None
+    if page_token:
+        search_params['pagetoken'] = page_token
+
+    response = maps_get('nearby', '/maps/api/place/nearbysearch/json', search_params)
+
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+def build_result(place, lat, lng, country=None, distance=None):
+    """
+    Fetch details for a nearby-search hit and build the API result.
+
+    distance (km) can be passed in when the caller has already computed it
+    for a whole batch of hits.
+    """
+    place_details = get_place_details(place['place_id'])
+    if not place_details:
+        return None
+
+    address = place_details['address']
+    postal_code = extract_postal_code(address, country)
+
+    # Calculate distance
+    place_lat = place['geometry']['location']['lat']
+    place_lng = place['geometry']['location']['lng']
+    if distance is None:
+        distance = calculate_distance(lat, lng, place_lat, place_lng)
+
+    return {
+        'business_name': place_details['business_name'],
+        'address': address,
+        'postal_code': postal_code,
+        'phone': place_details['phone'],
+        'website': place_details['website'],
+        'distance': round(distance, 2),
+        'lat': place_lat,
+        'lng': place_lng,
+        'status': place_details['status'],
+        'google_maps_url': place_details['google_maps_url'],
+        'opening_hours': place_details['opening_hours']
+    }
+
+def locate(location):
+    """Geocode a search location, logging and returning None on failure."""
+    try:
+        return get_location_coordinates(location)
+    except Exception as e:
+        print(f"Error processing location {location}: {str(e)}")
+        return None
+
+def search_location(location, coords, keyword, radius, page_token=None):
+    """Run the nearby search for a geocoded location, or None on failure."""
+    lat, lng = coords
+    try:
+        return nearby_search(lat, lng, keyword, radius, page_token)
+    except Exception as e:
+        print(f"Error processing location {location}: {str(e)}")
+        return None
+
+def search_tile(lat, lng, keyword, radius):
+    """Fetch every page of one nearby search; returns (places, api_calls)."""
+    def next_page(token):
+        page = nearby_search(lat, lng, keyword, radius, token)
+        # The API answers INVALID_REQUEST until the token becomes valid
+        if page and page.get('status') == 'INVALID_REQUEST':
+            raise PageTokenPending(token)
+        return page
+
+    places = []
+    calls = 0
+    for page in pipelined_pages(nearby_search(lat, lng, keyword, radius), next_page):
+        calls += 1
+        places.extend(page.get('results', []))
+    return places, calls
+
+def search_location_tiled(location, coords, keyword, radius, tiles):
+    """
+    Cover a location's whole radius with an adaptive tile plan.
+
+    Returns a nearby-search-shaped response holding every place found, and
+    appends each tile's report, tagged with the location, to tiles.
+    """
+    lat, lng = coords
+    try:
+        places, report = tiled_search(lat, lng, radius,
+                                      lambda lat, lng, radius: search_tile(lat, lng, keyword, radius))
+    except Exception as e:
+        print(f"Error processing location {location}: {str(e)}")
+        return None
+    tiles.extend(dict(tile, location=location) for tile in report)
+    return {'results': places}
 
+def fetch_result(location, lat, lng, place, country=None, distance=None):
+    """Build the result for one nearby-search hit, or None on failure."""
+    try:
+        return build_result(place, lat, lng, country, distance)
+    except Exception as e:
+        print(f"Error processing location {location}: {str(e)}")
+        return None
+
+def matches_location(result, location, exact_pincode):
+    """For exact postal code search, only include results whose codes match."""
+    if not exact_pincode:
+        return True
+    search_code = location.strip().upper()
+    postal_code = result['postal_code']
+    return bool(postal_code) and postal_code.strip().upper() == search_code
+
+def run_search(keyword, locations, radius, exact_pincode=False, page_token=None, max_workers=None, country=None,
+               nearest_origin=False, tiles=None, candidates=None):
+    """
+    Search every location and return (results, next_page_token).
+
+    All locations are geocoded at once, their nearby searches run together,
+    and then the place-details calls for every hit are fanned out on a bounded
+    pool. Results keep the order the serial loop produced before the final
+    dedupe and distance sort, so the response is unchanged.
+
+    With nearest_origin, each result's distance is measured from whichever
+    searched location it is closest to (named in 'nearest_location') rather
+    than the one whose search happened to find it first.
+
+    If tiles is a list, each location's radius is covered by an adaptive
+    tile plan rather than one page of results (page_token is ignored), and
+    the report for every tile searched is appended to it.
+
+    Hits from every location are collected into a CandidateSet (pass your
+    own as candidates to read its report) and each unique place_id gets one
+    details call, however many locations found it.
+    """
+    candidates = candidates if candidates is not None else CandidateSet()
     # For exact postal/zip code search, use a larger radius to get all results
     search_radius = 50000 if exact_pincode else radius  # 50km radius for postal code search to get all results
 
-    for location in locations:
-        try:
-            coords = get_location_coordinates(location)
-            if not coords:
-                continue
-            lat, lng = coords
-
-            # Search parameters
-            search_params = {
-                'location': f"{lat},{lng}",
-                'radius': search_radius,
-                'keyword': keyword,
-                'type': 'establishment',
-                'key': GOOGLE_MAPS_API_KEY
-            }
-
-            if page_token:
-                search_params['pagetoken'] = page_token
-
-            # Perform the search
-            url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-            response = requests.get(url, params=search_params)
-            
-            if response.status_code != 200:
-                continue
-                
-            places_result = response.json()
-            next_page_token = places_result.get('next_page_token')
-            
-            for place in places_result.get('results', []):
-                # Get place details for website and phone
-                place_details = get_place_details(place['place_id'])
-                if not place_details:
-                    continue
-
-                # Extract postal/zip code from address using regex
-                postal_code = None
-                address = place_details['address']
-                
-                # Match common postal/zip code formats worldwide
-                # US: 5 digits or 5+4
-                # UK: Various formats
-                # India: 6 digits
-                # Canada: Letter+Number+Letter Number+Letter+Number
-                # And others
-                postal_patterns = [
-                    r'\b\d{6}\b',  # India
-                    r'\b\d{5}(?:-\d{4})?\b',  # US
-                    r'\b[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}\b',  # UK
-                    r'\b[ABCEGHJ-NPRSTVXY]\d[A-Z] ?\d[A-Z]\d\b',  # Canada
-                    r'\b\d{4} ?[A-Z]{2}\b',  # Netherlands
-                    r'\b\d{4}\b',  # Many countries
-                ]
-                
-                for pattern in postal_patterns:
-                    match = re.search(pattern, address, re.IGNORECASE)
-                    if match:
-                        postal_code = match.group().strip()
-                        break
-
-                # Calculate distance
-                place_lat = place['geometry']['location']['lat']
-                place_lng = place['geometry']['location']['lng']
-                distance = calculate_distance(lat, lng, place_lat, place_lng)
-
-                result = {
-                    'business_name': place_details['business_name'],
-                    'address': address,
-                    'postal_code': postal_code,
-                    'phone': place_details['phone'],
-                    'website': place_details['website'],
-                    'distance': round(distance, 2),
-                    'status': place_details['status'],
-                    'google_maps_url': place_details['google_maps_url'],
-                    'opening_hours': place_details['opening_hours']
-                }
-
-                # For exact postal code search, only include if codes match
-                if exact_pincode:
-                    search_code = location.strip().upper()
-                    if postal_code and postal_code.strip().upper() == search_code:
-                        all_results.append(result)
-                else:
-                    all_results.append(result)
+    coordinates = bounded_map(locate, locations, max_workers=max_workers)
+    located = [(location, coords) for location, coords in zip(locations, coordinates) if coords]
+    if tiles is not None:
+        pages = bounded_map(
+            lambda item: search_location_tiled(item[0], item[1], keyword, search_radius, tiles),
+            located, max_workers=max_workers)
+    else:
+        pages = bounded_map(
+            lambda item: search_location(item[0], item[1], keyword, search_radius, page_token),
+            located, max_workers=max_workers)
 
-        except Exception as e:
-            print(f"Error processing location {location}: {str(e)}")
+    next_page_token = None
+    for (location, (lat, lng)), places_result in zip(located, pages):
+        if places_result is None:
             continue
+        next_page_token = places_result.get('next_page_token')
+        candidates.add(places_result.get('results', []), location, lat, lng, 'nearby')
+    unique = list(candidates)
+
+    built = bounded_map(
+        lambda candidate: fetch_result(*candidate.origin[:3], candidate.place, country, candidate.origin[3]),
+        unique, max_workers=max_workers)
+
+    all_results = []
+    for candidate, result in zip(unique, built):
+        if not result:
+            continue
+        # A place found from several locations counts for the first one it matches
+        origin = next((origin for origin in candidate.origins
+                       if matches_location(result, origin[0], exact_pincode)), None)
+        if origin is None:
+            continue
+        if origin is not candidate.origin:
+            result['distance'] = round(origin[3], 2)
+        all_results.append(result)
 
     # Remove duplicates based on business name and address
     seen = set()
@@ -257,29 +351,165 @@ def search_places():
             seen.add(key)
             unique_results.append(result)
 
+    if nearest_origin and unique_results:
+        nearest, distances = geo.assign_nearest_origin(
+            [coords for _, coords in located],
+            [(result['lat'], result['lng']) for result in unique_results])
+        for result, index, distance in zip(unique_results, nearest, distances):
+            result['distance'] = round(float(distance) / 1000, 2)
+            result['nearest_location'] = located[index][0]
+
     # Sort results by distance
     unique_results.sort(key=lambda x: x['distance'])
-    
-    return jsonify({
-        'results': unique_results,
-        'next_page_token': next_page_token
+    return unique_results, next_page_token
+
+def stream_search(keyword, locations, radius, exact_pincode=False, page_token=None, max_workers=None, country=None,
+                  tiles=None, candidates=None):
+    """
+    Run a search and yield (event, data) pairs as the work completes.
+
+    Emits a 'progress' event as each location is geocoded, searched and
+    finished, a 'result' event for every business as soon as its details
+    resolve (deduplicated like run_search, but unsorted), and a final
+    'summary' event with the totals and next_page_token. tiles works as in
+    run_search, and adds the tiling totals to the summary.
+
+    A place already found by an earlier location isn't fetched again. For
+    exact postal code searches each location's hits are still judged on
+    their own, since results can't wait for every location to be searched.
+    """
+    if candidates is None:
+        candidates = CandidateSet(per_origin=exact_pincode)
+    search_radius = 50000 if exact_pincode else radius
+    executor = ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS)
+    pending = {submit_in_context(executor, locate, location): ('geocode', index, None)
+               for index, location in enumerate(locations)}
+    tokens = {}
+    remaining = {}
+    found = {}
+    seen = set()
+    total = 0
+
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, index, coords = pending.pop(future)
+                location = locations[index]
+
+                if stage == 'geocode':
+                    coords = future.result()
+                    if not coords:
+                        yield 'progress', {'location': location, 'stage': 'not_found'}
+                        continue
+                    yield 'progress', {'location': location, 'stage': 'geocoded'}
+                    if tiles is not None:
+                        future = submit_in_context(executor, search_location_tiled, location, coords, keyword,
+                                                   search_radius, tiles)
+                    else:
+                        future = submit_in_context(executor, search_location, location, coords, keyword,
+                                                   search_radius, page_token)
+                    pending[future] = ('nearby', index, coords)
+
+                elif stage == 'nearby':
+                    places_result = future.result()
+                    if places_result is not None:
+                        tokens[index] = places_result.get('next_page_token')
+                    places = (places_result or {}).get('results', [])
+                    lat, lng = coords
+                    fresh = candidates.add(places, location, lat, lng, 'nearby')
+                    remaining[index] = len(fresh)
+                    found[index] = 0
+                    yield 'progress', {'location': location, 'stage': 'searched', 'places': len(places),
+                                       'new_places': len(fresh)}
+                    if not fresh:
+                        yield 'progress', {'location': location, 'stage': 'done', 'results': 0}
+                    for candidate in fresh:
+                        future = submit_in_context(executor, fetch_result, location, lat, lng, candidate.place,
+                                                   country, candidate.origin[3])
+                        pending[future] = ('details', index, coords)
+
+                else:
+                    result = future.result()
+                    remaining[index] -= 1
+                    if result and matches_location(result, location, exact_pincode):
+                        key = (result['business_name'], result['address'])
+                        if key not in seen:
+                            seen.add(key)
+                            found[index] += 1
+                            total += 1
+                            yield 'result', result
+                    if remaining[index] == 0:
+                        yield 'progress', {'location': location, 'stage': 'done', 'results': found[index]}
+
+        # Same token run_search reports: the last location that answered
+        next_page_token = tokens[max(tokens)] if tokens else None
+        summary = {
+            'total': total,
+            'locations': len(locations),
+            'next_page_token': next_page_token,
+            'candidates': candidates.report()
+        }
+        if tiles is not None:
+            summary['tiling'] = summarize_tiles(tiles)
+        yield 'summary', summary
+    finally:
+        # Don't keep fetching details for a client that has gone away
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/search/stream', methods=['GET'])
+def search_places_stream():
+    keyword = request.args.get('query', '')
+    locations = json.loads(request.args.get('locations', '[]'))
+    radius = int(request.args.get('radius', '50000'))
+    exact_pincode = request.args.get('exactPincodeSearch', 'false').lower() == 'true'
+    page_token = request.args.get('pageToken', None)
+    country = request.args.get('country')
+    tiled = request.args.get('tiled', 'false').lower() == 'true'
+    budget = parse_budget(request.args.get('budget'))
+
+    def generate():
+        try:
+            with maps_quota.budget(**budget):
+                for event, data in stream_search(keyword, locations, radius, exact_pincode, page_token,
+                                                 country=country, tiles=[] if tiled else None):
+                    yield sse_event(event, data)
+        except Exception as e:
+            print(f"Error in search stream: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
+@app.route('/api/geocode-cache/stats', methods=['GET'])
+def get_geocode_cache_stats():
+    return jsonify(geocode_cache.get_stats())
+
+@app.route('/api/place-cache/stats', methods=['GET'])
+def get_place_cache_stats():
+    return jsonify(place_cache.get_stats())
+
+@app.route('/api/maps-clients/stats', methods=['GET'])
+def get_maps_client_stats():
+    return jsonify(maps_clients.get_stats())
+
+@app.route('/api/maps-quota/stats', methods=['GET'])
+def get_maps_quota_stats():
+    return jsonify(maps_quota.get_stats())
+
 @app.route('/api/lists', methods=['GET'])
 def get_lists():
     try:
-        conn = sqlite3.connect('data/leads.db')
-        c = conn.cursor()
+        # One summary row per list, maintained by triggers on saved_leads
+        rows = db.query('SELECT name, lead_count, first_id FROM lists ORDER BY name')
         
-        # Get distinct list names and count of businesses in each list
-        c.execute('''
-            SELECT list_name, COUNT(*) as count, MIN(id) as id
-            FROM saved_leads 
-            GROUP BY list_name
-        ''')
-        
-        lists = [{'id': str(row[2]), 'name': row[0], 'count': row[1]} for row in c.fetchall()]
-        conn.close()
+        lists = [{'id': str(row[2]), 'name': row[0], 'count': row[1]} for row in rows]
         
         return jsonify(lists)
     except Exception as e:
@@ -289,32 +519,37 @@ def get_lists():
 @app.route('/api/saved-lists', methods=['GET'])
 def get_saved_lists():
     try:
-        conn = sqlite3.connect('data/leads.db')
-        c = conn.cursor()
-        
-        c.execute('''
-            SELECT DISTINCT list_name, COUNT(*) as count,
-            MAX(created_at) as last_updated
-            FROM saved_leads
-            GROUP BY list_name
-            ORDER BY last_updated DESC
-        ''')
+        rows = db.query('SELECT name, lead_count, last_updated FROM lists ORDER BY last_updated DESC')
         
         lists = [{'name': row[0], 'count': row[1], 'last_updated': row[2]} 
-                for row in c.fetchall()]
+                for row in rows]
         
-        conn.close()
         return jsonify({'success': True, 'lists': lists})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def saved_lead_from_row(row):
+    """Build a saved business from a saved_leads row selected in the column order above."""
+    return {
+        'id': row[0],
+        'business_name': row[1],
+        'address': row[2],
+        'phone': row[3],
+        'website': row[4],
+        'distance': row[5],
+        'status': row[6],
+        'google_maps_url': row[7],
+        'scraped_emails': json.loads(row[8]) if row[8] else [],
+        'created_at': row[9],
+        'postal_code': row[10],
+        'lat': row[11],
+        'lng': row[12]
+    }
+
 @app.route('/api/saved-lists/<list_name>', methods=['GET'])
 def get_list_businesses(list_name):
     try:
-        conn = sqlite3.connect('data/leads.db')
-        c = conn.cursor()
-        
-        c.execute('''
+        rows = db.query('''
             SELECT 
                 id,
                 business_name,
@@ -326,35 +561,232 @@ def get_list_businesses(list_name):
                 google_maps_url,
                 scraped_emails,
                 created_at,
-                postal_code
+                postal_code,
+                lat,
+                lng
             FROM saved_leads 
             WHERE list_name = ?
             ORDER BY created_at DESC
         ''', (list_name,))
         
-        businesses = []
-        for row in c.fetchall():
-            businesses.append({
-                'id': row[0],
-                'business_name': row[1],
-                'address': row[2],
-                'phone': row[3],
-                'website': row[4],
-                'distance': row[5],
-                'status': row[6],
-                'google_maps_url': row[7],
-                'scraped_emails': json.loads(row[8]) if row[8] else [],
-                'created_at': row[9],
-                'postal_code': row[10]
-            })
+        businesses = [saved_lead_from_row(row) for row in rows]
+
+        # Rows saved before postal codes were stored get them filled in here
+        annotate_postal_codes(businesses)
         
-        conn.close()
         return jsonify(businesses)
         
     except Exception as e:
         print(f"Error in get_list_businesses: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Sort orders for a list's items: the expression sorted on and its direction,
+# each with a matching index in init_db
+SAVED_LEAD_SORTS = {
+    'newest': ('created_at', 'DESC'),
+    'oldest': ('created_at', 'ASC'),
+    'name': ('business_name', 'ASC'),
+    'nearest': ('IFNULL(distance, 0)', 'ASC'),
+    'farthest': ('IFNULL(distance, 0)', 'DESC')
+}
+SAVED_LEAD_PAGE_SIZE = 50
+SAVED_LEAD_MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('Invalid cursor')
+    return values
+
+def saved_lead_filters(args):
+    """WHERE clauses and parameters for the item filters in the query string."""
+    clauses, params = [], []
+    if args.get('hasWebsite', 'false').lower() == 'true':
+        clauses.append("IFNULL(website, '') != ''")
+    if args.get('hasEmail', 'false').lower() == 'true':
+        clauses.append("IFNULL(scraped_emails, '') NOT IN ('', '[]')")
+    if args.get('postalCode'):
+        clauses.append('postal_code = ?')
+        params.append(args['postalCode'].replace(' ', ''))
+    if args.get('status'):
+        clauses.append('status = ?')
+        params.append(args['status'])
+    if args.get('minDistance'):
+        clauses.append('IFNULL(distance, 0) >= ?')
+        params.append(float(args['minDistance']))
+    if args.get('maxDistance'):
+        clauses.append('IFNULL(distance, 0) <= ?')
+        params.append(float(args['maxDistance']))
+    return clauses, params
+
+@app.route('/api/saved-lists/<list_name>/items', methods=['GET'])
+def get_list_items(list_name):
+    """
+    One page of a saved list, filtered and sorted in the database.
+
+    Pages are keyset paginated: pass the previous response's nextCursor as
+    cursor to get the next one, which stays a single index range scan however
+    deep into the list it is. Filters are hasWebsite, hasEmail, postalCode,
+    status, minDistance and maxDistance (km); sort is one of
+    SAVED_LEAD_SORTS. The first page also carries the filtered total.
+    """
+    try:
+        sort = request.args.get('sort', 'newest')
+        if sort not in SAVED_LEAD_SORTS:
+            return jsonify({'error': f'Unknown sort {sort}'}), 400
+        expression, direction = SAVED_LEAD_SORTS[sort]
+        limit = min(max(int(request.args.get('limit', SAVED_LEAD_PAGE_SIZE)), 1), SAVED_LEAD_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+
+        clauses, params = saved_lead_filters(request.args)
+        clauses.insert(0, 'list_name = ?')
+        params.insert(0, list_name)
+
+        total = None
+        if not cursor:
+            total = db.query_one(f"SELECT COUNT(*) FROM saved_leads WHERE {' AND '.join(clauses)}", params)[0]
+        else:
+            value, last_id = decode_cursor(cursor)
+            operator = '<' if direction == 'DESC' else '>'
+            # The plain bound lets SQLite seek the expression index; the row value breaks ties
+            clauses.append(f"{expression} {operator}= ? AND ({expression}, id) {operator} (?, ?)")
+            params.extend([value, value, last_id])
+
+        # One extra row says whether there is a next page
+        rows = db.query(f'''
+            SELECT id, business_name, address, phone, website, distance, status,
+                   google_maps_url, scraped_emails, created_at, postal_code, lat, lng,
+                   {expression}
+            FROM saved_leads
+            WHERE {' AND '.join(clauses)}
+            ORDER BY {expression} {direction}, id {direction}
+            LIMIT ?
+        ''', params + [limit + 1])
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][13], rows[-1][0]])
+
+        items = [saved_lead_from_row(row) for row in rows]
+        annotate_postal_codes(items)
+        response = {'items': items, 'nextCursor': next_cursor, 'sort': sort}
+        if total is not None:
+            response['total'] = total
+        return jsonify(response)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_list_items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def iter_saved_leads(list_name, batch_size=1000):
+    """Every saved business of a list, oldest first, read a page at a time."""
+    last_id = 0
+    while True:
+        rows = db.query('''
+            SELECT id, business_name, address, phone, website, distance, status,
+                   google_maps_url, scraped_emails, created_at, postal_code, lat, lng
+            FROM saved_leads
+            WHERE list_name = ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (list_name, last_id, batch_size))
+        businesses = [saved_lead_from_row(row) for row in rows]
+        annotate_postal_codes(businesses)
+        yield from businesses
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+@app.route('/api/saved-lists/<list_name>/export', methods=['GET'])
+def export_list(list_name):
+    """Download a saved list straight from the database as xlsx, csv or ndjson."""
+    try:
+        fmt = request.args.get('format', 'xlsx')
+        if db.query_one('SELECT 1 FROM lists WHERE name = ?', (list_name,)) is None:
+            return jsonify({'error': 'List not found'}), 404
+        return export_response(iter_saved_leads(list_name), SAVED_LEAD_COLUMNS, fmt, list_name,
+                               sheet_name='Saved Leads')
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in export_list: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/columnar-export', methods=['GET'])
+def columnar_export():
+    """
+    Saved leads as typed Parquet or Arrow for analytics.
+
+    format is parquet (default) or arrow; since (ISO timestamp) limits the
+    export to rows saved from then on, and list_name to one list. The
+    X-Export-Watermark header is the since for the next incremental run.
+    """
+    try:
+        fmt = request.args.get('format', 'parquet')
+        records = iter_columnar_leads(db, request.args.get('since'), request.args.get('list_name'))
+        return columnar_response(records, fmt, f"saved_leads_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in columnar_export: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/saved-lists/<list_name>/nearest', methods=['GET'])
+def get_nearest_businesses(list_name):
+    """
+    Re-rank a saved list by distance from a new origin.
+
+    origin is a location to geocode or "lat,lng"; only the k nearest
+    businesses are returned, with 'distance' (km) measured from it. Rows
+    saved before coordinates were stored can't be ranked and are left out.
+    """
+    try:
+        origin = request.args.get('origin', '').strip()
+        k = int(request.args.get('k', 20))
+        if not origin:
+            return jsonify({'error': 'Origin is required'}), 400
+
+        try:
+            coords = tuple(float(part) for part in origin.split(','))
+            if len(coords) != 2:
+                raise ValueError(origin)
+        except ValueError:
+            coords = get_location_coordinates(origin)
+        if not coords:
+            return jsonify({'error': f'Could not find location {origin}'}), 404
+
+        rows = db.query('''
+            SELECT id, business_name, address, phone, website, distance, status,
+                   google_maps_url, scraped_emails, created_at, postal_code, lat, lng
+            FROM saved_leads
+            WHERE list_name = ? AND lat IS NOT NULL AND lng IS NOT NULL
+        ''', (list_name,))
+
+        order, distances = geo.nearest_k(coords, [(row[11], row[12]) for row in rows], k)
+        businesses = []
+        for index, distance in zip(order, distances):
+            business = saved_lead_from_row(rows[index])
+            business['distance'] = round(float(distance) / 1000, 2)
+            businesses.append(business)
+
+        annotate_postal_codes(businesses)
+        return jsonify(businesses)
+
+    except Exception as e:
+        print(f"Error in get_nearest_businesses: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/save-business', methods=['POST'])
 def save_business():
     try:
@@ -366,9 +798,6 @@ def save_business():
         if not list_name:
             return jsonify({'error': 'List name is required'}), 400
 
-        conn = sqlite3.connect('data/leads.db')
-        c = conn.cursor()
-        
         # Handle both single business and multiple businesses
         businesses = []
         if data.get('business'):
@@ -379,6 +808,9 @@ def save_business():
         if not businesses:
             return jsonify({'error': 'No businesses to save'}), 400
 
+        # Fill in postal codes the client didn't send, in one pass over the batch
+        annotate_postal_codes(businesses, data.get('country'))
+
         # Prepare all businesses for insertion
         values = []
         for business in businesses:
@@ -392,25 +824,24 @@ def save_business():
                 business.get('status', ''),
                 business.get('google_maps_url', ''),
                 json.dumps(business.get('scraped_emails', [])),
-                business.get('postal_code', '')
+                business.get('postal_code') or '',
+                business.get('lat'),
+                business.get('lng')
             ))
 
         # Insert all businesses in a single transaction
-        c.executemany('''
-            INSERT INTO saved_leads (
-                list_name, business_name, address, phone, website,
-                distance, status, google_maps_url, scraped_emails, postal_code
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', values)
-        
-        conn.commit()
-        conn.close()
+        with db.transaction() as c:
+            c.executemany('''
+                INSERT INTO saved_leads (
+                    list_name, business_name, address, phone, website,
+                    distance, status, google_maps_url, scraped_emails, postal_code,
+                    lat, lng
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
         
         return jsonify({'message': f'Successfully saved {len(businesses)} business(es)'})
     except Exception as e:
         print(f"Error saving business: {str(e)}")
-        if 'conn' in locals():
-            conn.close()
         return jsonify({'error': f'Failed to save business: {str(e)}'}), 500
 
 @app.route('/api/scrape-email', methods=['POST'])
@@ -434,17 +865,66 @@ def scrape_email():
         print(f"Error in scrape_email: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/scrape-emails/bulk', methods=['POST'])
+def scrape_emails_bulk():
+    try:
+        data = request.json or {}
+        websites = data.get('websites', [])
+        list_name = data.get('list_name')
+
+        if list_name:
+            websites = [row[0] for row in db.query('''
+                SELECT DISTINCT website FROM saved_leads
+                WHERE list_name = ? AND website IS NOT NULL AND website != ''
+            ''', (list_name,))]
+
+        if not websites:
+            return jsonify({'error': 'No websites to scrape'}), 400
+
+        results = crawler.scrape_many(websites)
+        return jsonify({
+            'success': True,
+            'results': results,
+            'websites': len(results),
+            'emails': sum(len(emails) for emails in results.values())
+        })
+    except Exception as e:
+        print(f"Error in scrape_emails_bulk: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/enrichment-jobs', methods=['POST'])
+def create_enrichment_job():
+    try:
+        data = request.json or {}
+        list_name = data.get('list_name')
+        if not list_name:
+            return jsonify({'error': 'List name is required'}), 400
+
+        enrichment_runner.resume_once()
+        job_id = enrichment_runner.submit(list_name)
+        return jsonify({'success': True, 'job_id': job_id}), 202
+    except Exception as e:
+        print(f"Error in create_enrichment_job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/enrichment-jobs/<job_id>', methods=['GET'])
+def get_enrichment_job(job_id):
+    try:
+        enrichment_runner.resume_once()
+        job = enrichment_runner.status(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+    except Exception as e:
+        print(f"Error in get_enrichment_job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/delete-business/<int:business_id>', methods=['DELETE'])
 def delete_business(business_id):
     try:
-        conn = sqlite3.connect('data/leads.db')
-        c = conn.cursor()
-        
         # Delete the business
-        c.execute('DELETE FROM saved_leads WHERE id = ?', (business_id,))
-        
-        conn.commit()
-        conn.close()
+        with db.transaction() as c:
+            c.execute('DELETE FROM saved_leads WHERE id = ?', (business_id,))
         
         return jsonify({'success': True, 'message': 'Business deleted successfully'})
         
@@ -453,4 +933,7 @@ def delete_business(business_id):
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Only the reloader's child serves requests, so only it resumes jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        enrichment_runner.resume_once()
     app.run(port=3001, debug=True)
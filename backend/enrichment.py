@@ -0,0 +1,193 @@
+"""
+Background email-enrichment jobs for saved lists.
+
+A job records every saved lead with a website as a pending item, then
+crawls them in chunks with bounded parallelism. Each chunk's emails are
+written back to saved_leads.scraped_emails, and the items are marked done,
+in one transaction with executemany. Job and item state live in the same
+SQLite database, reached through leads_db's per-thread WAL connections and
+created by its migrations, so a job interrupted by a crash or restart picks
+up where it left off and never re-crawls websites that are already done.
+"""
+import json
+import threading
+import time
+import uuid
+
+from concurrency import bounded_map
+from crawler import crawler, normalize_website
+
+CHUNK_SIZE = 25
+MAX_PARALLEL_SITES = 16
+# A running job whose progress hasn't moved for this long is presumed dead
+STALE_AFTER_SECONDS = 120
+
+
+class EnrichmentRunner:
+    """Starts, resumes and reports on enrichment jobs for one leads_db.Database."""
+
+    def __init__(self, db, chunk_size=CHUNK_SIZE, max_sites=MAX_PARALLEL_SITES):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.max_sites = max_sites
+        self._threads = {}
+        self._resumed = False
+        # In-memory only: throughput since this process (re)started the job
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    def submit(self, list_name):
+        """Create a job for list_name, or return the one already in progress."""
+        with self.db.transaction() as c:
+            c.execute('''
+                SELECT id FROM enrichment_jobs
+                WHERE list_name = ? AND status IN ('queued', 'running')
+            ''', (list_name,))
+            row = c.fetchone()
+            if row:
+                job_id = row[0]
+            else:
+                job_id = uuid.uuid4().hex
+                c.execute('''
+                    SELECT id, website FROM saved_leads
+                    WHERE list_name = ? AND website IS NOT NULL AND website != ''
+                ''', (list_name,))
+                items = [(job_id, lead_id, website) for lead_id, website in c.fetchall()]
+                c.execute('''
+                    INSERT INTO enrichment_jobs (id, list_name, status, total)
+                    VALUES (?, ?, 'queued', ?)
+                ''', (job_id, list_name, len(items)))
+                c.executemany('''
+                    INSERT INTO enrichment_job_items (job_id, lead_id, website) VALUES (?, ?, ?)
+                ''', items)
+
+        self._start(job_id)
+        return job_id
+
+    def resume_all(self):
+        """Restart every job that was queued, or running but has gone stale."""
+        job_ids = [row[0] for row in
+                   self.db.query("SELECT id FROM enrichment_jobs WHERE status IN ('queued', 'running')")]
+        # Jobs another live process is still working on fail the claim in _run
+        for job_id in job_ids:
+            self._start(job_id)
+        return job_ids
+
+    def resume_once(self):
+        """Resume interrupted jobs the first time this process is asked to."""
+        with self._lock:
+            if self._resumed:
+                return
+            self._resumed = True
+        self.resume_all()
+
+    def _claim(self, job_id):
+        """Atomically take ownership of a queued or stale job."""
+        with self.db.transaction() as c:
+            c.execute(f'''
+                UPDATE enrichment_jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND (
+                    status = 'queued' OR
+                    (status = 'running' AND updated_at < datetime('now', '-{int(STALE_AFTER_SECONDS)} seconds'))
+                )
+            ''', (job_id,))
+            return c.rowcount == 1
+
+    def _start(self, job_id):
+        with self._lock:
+            thread = self._threads.get(job_id)
+            if thread and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run, args=(job_id,), daemon=True)
+            self._threads[job_id] = thread
+            thread.start()
+
+    def _run(self, job_id):
+        try:
+            if not self._claim(job_id):
+                return
+            self._rates[job_id] = (time.time(), 0)
+
+            while True:
+                chunk = self.db.query('''
+                    SELECT i.lead_id, i.website, l.scraped_emails
+                    FROM enrichment_job_items i
+                    LEFT JOIN saved_leads l ON l.id = i.lead_id
+                    WHERE i.job_id = ? AND i.status = 'pending'
+                    LIMIT ?
+                ''', (job_id, self.chunk_size))
+                if not chunk:
+                    break
+                self._process_chunk(job_id, chunk)
+
+            with self.db.transaction() as c:
+                c.execute('''
+                    UPDATE enrichment_jobs SET status = 'completed', updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (job_id,))
+        except Exception as e:
+            print(f"Error in enrichment job {job_id}: {str(e)}")
+            with self.db.transaction() as c:
+                c.execute('''
+                    UPDATE enrichment_jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (str(e), job_id))
+
+    def _process_chunk(self, job_id, chunk):
+        urls = list(dict.fromkeys(normalize_website(website) for _, website, _ in chunk))
+        found = dict(zip(urls, bounded_map(crawler.scrape, urls, max_workers=self.max_sites)))
+
+        updates = []
+        new_emails = 0
+        for lead_id, website, existing in chunk:
+            emails = found.get(normalize_website(website), [])
+            current = json.loads(existing) if existing else []
+            merged = list(dict.fromkeys(current + emails))
+            new_emails += len(merged) - len(current)
+            updates.append((json.dumps(merged), lead_id))
+
+        # Results and progress are committed together, so a crash can only
+        # ever repeat the chunk that was in flight
+        with self.db.transaction() as c:
+            c.executemany('UPDATE saved_leads SET scraped_emails = ? WHERE id = ?', updates)
+            c.executemany('''
+                UPDATE enrichment_job_items SET status = 'done' WHERE job_id = ? AND lead_id = ?
+            ''', [(job_id, lead_id) for lead_id, _, _ in chunk])
+            c.execute('''
+                UPDATE enrichment_jobs
+                SET done = done + ?, emails_found = emails_found + ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (len(chunk), new_emails, job_id))
+
+        started, processed = self._rates.get(job_id, (time.time(), 0))
+        self._rates[job_id] = (started, processed + len(chunk))
+
+    def status(self, job_id):
+        """Return the job's progress and ETA, or None if there is no such job."""
+        row = self.db.query_one('''
+            SELECT id, list_name, status, total, done, emails_found, error, created_at, updated_at
+            FROM enrichment_jobs WHERE id = ?
+        ''', (job_id,))
+        if not row:
+            return None
+
+        total, done = row[3], row[4]
+        eta_seconds = None
+        started, processed = self._rates.get(job_id, (None, 0))
+        if row[2] == 'running' and processed:
+            rate = processed / max(time.time() - started, 1e-6)
+            eta_seconds = round((total - done) / rate, 1)
+
+        return {
+            'id': row[0],
+            'list_name': row[1],
+            'status': row[2],
+            'total': total,
+            'done': done,
+            'progress': round(done / total * 100, 1) if total else 100.0,
+            'emails_found': row[5],
+            'eta_seconds': eta_seconds,
+            'error': row[6],
+            'created_at': row[7],
+            'updated_at': row[8]
+        }
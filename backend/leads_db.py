@@ -0,0 +1,288 @@
+"""
+Connections to the saved-leads database and its schema migrations.
+
+Every route used to open its own connection to data/leads.db in the default
+rollback journal, so a save held the whole file locked against readers and
+concurrent requests failed with "database is locked". Each thread now keeps
+one connection for its lifetime, in WAL mode so readers never wait on the
+writer and the writer never waits on readers. Because the connection
+outlives the request, its statement cache keeps every query prepared
+between requests.
+
+Writes go through transaction(), which takes the write lock up front with
+BEGIN IMMEDIATE: a transaction that starts as a read and later writes can
+fail at once with SQLITE_BUSY in WAL mode, without waiting out the busy
+timeout. Schema changes are numbered migrations tracked in PRAGMA
+user_version, so each runs exactly once per database.
+
+The lists table is a summary of saved_leads kept current by triggers.
+`python leads_db.py check` reports lists whose summary has drifted, and
+`python leads_db.py rebuild` also recomputes them.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+# Shared helpers live in the repository root next to the main app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from postal_codes import extract_postal_code
+
+LEADS_DB_PATH = os.getenv('LEADS_DB_PATH', 'data/leads.db')
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 30))
+# Page cache per connection, in KiB, and how much of the file to memory-map
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16384))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+STATEMENT_CACHE_SIZE = 256
+
+
+def _create_saved_leads(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS saved_leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            list_name TEXT NOT NULL,
+            business_name TEXT NOT NULL,
+            address TEXT,
+            phone TEXT,
+            website TEXT,
+            distance REAL,
+            status TEXT,
+            google_maps_url TEXT,
+            scraped_emails TEXT,
+            postal_code TEXT,
+            lat REAL,
+            lng REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Databases created before these columns existed need them added
+    c.execute('PRAGMA table_info(saved_leads)')
+    columns = {row[1] for row in c.fetchall()}
+    for column, column_type in (('scraped_emails', 'TEXT'), ('postal_code', 'TEXT'),
+                                ('lat', 'REAL'), ('lng', 'REAL')):
+        if column not in columns:
+            c.execute(f'ALTER TABLE saved_leads ADD COLUMN {column} {column_type}')
+
+
+def _index_saved_leads(c):
+    # One index per sort order of a list's items, ending in id so that keyset
+    # pages are range scans; see SAVED_LEAD_SORTS in app.py
+    c.execute('CREATE INDEX IF NOT EXISTS idx_saved_leads_list_created ON saved_leads (list_name, created_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_saved_leads_list_name ON saved_leads (list_name, business_name, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_saved_leads_list_distance '
+              'ON saved_leads (list_name, IFNULL(distance, 0), id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_saved_leads_list_postal_code ON saved_leads (list_name, postal_code)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_saved_leads_list_status ON saved_leads (list_name, status)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_saved_leads_created ON saved_leads (created_at)')
+
+
+def _backfill_postal_codes(c):
+    # Rows saved before postal codes were stored get them, so the postal code filter sees them
+    c.execute("SELECT id, address FROM saved_leads WHERE IFNULL(postal_code, '') = '' AND IFNULL(address, '') != ''")
+    backfill = [(code, row_id) for row_id, address in c.fetchall()
+                for code in [extract_postal_code(address)] if code]
+    c.executemany('UPDATE saved_leads SET postal_code = ? WHERE id = ?', backfill)
+
+
+# What the lists summary should hold, computed from saved_leads itself
+LIST_SUMMARY_QUERY = '''
+    SELECT list_name, COUNT(*), MIN(id), MAX(created_at)
+    FROM saved_leads
+    GROUP BY list_name
+'''
+
+
+# Trigger steps that count a lead into NEW's list and out of OLD's. The first
+# id and latest timestamp are only looked up again when the lead leaving was
+# the one holding them.
+_COUNT_LEAD_IN = '''
+    INSERT INTO lists (name, lead_count, first_id, last_updated)
+    VALUES (NEW.list_name, 1, NEW.id, NEW.created_at)
+    ON CONFLICT (name) DO UPDATE SET
+        lead_count = lead_count + 1,
+        first_id = MIN(first_id, excluded.first_id),
+        last_updated = MAX(last_updated, excluded.last_updated);
+'''
+_COUNT_LEAD_OUT = '''
+    UPDATE lists SET
+        lead_count = lead_count - 1,
+        first_id = CASE WHEN first_id = OLD.id
+            THEN (SELECT MIN(id) FROM saved_leads WHERE list_name = OLD.list_name)
+            ELSE first_id END,
+        last_updated = CASE WHEN last_updated = OLD.created_at
+            THEN (SELECT MAX(created_at) FROM saved_leads WHERE list_name = OLD.list_name)
+            ELSE last_updated END
+    WHERE name = OLD.list_name;
+    DELETE FROM lists WHERE name = OLD.list_name AND lead_count <= 0;
+'''
+
+
+def _create_list_summaries(c):
+    # One row per saved list, so list overviews read a row per list instead
+    # of aggregating every saved lead. Triggers keep it current for every
+    # writer, including enrichment jobs and manual fixes.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS lists (
+            name TEXT PRIMARY KEY,
+            lead_count INTEGER NOT NULL,
+            first_id INTEGER,
+            last_updated TIMESTAMP
+        )
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_saved_leads_insert_list AFTER INSERT ON saved_leads
+        BEGIN {_COUNT_LEAD_IN} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_saved_leads_delete_list AFTER DELETE ON saved_leads
+        BEGIN {_COUNT_LEAD_OUT} END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_saved_leads_move_list AFTER UPDATE OF list_name ON saved_leads
+        WHEN OLD.list_name != NEW.list_name
+        BEGIN {_COUNT_LEAD_OUT} {_COUNT_LEAD_IN} END
+    ''')
+    rebuild_list_summaries(c)
+
+
+def check_list_summaries(c):
+    """
+    Compare the lists summary with saved_leads.
+
+    Returns one entry per list whose summary is missing, stale or left over,
+    with the stored and the actual (lead_count, first_id, last_updated).
+    """
+    actual = {row[0]: tuple(row[1:]) for row in c.execute(LIST_SUMMARY_QUERY)}
+    stored = {row[0]: tuple(row[1:]) for row in
+              c.execute('SELECT name, lead_count, first_id, last_updated FROM lists')}
+    return [{'name': name, 'stored': stored.get(name), 'actual': actual.get(name)}
+            for name in sorted(set(actual) | set(stored))
+            if stored.get(name) != actual.get(name)]
+
+
+def rebuild_list_summaries(c):
+    """Recompute the whole lists summary from saved_leads."""
+    c.execute('DELETE FROM lists')
+    c.execute(f'INSERT INTO lists (name, lead_count, first_id, last_updated) {LIST_SUMMARY_QUERY}')
+
+
+def _create_enrichment_jobs(c):
+    # Background email-enrichment jobs and their per-lead items; see enrichment.py.
+    # Databases that already have them from before this migration keep them.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS enrichment_jobs (
+            id TEXT PRIMARY KEY,
+            list_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            emails_found INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS enrichment_job_items (
+            job_id TEXT NOT NULL,
+            lead_id INTEGER NOT NULL,
+            website TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            PRIMARY KEY (job_id, lead_id)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_enrichment_items_status ON enrichment_job_items (job_id, status)')
+
+
+# Applied in order; a database at user_version N has had the first N.
+# Append new migrations, never edit or reorder applied ones.
+MIGRATIONS = [
+    _create_saved_leads,
+    _index_saved_leads,
+    _backfill_postal_codes,
+    _create_list_summaries,
+    _create_enrichment_jobs,
+]
+
+
+class Database:
+    """Per-thread connections to one SQLite file, with migrations."""
+
+    def __init__(self, path=LEADS_DB_PATH, migrations=MIGRATIONS):
+        self.path = path
+        self.migrations = migrations
+        self._local = threading.local()
+
+    def connection(self):
+        """This thread's connection, opened on first use and after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode: transactions are begun explicitly by transaction()
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Durable at every checkpoint rather than every commit; safe with WAL
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+            conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def query(self, sql, params=()):
+        """Rows of a read-only statement."""
+        return self.connection().execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        """The first row of a read-only statement, or None."""
+        return self.connection().execute(sql, params).fetchone()
+
+    @contextmanager
+    def transaction(self):
+        """
+        A write transaction on this thread's connection, yielding a cursor.
+
+        Commits when the block ends and rolls back if it raises.
+        """
+        conn = self.connection()
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            yield c
+        except BaseException:
+            c.execute('ROLLBACK')
+            raise
+        else:
+            c.execute('COMMIT')
+
+    def migrate(self):
+        """Apply the migrations this database hasn't had yet; returns how many ran."""
+        with self.transaction() as c:
+            version = c.execute('PRAGMA user_version').fetchone()[0]
+            pending = self.migrations[version:]
+            for migration in pending:
+                migration(c)
+            if pending:
+                c.execute(f'PRAGMA user_version = {len(self.migrations)}')
+        return len(pending)
+
+
+db = Database()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('check', 'rebuild'):
+        sys.exit('Usage: python leads_db.py check|rebuild')
+    db.migrate()
+    with db.transaction() as c:
+        mismatches = check_list_summaries(c)
+        for mismatch in mismatches:
+            print(json.dumps(mismatch))
+        if sys.argv[1] == 'rebuild' and mismatches:
+            rebuild_list_summaries(c)
+    print(f"{len(mismatches)} list summaries out of date"
+          + (', rebuilt' if sys.argv[1] == 'rebuild' and mismatches else ''))
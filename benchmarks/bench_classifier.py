@@ -0,0 +1,159 @@
+"""
+Benchmark the compiled classifier against the old per-place indicator scans.
+
+Labels a synthetic corpus of business names and types with the old
+is_cake_shop/is_sweet_shop/is_relevant_place functions (indicator lists and
+type mappings rebuilt on every call), with the compiled per-place
+functions, and, for every category at once, with old per-rule scans against
+one batch relevance.classify() call. Reports the timings and how many
+labels differ from the old functions.
+
+Usage: python benchmarks/bench_classifier.py [places]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from relevance import TYPE_MAPPINGS, classify, is_cake_shop, is_relevant_place, is_sweet_shop
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+WORDS = ('sharma gupta new royal das sen kolkata star shree ganesh maa kali annapurna '
+         'modern national city lake park bazar corner house centre').split()
+INDICATORS = ['cake', 'bakery', 'pastry', 'monginis', 'cafe', 'tea', 'hotel', 'ice cream',
+              'mithai', 'mishtan', 'halwai', 'bhandar', 'bengali sweet', 'school', 'hospital']
+TYPES = ['bakery', 'cafe', 'restaurant', 'food', 'store', 'school', 'hospital', 'health', 'gym',
+         'bank', 'atm', 'pharmacy', 'lodging', 'point_of_interest', 'establishment']
+KEYWORDS = ['cake', 'sweets', 'school', 'hospital', 'gym']
+
+
+def old_is_cake_shop(place):
+    cake_shop_indicators = [
+        'cake', 'bakery', 'bake', 'pastry', 'patisserie',
+        'mio amore', 'monginis', 'ribbons and balloons',
+        'britannia', 'karachi bakery', 'snacks', 'canteen',
+        'cafe', 'coffee', 'tea', 'restaurant', 'hotel',
+        'catering', 'ice cream', 'gelato', 'frozen'
+    ]
+    business_name = place.get('name', '').lower()
+    return any(indicator in business_name for indicator in cake_shop_indicators)
+
+
+def old_is_sweet_shop(place):
+    sweet_shop_indicators = [
+        'mithai', 'mishtan', 'mishtann',
+        'halwai', 'confectioner',
+        'mistan', 'bhandar', 'bhog', 'naivedyam',
+        'bengali sweet', 'gujarati sweet',
+        'indian sweet', 'traditional sweet'
+    ]
+    business_name = place.get('name', '').lower()
+    return any(indicator in business_name for indicator in sweet_shop_indicators)
+
+
+def old_is_relevant_place(place_details, keyword):
+    if not place_details:
+        return False
+    keyword_lower = keyword.lower()
+    name = place_details.get('name', '').lower()
+    types = place_details.get('types', [])
+    if keyword_lower in name:
+        return True
+    if keyword_lower in types:
+        return True
+    type_mappings = {
+        'school': ['school', 'primary_school', 'secondary_school', 'education'],
+        'college': ['university', 'college', 'education'],
+        'hospital': ['hospital', 'doctor', 'health', 'medical_care'],
+        'restaurant': ['restaurant', 'food', 'meal_delivery', 'meal_takeaway'],
+        'shop': ['store', 'shop', 'shopping_mall', 'retail'],
+        'cafe': ['cafe', 'restaurant', 'food', 'coffee'],
+        'gym': ['gym', 'health', 'fitness_center'],
+        'hotel': ['lodging', 'hotel', 'resort'],
+        'bank': ['bank', 'finance', 'atm'],
+        'pharmacy': ['pharmacy', 'drugstore', 'health'],
+        'market': ['market', 'grocery_or_supermarket', 'store'],
+        'salon': ['beauty_salon', 'hair_care', 'spa'],
+        'dentist': ['dentist', 'health', 'doctor'],
+        'park': ['park', 'amusement_park', 'tourist_attraction'],
+        'library': ['library', 'book_store', 'education'],
+        'cinema': ['movie_theater', 'entertainment'],
+        'mall': ['shopping_mall', 'store', 'retail'],
+        'temple': ['hindu_temple', 'place_of_worship', 'religious'],
+        'church': ['church', 'place_of_worship', 'religious'],
+        'mosque': ['mosque', 'place_of_worship', 'religious']
+    }
+    for key, mapped_types in type_mappings.items():
+        if keyword_lower in key or key in keyword_lower:
+            return any(t in types for t in mapped_types)
+    return 'establishment' in types and (
+        keyword_lower in name or
+        any(keyword_lower in t for t in types)
+    )
+
+
+def old_labels(place):
+    """Every category, the way the old code would have to: one scan per rule."""
+    labels = set()
+    if old_is_cake_shop(place):
+        labels.add('cake_shop')
+    if old_is_sweet_shop(place):
+        labels.add('sweet_shop')
+    types = place.get('types', [])
+    for key, mapped_types in TYPE_MAPPINGS.items():
+        if any(t in types for t in mapped_types):
+            labels.add(key)
+    return labels
+
+
+def make_corpus(count):
+    rng = random.Random(7)
+    places = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.35:
+            words.insert(rng.randint(0, len(words)), rng.choice(INDICATORS))
+        places.append({
+            'name': ' '.join(words).title(),
+            'types': rng.sample(TYPES, rng.randint(1, 4))
+        })
+    return places
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    places = make_corpus(COUNT)
+    keywords = [KEYWORDS[i % len(KEYWORDS)] for i in range(COUNT)]
+
+    old_shops, old_shop_time = timed(lambda: [(old_is_cake_shop(p), old_is_sweet_shop(p)) for p in places])
+    new_shops, new_shop_time = timed(lambda: [(is_cake_shop(p), is_sweet_shop(p)) for p in places])
+    old_all, old_all_time = timed(lambda: [old_labels(p) for p in places])
+    labels, batch_time = timed(lambda: classify(places))
+
+    old_relevant, old_relevant_time = timed(
+        lambda: [old_is_relevant_place(p, k) for p, k in zip(places, keywords)])
+    new_relevant, new_relevant_time = timed(
+        lambda: [is_relevant_place(p, k) for p, k in zip(places, keywords)])
+
+    print(f"{COUNT} places")
+    print(f"cake/sweet shop, old scans:      {old_shop_time:.2f}s")
+    print(f"cake/sweet shop, compiled:       {new_shop_time:.2f}s ({old_shop_time / new_shop_time:.1f}x), "
+          f"{sum(a != b for a, b in zip(old_shops, new_shops))} differ")
+    print(f"all categories, old scans:       {old_all_time:.2f}s")
+    print(f"all categories, batch classify:  {batch_time:.2f}s ({old_all_time / batch_time:.1f}x), "
+          f"{sum(a != b for a, b in zip(old_all, labels))} differ")
+    print(f"is_relevant_place, old:          {old_relevant_time:.2f}s")
+    print(f"is_relevant_place, compiled:     {new_relevant_time:.2f}s "
+          f"({old_relevant_time / new_relevant_time:.1f}x), "
+          f"{sum(a != b for a, b in zip(old_relevant, new_relevant))} differ")
+
+
+if __name__ == '__main__':
+    main()
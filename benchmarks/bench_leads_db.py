@@ -0,0 +1,157 @@
+"""
+Benchmark concurrent reads and writes on the saved-leads database.
+
+Runs the same mixed workload twice against a fresh database seeded with a
+saved list: once the way the routes used to work (a new connection per
+request, default rollback journal, no indexes) and once through
+leads_db.Database (per-thread connections, WAL, migrations). Reader threads
+page through a list and compute the list overview, as the saved-list
+endpoints do; writer threads save batches of businesses, as
+/api/save-business does. Reports throughput, latency percentiles and how
+many operations failed with "database is locked".
+
+Usage: python benchmarks/bench_leads_db.py [seconds] [readers] [writers]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+from leads_db import MIGRATIONS, Database, _create_saved_leads
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+READERS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+WRITERS = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+SEED_ROWS = 20000
+BATCH_SIZE = 50
+
+INSERT = '''
+    INSERT INTO saved_leads (list_name, business_name, address, website, distance, status, scraped_emails)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+PAGE = '''
+    SELECT id, business_name, address, phone, website, distance, status,
+           google_maps_url, scraped_emails, created_at, postal_code, lat, lng
+    FROM saved_leads WHERE list_name = ?
+    ORDER BY created_at DESC, id DESC LIMIT 50
+'''
+OVERVIEW = 'SELECT list_name, COUNT(*), MAX(created_at) FROM saved_leads GROUP BY list_name'
+
+
+def make_rows(rng, count, list_name):
+    return [(list_name, f'Business {rng.random():.8f}', f'{i} Road, Kolkata 7000{rng.randint(10, 99)}, India',
+             'https://example.com' if i % 3 == 0 else '', round(rng.random() * 10, 2), 'new', '[]')
+            for i in range(count)]
+
+
+class OldStyle:
+    """A connection per operation, as the routes used to open them."""
+
+    def __init__(self, path):
+        self.path = path
+        conn = sqlite3.connect(path)
+        _create_saved_leads(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    def read(self, list_name):
+        conn = sqlite3.connect(self.path)
+        try:
+            c = conn.cursor()
+            c.execute(PAGE, (list_name,))
+            c.fetchall()
+            c.execute(OVERVIEW)
+            c.fetchall()
+        finally:
+            conn.close()
+
+    def write(self, rows):
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.executemany(INSERT, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class NewStyle:
+    """The shared leads_db.Database."""
+
+    def __init__(self, path):
+        self.db = Database(path, MIGRATIONS)
+        self.db.migrate()
+
+    def read(self, list_name):
+        self.db.query(PAGE, (list_name,))
+        self.db.query(OVERVIEW)
+
+    def write(self, rows):
+        with self.db.transaction() as c:
+            c.executemany(INSERT, rows)
+
+
+def run(store, duration):
+    stop = time.perf_counter() + duration
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def worker(kind, seed):
+        rng = random.Random(seed)
+        own = []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                if kind == 'read':
+                    store.read(f'list{rng.randint(0, 9)}')
+                else:
+                    store.write(make_rows(rng, BATCH_SIZE, f'list{rng.randint(0, 9)}'))
+                own.append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[kind] += 1
+        with lock:
+            latencies[kind].extend(own)
+
+    threads = [threading.Thread(target=worker, args=('read', i)) for i in range(READERS)]
+    threads += [threading.Thread(target=worker, args=('write', 100 + i)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] * 1000
+
+
+def main():
+    rng = random.Random(7)
+    seed = [row for i in range(10) for row in make_rows(rng, SEED_ROWS // 10, f'list{i}')]
+    print(f"{READERS} readers, {WRITERS} writers, {DURATION:.0f}s each, {SEED_ROWS} seeded rows")
+    print(f"{'':<24} {'reads/s':>8} {'writes/s':>9} {'read p50':>9} {'read p95':>9} "
+          f"{'write p95':>10} {'locked':>7}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, cls in (('connection per request', OldStyle), ('leads_db (WAL)', NewStyle)):
+            store = cls(os.path.join(tmp, f'{cls.__name__}.db'))
+            store.write(seed)
+            latencies, errors = run(store, DURATION)
+            print(f"{label:<24} {len(latencies['read']) / DURATION:>8.0f} "
+                  f"{len(latencies['write']) / DURATION:>9.1f} "
+                  f"{percentile(latencies['read'], 0.5):>7.1f}ms {percentile(latencies['read'], 0.95):>7.1f}ms "
+                  f"{percentile(latencies['write'], 0.95):>8.1f}ms {errors['read'] + errors['write']:>7}")
+
+
+if __name__ == '__main__':
+    main()
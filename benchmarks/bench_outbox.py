@@ -0,0 +1,89 @@
+"""
+Benchmark draining the message_logs outbox with several worker processes.
+
+Queues one WhatsApp campaign in a fresh outbox and sends it against a local
+Graph API stub with 1, 2 and 4 worker processes, each a
+whatsapp.CampaignDispatcher with its own connection pool. The send rate is
+set high enough that the stub's latency is the limit, to show how
+throughput scales with processes. A last run kills one of two workers
+partway through and lets the survivor take over its leases once they
+expire. Reports throughput, messages sent and failed, and duplicate
+deliveries seen by the stub.
+
+Usage: python benchmarks/bench_outbox.py [numbers] [latency seconds]
+"""
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from graph_stub import GraphStub
+from outbox import Outbox
+from whatsapp import CampaignDispatcher
+
+NUMBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+# Concurrent sends per process; kept low so one process is clearly the bottleneck
+SENDS_PER_PROCESS = 4
+BATCH_SIZE = 20
+LEASE_SECONDS = 3
+SENDER = '100000000000001'
+TOKEN = 'stub-token'
+
+
+def worker(db_path, base_url):
+    os.environ['WHATSAPP_TOKEN'] = TOKEN
+    dispatcher = CampaignDispatcher(Outbox(db_path, lease_seconds=LEASE_SECONDS), api_base=base_url,
+                                    rate=10000, burst=100, max_workers=SENDS_PER_PROCESS,
+                                    backoff_base=0.2, batch_size=BATCH_SIZE, poll_seconds=0.05)
+    dispatcher.run()
+
+
+def run(processes, kill_one=False):
+    stub = GraphStub(latency=LATENCY).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'outbox.db')
+        outbox = Outbox(db_path)
+        numbers = [f'98{i:08d}' for i in range(NUMBERS)]
+        campaign_id, _ = outbox.enqueue('whatsapp', [{'recipient': f'91{n}', 'body': 'Hello'} for n in numbers],
+                                        sender=SENDER)
+
+        start = time.perf_counter()
+        workers = [multiprocessing.Process(target=worker, args=(db_path, stub.base_url)) for _ in range(processes)]
+        for process in workers:
+            process.start()
+        killed = False
+        while (campaign := outbox.campaign(campaign_id))['status'] == 'running':
+            if kill_one and not killed and campaign['sent'] > NUMBERS // 3:
+                os.kill(workers[0].pid, signal.SIGKILL)
+                killed = True
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    stub.shutdown()
+    stub.server_close()
+    return elapsed, campaign, stub.duplicates()
+
+
+def main():
+    print(f"{NUMBERS} messages, {LATENCY * 1000:.0f}ms stub latency, {SENDS_PER_PROCESS} sends in flight "
+          f"per process, batches of {BATCH_SIZE}, {LEASE_SECONDS}s leases")
+    print(f"{'':<28} {'time':>7} {'msgs/s':>7} {'sent':>6} {'failed':>7} {'duplicates':>11}")
+    for label, processes, kill_one in (('1 process', 1, False), ('2 processes', 2, False),
+                                       ('4 processes', 4, False), ('2 processes, one killed', 2, True)):
+        elapsed, campaign, duplicates = run(processes, kill_one)
+        print(f"{label:<28} {elapsed:>6.1f}s {NUMBERS / elapsed:>7.1f} {campaign['sent']:>6} "
+              f"{campaign['failed']:>7} {duplicates:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark for postal code extraction over a large address corpus.
+
+Compares the old per-address loop (six patterns tried one after another)
+with postal_codes.extract_postal_codes(), and reports how often the two
+disagree. Each is timed REPEAT times and the fastest run is reported, since
+a single run on a busy machine is mostly noise.
+
+Usage: python benchmarks/bench_postal_codes.py [addresses] [repeat]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from postal_codes import extract_postal_codes
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+REPEAT = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+TEMPLATES = [
+    '{n}, Debinibas Rd, Ward Number 22, Dum Dum, Kolkata, West Bengal {pin}, India',
+    'Shop {n}, Lake Market, Kalighat, Kolkata {pin}',
+    '{n} Main St, Springfield, IL {zip}, USA',
+    '{n} High Street, London {uk}, United Kingdom',
+    '{n} Queen St W, Toronto, ON {ca}, Canada',
+    'Damrak {n}, {nl} Amsterdam, Netherlands',
+    'Suite {n}, {four} Sydney NSW',
+    '{n} Unnamed Road, Near Bus Stand',
+]
+
+
+def old_extract(address):
+    postal_patterns = [
+        r'\b\d{6}\b',  # India
+        r'\b\d{5}(?:-\d{4})?\b',  # US
+        r'\b[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}\b',  # UK
+        r'\b[ABCEGHJ-NPRSTVXY]\d[A-Z] ?\d[A-Z]\d\b',  # Canada
+        r'\b\d{4} ?[A-Z]{2}\b',  # Netherlands
+        r'\b\d{4}\b',  # Many countries
+    ]
+    for pattern in postal_patterns:
+        match = re.search(pattern, address, re.IGNORECASE)
+        if match:
+            return match.group().strip()
+    return None
+
+
+def make_corpus(count):
+    rng = random.Random(42)
+    letters = 'ABCEGHJKLMNPRSTVXY'
+    corpus = []
+    for _ in range(count):
+        corpus.append(rng.choice(TEMPLATES).format(
+            n=rng.randint(1, 400),
+            pin=rng.randint(700001, 700160),
+            zip=rng.randint(10000, 99999),
+            uk=f"SW{rng.randint(1, 9)}A {rng.randint(1, 9)}AA",
+            ca=f"{rng.choice(letters)}{rng.randint(1, 9)}V {rng.randint(1, 9)}L{rng.randint(1, 9)}",
+            nl=f"{rng.randint(1000, 9999)} {rng.choice(letters)}{rng.choice(letters)}",
+            four=rng.randint(2000, 2999),
+        ))
+    return corpus
+
+
+def best_of(fn, repeat=REPEAT):
+    """fn()'s result and its fastest time over repeat runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    corpus = make_corpus(COUNT)
+
+    old, old_time = best_of(lambda: [old_extract(address) for address in corpus])
+    new, new_time = best_of(lambda: extract_postal_codes(corpus))
+
+    differing = sum(1 for a, b in zip(old, new) if a != b)
+    print(f"{COUNT} addresses")
+    print(f"six-pattern loop: {old_time:.2f}s ({COUNT / old_time:,.0f}/s)")
+    print(f"combined pattern: {new_time:.2f}s ({COUNT / new_time:,.0f}/s)")
+    print(f"speedup {old_time / new_time:.1f}x, {differing} results differ")
+
+
+if __name__ == '__main__':
+    main()
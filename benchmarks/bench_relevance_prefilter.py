@@ -0,0 +1,62 @@
+"""
+Measure the two-phase relevance check against fetching details for every hit.
+
+Each fixture pairs a search hit (the summary a nearby or text search
+returns, sometimes without types) with the details record for the same
+place. The baseline fetches details for every hit and keeps the ones
+is_relevant_place() accepts; the two-phase pipeline only fetches details
+for hits passes_prefilter() keeps. Reports precision and recall of the
+two-phase pipeline against the baseline, and the details calls avoided,
+per keyword and overall.
+
+The fixtures are hand-built in the shape of Places responses; pass another
+file of the same shape to measure recorded data.
+
+Usage: python benchmarks/bench_relevance_prefilter.py [fixtures.json]
+"""
+import json
+import os
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from relevance import is_relevant_place, passes_prefilter
+
+FIXTURES = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'benchmarks', 'fixtures', 'relevance_places.json')
+
+
+def evaluate(cases):
+    baseline = {case['place_id'] for case in cases if is_relevant_place(case['details'], case['keyword'])}
+    fetched = [case for case in cases if passes_prefilter(case['summary'], case['keyword'])]
+    kept = {case['place_id'] for case in fetched if is_relevant_place(case['details'], case['keyword'])}
+
+    true_positives = len(kept & baseline)
+    return {
+        'hits': len(cases),
+        'relevant': len(baseline),
+        'details_calls': len(fetched),
+        'calls_avoided': len(cases) - len(fetched),
+        'precision': true_positives / len(kept) if kept else 1.0,
+        'recall': true_positives / len(baseline) if baseline else 1.0,
+    }
+
+
+def main():
+    with open(FIXTURES, encoding='utf-8') as f:
+        cases = json.load(f)
+
+    by_keyword = defaultdict(list)
+    for case in cases:
+        by_keyword[case['keyword']].append(case)
+
+    print(f"{'keyword':<10} {'hits':>5} {'relevant':>9} {'details':>8} {'avoided':>8} {'precision':>10} {'recall':>7}")
+    rows = [(keyword, evaluate(group)) for keyword, group in sorted(by_keyword.items())]
+    rows.append(('all', evaluate(cases)))
+    for keyword, stats in rows:
+        print(f"{keyword:<10} {stats['hits']:>5} {stats['relevant']:>9} {stats['details_calls']:>8} "
+              f"{stats['calls_avoided']:>8} {stats['precision']:>10.2f} {stats['recall']:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
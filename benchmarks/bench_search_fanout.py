@@ -0,0 +1,128 @@
+"""
+Benchmark the /api/search fan-out against a local stub of the Places API.
+
+The stub answers geocode, nearby search and place details requests after a
+fixed delay, so the numbers show how wall-clock time grows with the number
+of locations for the serial path (max_workers=1) and the concurrent one.
+
+In production the fan-out is capped three ways: SEARCH_PER_HOST_LIMIT (8)
+calls in flight to the Maps host, SEARCH_MAX_WORKERS (16) threads, and the
+quota.py token buckets, which let through 50 calls a second per API after a
+burst of 20. The buckets are what flatten the speedup as locations grow:
+with every default and 50 ms latency we measured 5.5x, 4.1x, 3.3x and 3.1x
+at 1, 2, 5 and 10 locations, because ten locations' 200 details calls take
+four seconds at 50 a second however many are in flight. To show how the
+fan-out itself scales, the benchmark lifts all three caps unless they are
+set in the environment (5.6x, 8.5x, 14.9x and 14.3x in the same run); set
+SEARCH_PER_HOST_LIMIT=8 SEARCH_MAX_WORKERS=16 MAPS_RATE_DETAILS=50
+MAPS_BURST_DETAILS=20 (and the same for GEOCODE and NEARBY) to measure the
+production limits instead. At 5 ms latency the client's own per-call work
+dominates and the lifted caps give 2x to 4x.
+
+Usage: python benchmarks/bench_search_fanout.py [latency_ms] [results_per_location]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LATENCY = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.05
+RESULTS_PER_LOCATION = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+# Caps lifted so the fan-out, not a limiter, sets the timings
+BENCH_LIMITS = {'SEARCH_PER_HOST_LIMIT': '64', 'SEARCH_MAX_WORKERS': '64'}
+for api in ('GEOCODE', 'NEARBY', 'DETAILS'):
+    BENCH_LIMITS[f'MAPS_RATE_{api}'] = BENCH_LIMITS[f'MAPS_BURST_{api}'] = '1000000'
+
+
+class StubPlacesHandler(BaseHTTPRequestHandler):
+    """Minimal Places/Geocoding API that sleeps before every answer."""
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        time.sleep(LATENCY)
+
+        if parsed.path.endswith('/geocode/json'):
+            seed = sum(map(ord, params.get('address', ''))) % 100
+            body = {'status': 'OK', 'results': [{'geometry': {'location': {'lat': 22.5 + seed / 1000, 'lng': 88.3}}}]}
+        elif parsed.path.endswith('/nearbysearch/json'):
+            lat, lng = map(float, params['location'].split(','))
+            body = {'results': [
+                {
+                    'place_id': f"{params['location']}:{i}",
+                    'geometry': {'location': {'lat': lat + i / 10000, 'lng': lng}},
+                }
+                for i in range(RESULTS_PER_LOCATION)
+            ]}
+        elif parsed.path.endswith('/details/json'):
+            place_id = params['place_id']
+            body = {'result': {
+                'name': f'Business {place_id}',
+                'formatted_address': f'{place_id} Street, Kolkata 700001',
+                'business_status': 'OPERATIONAL',
+            }}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under a wide fan-out
+    # and the client's SYN retry adds a second to the timings
+    request_queue_size = 256
+
+
+def main():
+    server = StubServer(('127.0.0.1', 0), StubPlacesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['GOOGLE_MAPS_API_BASE'] = f'http://127.0.0.1:{server.server_port}'
+    os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'stub-key')
+
+    # The backend creates data/leads.db relative to the working directory
+    os.chdir(tempfile.mkdtemp())
+    # Measure the API calls themselves, not the geocode cache
+    os.environ['GEOCODE_CACHE_PATH'] = os.path.join(os.getcwd(), 'geocode_cache.db')
+    os.environ['GEOCODE_CACHE_TTL'] = os.environ['GEOCODE_NEGATIVE_TTL'] = '0'
+    os.environ['PLACE_CACHE_PATH'] = os.path.join(os.getcwd(), 'place_cache.db')
+    # Read by concurrency.py and quota.py at import, so set before the backend is imported
+    for name, value in BENCH_LIMITS.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, os.path.join(ROOT, 'backend'))
+    import app as backend
+
+    print(f"stub latency {LATENCY * 1000:.0f} ms, {RESULTS_PER_LOCATION} results per location, "
+          f"{os.environ['SEARCH_PER_HOST_LIMIT']} calls per host, {os.environ['SEARCH_MAX_WORKERS']} workers, "
+          f"{float(os.environ['MAPS_RATE_DETAILS']):g} details calls/s")
+    print(f"{'locations':>9} {'serial (s)':>11} {'concurrent (s)':>15} {'speedup':>8}")
+    for count in (1, 2, 5, 10):
+        locations = [f'7000{i:02d}' for i in range(count)]
+        timings = []
+        for workers in (1, None):
+            backend.place_cache.clear()
+            start = time.perf_counter()
+            results, _ = backend.run_search('sweets', locations, 3000, max_workers=workers)
+            timings.append(time.perf_counter() - start)
+        serial, concurrent = timings
+        print(f"{count:>9} {serial:>11.2f} {concurrent:>15.2f} {serial / concurrent:>7.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
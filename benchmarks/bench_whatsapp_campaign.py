@@ -0,0 +1,86 @@
+"""
+Benchmark sending a WhatsApp campaign against a local stub of the Graph API.
+
+Sends the same campaign twice: once the way /api/send-whatsapp used to, one
+blocking requests.post per number with a new connection each time and no
+retries, and once through whatsapp.CampaignDispatcher and its outbox. The
+stub answers after a fixed latency and throttles or fails a share of
+requests. Reports wall time, messages delivered and failed, connections
+opened and duplicate deliveries.
+
+Usage: python benchmarks/bench_whatsapp_campaign.py [numbers] [latency seconds] [send rate]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from graph_stub import GraphStub
+from outbox import Outbox
+from whatsapp import CampaignDispatcher
+
+NUMBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+SEND_RATE = float(sys.argv[3]) if len(sys.argv) > 3 else 80
+SENDER = '100000000000001'
+TOKEN = 'stub-token'
+
+
+def make_numbers(count):
+    return [f'98{i:08d}' for i in range(count)]
+
+
+def old_send(base_url, numbers):
+    """The previous send_whatsapp loop, minus Flask and the debug prints."""
+    headers = {'Authorization': f'Bearer {TOKEN}', 'Content-Type': 'application/json'}
+    sent = failed = 0
+    for number in numbers:
+        cleaned = ''.join(filter(str.isdigit, number))
+        if not cleaned.startswith('91'):
+            cleaned = '91' + cleaned
+        payload = {'messaging_product': 'whatsapp', 'to': cleaned, 'type': 'text', 'text': {'body': 'Hello'}}
+        try:
+            response = requests.post(f'{base_url}/{SENDER}/messages', headers=headers, json=payload)
+            if response.status_code == 200:
+                sent += 1
+            else:
+                failed += 1
+        except Exception:
+            failed += 1
+    return sent, failed
+
+
+def new_send(base_url, numbers):
+    with tempfile.TemporaryDirectory() as tmp:
+        dispatcher = CampaignDispatcher(Outbox(os.path.join(tmp, 'outbox.db')), api_base=base_url,
+                                        rate=SEND_RATE, backoff_base=0.2, poll_seconds=0.05)
+        campaign_id = dispatcher.submit(SENDER, TOKEN, numbers, 'Hello')
+        while (campaign := dispatcher.get(campaign_id))['status'] == 'running':
+            time.sleep(0.05)
+        dispatcher.stop()
+        return campaign['sent'], campaign['failed']
+
+
+def main():
+    numbers = make_numbers(NUMBERS)
+    print(f"{NUMBERS} numbers, {LATENCY * 1000:.0f}ms stub latency, 3% throttled, 1% server errors, "
+          f"send rate {SEND_RATE:.0f}/s")
+    print(f"{'':<30} {'time':>7} {'msgs/s':>7} {'sent':>6} {'failed':>7} {'connections':>12} {'duplicates':>11}")
+    for label, fn in (('old (blocking loop)', old_send), ('dispatcher (pooled, limited)', new_send)):
+        stub = GraphStub(latency=LATENCY).start()
+        start = time.perf_counter()
+        sent, failed = fn(stub.base_url, numbers)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30} {elapsed:>6.1f}s {NUMBERS / elapsed:>7.1f} {sent:>6} {failed:>7} "
+              f"{stub.stats['connections']:>12} {stub.duplicates():>11}")
+        stub.shutdown()
+        stub.server_close()
+
+
+if __name__ == '__main__':
+    main()
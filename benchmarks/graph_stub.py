@@ -0,0 +1,120 @@
+"""
+A local stand-in for the WhatsApp Cloud API's send endpoint.
+
+Answers POST /<version>/<phone number id>/messages like the Graph API does,
+after a fixed latency, and fails a share of requests with 429 (with
+Retry-After) or 500 so retries get exercised. It counts what it received,
+including numbers that were sent the same message more than once.
+
+Run it on its own and point the app at it:
+
+    python benchmarks/graph_stub.py --port 8999
+    WHATSAPP_API_BASE=http://127.0.0.1:8999/v17.0 python app.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GraphStub(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when many senders connect at once
+    request_queue_size = 128
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.05, throttle_rate=0.03, error_rate=0.01, seed=1):
+        super().__init__(address, GraphHandler)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.delivered = Counter()
+        self.stats = Counter()
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v17.0'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # A sender that was killed mid-request; anything else is worth the traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def duplicates(self):
+        with self.lock:
+            return sum(count - 1 for count in self.delivered.values() if count > 1)
+
+
+class GraphHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        # Once per connection, however many requests are made on it
+        super().setup()
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(server.latency)
+        with server.lock:
+            server.stats['requests'] += 1
+            roll = server.rng.random()
+        if not self.path.endswith('/messages') or not self.headers.get('Authorization'):
+            self._reply(401, {'error': {'message': 'Invalid OAuth access token', 'code': 190}})
+        elif roll < server.throttle_rate:
+            with server.lock:
+                server.stats['throttled'] += 1
+            self._reply(429, {'error': {'message': 'Rate limit hit', 'code': 130429}}, {'Retry-After': '0.2'})
+        elif roll < server.throttle_rate + server.error_rate:
+            with server.lock:
+                server.stats['errors'] += 1
+            self._reply(500, {'error': {'message': 'Something went wrong', 'code': 131000}})
+        else:
+            with server.lock:
+                server.delivered[payload.get('to')] += 1
+            self._reply(200, {
+                'messaging_product': 'whatsapp',
+                'contacts': [{'input': payload.get('to'), 'wa_id': payload.get('to')}],
+                'messages': [{'id': f'wamid.{uuid.uuid4().hex}'}]
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a stub of the WhatsApp Cloud API.')
+    parser.add_argument('--port', type=int, default=8999)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--throttle-rate', type=float, default=0.03)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+    server = GraphStub(('127.0.0.1', args.port), args.latency, args.throttle_rate, args.error_rate)
+    print(f"Graph API stub on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
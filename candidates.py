@@ -0,0 +1,129 @@
+"""
+Candidate collection ahead of place-details calls.
+
+A details call is the most expensive step of a search, yet nearby search,
+text search and neighbouring locations keep returning the same places.
+CandidateSet gathers the hits from every source and location first, keeps
+one candidate per place_id, and applies the cheap checks that only need the
+search hit itself (geometry, radius, name/type) before any details call is
+paid for. Its report says how many details calls that saved compared to
+fetching one per hit.
+"""
+import threading
+
+from geo import distances_from
+
+
+class Candidate:
+    """
+    One unique place and every search origin that found it.
+
+    origins holds (location, lat, lng, distance_km) in the order the place
+    was found, so callers that need a particular origin (such as an exact
+    postal code search) can pick it after the details come back.
+    """
+
+    __slots__ = ('place', 'source', 'origins')
+
+    def __init__(self, place, source):
+        self.place = place
+        self.source = source
+        self.origins = []
+
+    @property
+    def place_id(self):
+        return self.place['place_id']
+
+    @property
+    def origin(self):
+        """The first (location, lat, lng, distance_km) that found the place."""
+        return self.origins[0]
+
+
+class CandidateSet:
+    """
+    Deduplicates and prefilters search hits across sources and locations.
+
+    With per_origin, a place found from two locations is kept once per
+    location instead; for callers that must judge each location's hits on
+    their own before every location has been searched.
+    """
+
+    def __init__(self, per_origin=False):
+        self.per_origin = per_origin
+        self._candidates = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'duplicates': 0,
+            'no_geometry': 0,
+            'out_of_radius': 0,
+            'filtered': 0,
+            'by_source': {}
+        }
+
+    def add(self, places, location, lat, lng, source, radius_km=None, prefilter=None):
+        """
+        Add one batch of search hits found around (lat, lng).
+
+        Hits without a place_id or geometry, further than radius_km away
+        or rejected by prefilter(place) are dropped; a place already
+        collected only gains the new origin. Returns the candidates that
+        are new in this batch, in the order they were found.
+        """
+        places = list(places)
+        located = []
+        no_geometry = 0
+        for place in places:
+            point = (place.get('geometry') or {}).get('location') or {}
+            if not place.get('place_id') or 'lat' not in point or 'lng' not in point:
+                no_geometry += 1
+                continue
+            located.append((place, (point['lat'], point['lng'])))
+
+        # The whole batch's distances in one call
+        distances = distances_from((lat, lng), [coords for _, coords in located]) / 1000
+
+        new = []
+        with self._lock:
+            self.stats['hits'] += len(places)
+            self.stats['no_geometry'] += no_geometry
+            counts = self.stats['by_source'].setdefault(source, {'hits': 0, 'new': 0})
+            counts['hits'] += len(places)
+
+            for (place, _), distance in zip(located, distances):
+                distance = float(distance)
+                if radius_km is not None and distance > radius_km:
+                    self.stats['out_of_radius'] += 1
+                    continue
+                key = (place['place_id'], location) if self.per_origin else place['place_id']
+                candidate = self._candidates.get(key)
+                if candidate is not None:
+                    self.stats['duplicates'] += 1
+                    candidate.origins.append((location, lat, lng, distance))
+                    continue
+                if prefilter is not None and not prefilter(place):
+                    self.stats['filtered'] += 1
+                    continue
+                candidate = Candidate(place, source)
+                candidate.origins.append((location, lat, lng, distance))
+                self._candidates[key] = candidate
+                counts['new'] += 1
+                new.append(candidate)
+        return new
+
+    def __len__(self):
+        return len(self._candidates)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._candidates.values()))
+
+    def report(self):
+        """The collection counts and the details calls saved versus one per hit."""
+        with self._lock:
+            report = dict(self.stats, by_source={source: dict(counts)
+                                                 for source, counts in self.stats['by_source'].items()})
+            report['candidates'] = len(self._candidates)
+        report['details_calls_saved'] = report['hits'] - report['candidates']
+        return report
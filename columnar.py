@@ -0,0 +1,281 @@
+"""
+Typed columnar exports (Parquet, Arrow IPC) of saved lists.
+
+The spreadsheet exports are meant for people: distances become "x.xx km"
+strings and list-valued fields are joined or dropped, so anything reading
+them back has to re-parse text. These exports keep every field typed under
+one schema for both stores, the backend's saved_leads table and the root
+app's saved lists:
+
+- distance_km is a float in kilometres, as both stores already hold it,
+- lists (emails, types, opening hours) stay lists,
+- created_at is a UTC timestamp.
+
+Rows are read and written in batches, so memory stays flat however large
+the export is. With since, only rows saved at or after that time are
+exported; the export's watermark (the latest created_at it holds) is the
+since for the next run. Rows saved in the same second as the watermark are
+exported again rather than risk missing any, so consumers should dedupe on
+(source, list_id, row_id).
+
+    python columnar.py saved_leads|saved_lists [-f parquet|arrow] [--since TS] [--list NAME] [--db PATH] -o FILE
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import send_file
+
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+COLUMNAR_BATCH_SIZE = 5000
+
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file'
+}
+
+SCHEMA = pa.schema([
+    ('source', pa.string()),
+    ('list_id', pa.string()),
+    ('list_name', pa.string()),
+    # saved_leads.id, or the item's position in a saved list
+    ('row_id', pa.int64()),
+    ('place_id', pa.string()),
+    ('business_name', pa.string()),
+    ('address', pa.string()),
+    ('postal_code', pa.string()),
+    ('phone', pa.string()),
+    ('website', pa.string()),
+    ('emails', pa.list_(pa.string())),
+    ('distance_km', pa.float64()),
+    ('lat', pa.float64()),
+    ('lng', pa.float64()),
+    ('status', pa.string()),
+    ('google_maps_url', pa.string()),
+    ('types', pa.list_(pa.string())),
+    ('rating', pa.float64()),
+    ('user_ratings_total', pa.int64()),
+    ('opening_hours', pa.list_(pa.string())),
+    ('created_at', pa.timestamp('us', tz='UTC'))
+])
+
+
+def parse_since(since):
+    """An ISO timestamp as an aware UTC datetime; naive ones are taken as UTC."""
+    if since is None or isinstance(since, datetime):
+        value = since
+    else:
+        value = datetime.fromisoformat(str(since).strip().replace('Z', '+00:00'))
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc) if value is not None else None
+
+
+def _float(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _strings(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+def _text(value):
+    return str(value) if value not in (None, '') else None
+
+
+def iter_saved_leads(db, since=None, list_name=None, batch_size=COLUMNAR_BATCH_SIZE):
+    """
+    Records of the backend's saved_leads, by id, a batch at a time.
+
+    db is a leads_db.Database; saved_leads.created_at is SQLite's
+    CURRENT_TIMESTAMP, which is UTC.
+    """
+    clauses, params = ['id > ?'], [0]
+    since = parse_since(since)
+    if since is not None:
+        clauses.append('created_at >= ?')
+        params.append(since.strftime('%Y-%m-%d %H:%M:%S'))
+    if list_name:
+        clauses.append('list_name = ?')
+        params.append(list_name)
+
+    while True:
+        rows = db.query(f'''
+            SELECT id, list_name, business_name, address, postal_code, phone, website,
+                   scraped_emails, distance, lat, lng, status, google_maps_url, created_at
+            FROM saved_leads
+            WHERE {' AND '.join(clauses)}
+            ORDER BY id
+            LIMIT ?
+        ''', params + [batch_size])
+        for row in rows:
+            created_at = datetime.strptime(row[13], '%Y-%m-%d %H:%M:%S') if row[13] else None
+            yield {
+                'source': 'saved_leads',
+                'list_id': row[1],
+                'list_name': row[1],
+                'row_id': row[0],
+                'business_name': _text(row[2]),
+                'address': _text(row[3]),
+                'postal_code': _text(row[4]),
+                'phone': _text(row[5]),
+                'website': _text(row[6]),
+                'emails': _strings(json.loads(row[7]) if row[7] else []),
+                'distance_km': _float(row[8]),
+                'lat': _float(row[9]),
+                'lng': _float(row[10]),
+                'status': _text(row[11]),
+                'google_maps_url': _text(row[12]),
+                'created_at': created_at.replace(tzinfo=timezone.utc) if created_at else None
+            }
+        if len(rows) < batch_size:
+            return
+        params[0] = rows[-1][0]
+
+
+def iter_saved_list_items(store, since=None, list_id=None):
+    """
+    Records of the root app's saved lists (a list_store.ListStore).
+
+    Their results carry distance in kilometres, as /api/search returns it,
+    and the list's created_at is in server local time, which is converted.
+    """
+    since = parse_since(since)
+    for saved_list in store.overview():
+        if list_id and saved_list['id'] != list_id:
+            continue
+        created_at = datetime.fromisoformat(saved_list['createdAt'])
+        created_at = created_at.astimezone(timezone.utc)
+        if since is not None and created_at < since:
+            continue
+        for position, item in enumerate(store.iter_items(saved_list['id'])):
+            yield {
+                'source': 'saved_lists',
+                'list_id': saved_list['id'],
+                'list_name': saved_list['name'],
+                'row_id': position,
+                'place_id': _text(item.get('place_id')),
+                'business_name': _text(item.get('business_name') or item.get('name')),
+                'address': _text(item.get('address')),
+                'postal_code': _text(item.get('postal_code') or item.get('pincode')),
+                'phone': _text(item.get('phone')),
+                'website': _text(item.get('website')),
+                'emails': _strings(item.get('emails') or item.get('email')),
+                'distance_km': _float(item.get('distance')),
+                'lat': _float(item.get('lat')),
+                'lng': _float(item.get('lng')),
+                'status': _text(item.get('status') or item.get('business_status')),
+                'google_maps_url': _text(item.get('google_maps_url')),
+                'types': _strings(item.get('types')),
+                'rating': _float(item.get('rating')),
+                'user_ratings_total': _int(item.get('user_ratings_total')),
+                'opening_hours': _strings(item.get('opening_hours')),
+                'created_at': created_at
+            }
+
+
+def write_columnar(records, fmt, sink, batch_size=COLUMNAR_BATCH_SIZE):
+    """
+    Write records to sink (a path or file) as Parquet or an Arrow IPC file.
+
+    Returns (rows written, watermark), where the watermark is the latest
+    created_at written, or None if nothing was.
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format {fmt}")
+
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, SCHEMA, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(sink, SCHEMA)
+
+    rows = 0
+    watermark = None
+    batch = []
+    try:
+        for record in records:
+            batch.append(record)
+            created_at = record.get('created_at')
+            if created_at is not None and (watermark is None or created_at > watermark):
+                watermark = created_at
+            if len(batch) == batch_size:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=SCHEMA))
+                rows += len(batch)
+                batch = []
+        if batch or rows == 0:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=SCHEMA))
+            rows += len(batch)
+    finally:
+        writer.close()
+    return rows, watermark
+
+
+def columnar_response(records, fmt, filename):
+    """A download response of records as Parquet or Arrow, with its watermark in X-Export-Watermark."""
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format {fmt}")
+    # Deleted as soon as the response closes it
+    output = tempfile.TemporaryFile()
+    try:
+        rows, watermark = write_columnar(records, fmt, output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    response = send_file(output, mimetype=MIMETYPES[fmt], as_attachment=True,
+                         download_name=f"{filename}.{fmt}")
+    response.headers['X-Export-Rows'] = str(rows)
+    if watermark is not None:
+        response.headers['X-Export-Watermark'] = watermark.isoformat()
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export saved lists as Parquet or Arrow.')
+    parser.add_argument('source', choices=('saved_leads', 'saved_lists'),
+                        help="the backend's saved_leads table or the root app's saved lists")
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('-f', '--format', choices=COLUMNAR_FORMATS, default='parquet')
+    parser.add_argument('--since', help='only rows saved at or after this ISO timestamp (UTC if naive)')
+    parser.add_argument('--list', dest='list_name', help='only this list (a list name, or a saved list id)')
+    parser.add_argument('--db', help='database file; defaults to the one the app uses')
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    if args.source == 'saved_leads':
+        sys.path.insert(0, os.path.join(root, 'backend'))
+        from leads_db import LEADS_DB_PATH, Database
+        db = Database(args.db or LEADS_DB_PATH)
+        db.migrate()
+        records = iter_saved_leads(db, args.since, args.list_name)
+    else:
+        from list_store import LIST_STORE_PATH, ListStore
+        records = iter_saved_list_items(ListStore(args.db or LIST_STORE_PATH), args.since, args.list_name)
+
+    rows, watermark = write_columnar(records, args.format, args.output)
+    print(f"Wrote {rows} rows to {args.output}")
+    if watermark is not None:
+        print(f"Next --since: {watermark.isoformat()}")
+
+
+if __name__ == '__main__':
+    main()
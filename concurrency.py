@@ -0,0 +1,108 @@
+"""
+Bounded fan-out helpers for the blocking HTTP calls made during a search.
+
+Geocoding, nearby search and place details are all plain blocking calls, so
+we run them on a thread pool and cap how many are in flight per remote host.
+The per-host limits are shared by every request in the process, so several
+concurrent searches cannot flood the same API between them.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+MAX_WORKERS = int(os.getenv('SEARCH_MAX_WORKERS', 16))
+PER_HOST_LIMIT = int(os.getenv('SEARCH_PER_HOST_LIMIT', 8))
+
+MAPS_HOST = 'maps.googleapis.com'
+
+
+class HostLimiter:
+    """
+    Caps the number of in-flight calls per host with one semaphore each.
+
+    A host's semaphore only exists while a call holds or waits for one of
+    its slots, so crawling many domains doesn't leave one behind per domain.
+    """
+
+    def __init__(self, per_host=PER_HOST_LIMIT):
+        self.per_host = per_host
+        # host: [semaphore, callers holding or waiting for a slot]
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, host):
+        """Hold one of the host's slots for the duration of the block."""
+        if not host:
+            yield
+            return
+        with self._lock:
+            entry = self._semaphores.get(host)
+            if entry is None:
+                entry = self._semaphores[host] = [threading.BoundedSemaphore(self.per_host), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._semaphores[host]
+
+
+# Shared by every request handled by this process
+host_limiter = HostLimiter()
+
+
+def host_of(url):
+    """Return the host part of a URL, or the value itself if it has none."""
+    return urlparse(url).netloc or url
+
+
+def bounded_imap(fn, items, host=None, max_workers=None, limiter=None):
+    """
+    Call fn on every item concurrently, yielding the results in input order.
+
+    At most max_workers calls run at once, and when host is given each call
+    also holds one of that host's slots in the limiter. Each result is
+    yielded as soon as it and the ones before it are done. Exceptions are not
+    swallowed here, so fn should handle (and log) its own per-item errors the
+    same way the serial loops did. Don't pass host when fn already takes a
+    slot for that host itself, or the pool can deadlock on the semaphore.
+    Each call runs in a copy of the caller's context, so context variables
+    such as the request's Maps budget carry over to the pool threads.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    limiter = limiter or host_limiter
+    workers = max(1, min(max_workers or MAX_WORKERS, len(items)))
+
+    def call(item):
+        with limiter.slot(host):
+            return fn(item)
+
+    if workers == 1:
+        for item in items:
+            yield call(item)
+        return
+
+    # One copy per call: a context can't be entered by two threads at once
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(lambda context, item: context.run(call, item), contexts, items)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit() that runs fn in a copy of the caller's context."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def bounded_map(fn, items, host=None, max_workers=None, limiter=None):
+    """Like bounded_imap(), but return all the results as a list."""
+    return list(bounded_imap(fn, items, host=host, max_workers=max_workers, limiter=limiter))
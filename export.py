@@ -0,0 +1,203 @@
+"""
+Streaming exports of search results and saved lists.
+
+Exports used to build a DataFrame of every row, write the whole workbook to
+memory, measure each column by converting all of it to strings, and send
+the file base64-encoded inside JSON: several full copies of the data and a
+third more bytes on the wire. Here records are consumed one at a time from
+any iterable, so a saved list can be exported straight from storage:
+
+- CSV and NDJSON are generated chunk by chunk as the response is sent.
+- xlsx is written with xlsxwriter's constant_memory mode, which flushes each
+  row to disk as it is written, into a temporary file that is streamed back
+  and deleted afterwards; a zip can't be produced incrementally.
+- Column widths are estimated from the first rows instead of every cell.
+"""
+import base64
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+
+import xlsxwriter
+from flask import Response, send_file
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'ndjson')
+# Rows looked at to size the xlsx columns
+EXPORT_WIDTH_SAMPLE = int(os.getenv('EXPORT_WIDTH_SAMPLE', 500))
+MAX_COLUMN_WIDTH = 60
+# Rows per chunk of a streamed CSV or NDJSON response
+STREAM_CHUNK_ROWS = 500
+
+MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def _meters_as_km(value):
+    return f"{value / 1000:.2f} km" if isinstance(value, (int, float)) else ''
+
+
+def _km(value):
+    return f"{value:.2f} km" if isinstance(value, (int, float)) else ''
+
+
+# (record key, header, formatter or None); the layout of the search results export
+RESULT_COLUMNS = [
+    ('business_name', 'Business Name', None),
+    ('address', 'Address', None),
+    ('phone', 'Phone', None),
+    ('website', 'Website', None),
+    ('email', 'Email', None),
+    ('distance', 'Distance (m)', _meters_as_km),
+    ('status', 'Status', None),
+    ('google_maps_url', 'Google Maps URL', None)
+]
+
+# Saved leads in the backend database, whose distances are already in km
+SAVED_LEAD_COLUMNS = [
+    ('business_name', 'Business Name', None),
+    ('address', 'Address', None),
+    ('postal_code', 'Postal Code', None),
+    ('phone', 'Phone', None),
+    ('website', 'Website', None),
+    ('scraped_emails', 'Emails', None),
+    ('distance', 'Distance', _km),
+    ('status', 'Status', None),
+    ('google_maps_url', 'Google Maps URL', None),
+    ('created_at', 'Saved At', None)
+]
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def to_cells(record, columns):
+    """One record as the row of cells the columns describe."""
+    return [formatter(record.get(key)) if formatter else _cell(record.get(key))
+            for key, _, formatter in columns]
+
+
+def estimate_widths(headers, rows):
+    """Column widths from the headers and a sample of rows, capped at MAX_COLUMN_WIDTH."""
+    widths = [len(header) for header in headers]
+    for row in rows:
+        for index, value in enumerate(row):
+            widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def write_xlsx(records, columns, fileobj, sheet_name='Search Results'):
+    """Write records to fileobj as a workbook, holding only one sample of rows in memory."""
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True, 'strings_to_urls': False})
+    worksheet = workbook.add_worksheet(sheet_name)
+    bold = workbook.add_format({'bold': True})
+    headers = [header for _, header, _ in columns]
+
+    rows = (to_cells(record, columns) for record in records)
+    sample = list(itertools.islice(rows, EXPORT_WIDTH_SAMPLE))
+    for index, width in enumerate(estimate_widths(headers, sample)):
+        worksheet.set_column(index, index, width)
+
+    # constant_memory only allows writing rows in order, each exactly once
+    worksheet.write_row(0, 0, headers, bold)
+    for row_number, row in enumerate(itertools.chain(sample, rows), start=1):
+        worksheet.write_row(row_number, 0, row)
+    workbook.close()
+
+
+def iter_csv(records, columns):
+    """CSV bytes in chunks of STREAM_CHUNK_ROWS rows, with a BOM so Excel reads it as UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([header for _, header, _ in columns])
+    for count, record in enumerate(records, start=1):
+        writer.writerow(to_cells(record, columns))
+        if count % STREAM_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(records):
+    """Each record in full as one JSON line, in chunks of STREAM_CHUNK_ROWS records."""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, ensure_ascii=False, default=str))
+        if len(lines) == STREAM_CHUNK_ROWS:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def safe_filename(name):
+    """name reduced to characters that are safe in a Content-Disposition header."""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_.') or 'export'
+
+
+def _check_format(fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt}")
+
+
+def export_base64(records, columns, fmt, filename, sheet_name='Search Results'):
+    """
+    The whole export as the JSON body /api/export-excel has always returned:
+    {"status": "success", "file": <base64>, "filename": <name.fmt>}.
+
+    Kept for existing clients; the file is built in memory and is a third
+    larger on the wire, so prefer export_response() for anything large.
+    """
+    _check_format(fmt)
+    if fmt == 'xlsx':
+        output = io.BytesIO()
+        write_xlsx(records, columns, output, sheet_name)
+        data = output.getvalue()
+    else:
+        data = b''.join(iter_csv(records, columns) if fmt == 'csv' else iter_ndjson(records))
+    return {
+        'status': 'success',
+        'file': base64.b64encode(data).decode(),
+        'filename': f"{safe_filename(filename)}.{fmt}"
+    }
+
+
+def export_response(records, columns, fmt, filename, sheet_name='Search Results'):
+    """
+    A download response of records in fmt, one of EXPORT_FORMATS.
+
+    filename is without extension. records may be a generator reading from
+    storage; CSV and NDJSON pull from it while the response is being sent.
+    """
+    _check_format(fmt)
+    download_name = f"{safe_filename(filename)}.{fmt}"
+
+    if fmt == 'xlsx':
+        # Deleted as soon as the response closes it
+        output = tempfile.TemporaryFile()
+        try:
+            write_xlsx(records, columns, output, sheet_name)
+            output.seek(0)
+        except Exception:
+            output.close()
+            raise
+        return send_file(output, mimetype=MIMETYPES['xlsx'], as_attachment=True, download_name=download_name)
+
+    body = iter_csv(records, columns) if fmt == 'csv' else iter_ndjson(records)
+    return Response(body, mimetype=MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
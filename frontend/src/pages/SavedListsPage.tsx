@@ -24,6 +24,13 @@ import {
   TableCell,
   TableBody,
   IconButton,
+  Checkbox,
+  FormControlLabel,
+  FormControl,
+  InputLabel,
+  Select,
+  MenuItem,
+  TextField,
 } from '@mui/material';
 import {
   Delete as DeleteIcon,
@@ -55,9 +62,30 @@ interface SavedList {
   count: number;
   created_at: string;
   description?: string;
-  leads?: SavedLead[];
 }
 
+interface ListItemsPage {
+  items: SavedLead[];
+  nextCursor: string | null;
+  total?: number;
+}
+
+interface ItemFilters {
+  hasWebsite: boolean;
+  hasEmail: boolean;
+  postalCode: string;
+  sort: string;
+}
+
+const PAGE_SIZE = 50;
+
+const DEFAULT_FILTERS: ItemFilters = {
+  hasWebsite: false,
+  hasEmail: false,
+  postalCode: '',
+  sort: 'newest',
+};
+
 const SavedListsPage: React.FC = () => {
   const [lists, setLists] = useState<SavedList[]>([]);
   const [loading, setLoading] = useState(true);
@@ -66,6 +94,14 @@ const SavedListsPage: React.FC = () => {
   const [viewDialogOpen, setViewDialogOpen] = useState(false);
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
   const [selectedList, setSelectedList] = useState<SavedList | null>(null);
+  // Only the visible page of the open list is held; the cursors of the pages
+  // before it are kept so Previous can go back without offsets
+  const [items, setItems] = useState<SavedLead[]>([]);
+  const [itemsLoading, setItemsLoading] = useState(false);
+  const [pageCursors, setPageCursors] = useState<(string | null)[]>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [total, setTotal] = useState(0);
+  const [filters, setFilters] = useState<ItemFilters>(DEFAULT_FILTERS);
 
   useEffect(() => {
     fetchLists();
@@ -79,7 +115,7 @@ const SavedListsPage: React.FC = () => {
         throw new Error('Failed to fetch lists');
       }
       const data = await response.json();
-      setLists(data.lists || []);
+      setLists(Array.isArray(data) ? data : data.lists || []);
     } catch (error) {
       console.error('Error fetching lists:', error);
       showNotification('Error fetching saved lists', 'error');
@@ -106,7 +142,10 @@ const SavedListsPage: React.FC = () => {
 
   const handleDownload = async (list: SavedList) => {
     try {
-      const response = await fetch(`/api/lists/${list.id}/download`);
+      const response = await fetch(`/api/saved-lists/${encodeURIComponent(list.name)}/export?format=xlsx`);
+      if (!response.ok) {
+        throw new Error('Failed to download list');
+      }
       const blob = await response.blob();
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
@@ -122,9 +161,63 @@ const SavedListsPage: React.FC = () => {
     }
   };
 
+  const fetchItems = async (list: SavedList, cursor: string | null, itemFilters: ItemFilters) => {
+    setItemsLoading(true);
+    try {
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE), sort: itemFilters.sort });
+      if (cursor) params.set('cursor', cursor);
+      if (itemFilters.hasWebsite) params.set('hasWebsite', 'true');
+      if (itemFilters.hasEmail) params.set('hasEmail', 'true');
+      if (itemFilters.postalCode.trim()) params.set('postalCode', itemFilters.postalCode.trim());
+
+      const response = await fetch(`/api/saved-lists/${encodeURIComponent(list.name)}/items?${params}`);
+      if (!response.ok) {
+        throw new Error('Failed to fetch list items');
+      }
+      const page: ListItemsPage = await response.json();
+      setItems(page.items);
+      setNextCursor(page.nextCursor);
+      if (page.total !== undefined) {
+        setTotal(page.total);
+      }
+    } catch (error) {
+      console.error('Error fetching list items:', error);
+      showNotification('Error fetching list items', 'error');
+    } finally {
+      setItemsLoading(false);
+    }
+  };
+
   const handleViewList = (list: SavedList) => {
     setSelectedList(list);
+    setFilters(DEFAULT_FILTERS);
+    setPageCursors([null]);
     setViewDialogOpen(true);
+    fetchItems(list, null, DEFAULT_FILTERS);
+  };
+
+  const handleFiltersChange = (changes: Partial<ItemFilters>) => {
+    const updated = { ...filters, ...changes };
+    setFilters(updated);
+    setPageCursors([null]);
+    if (selectedList) {
+      fetchItems(selectedList, null, updated);
+    }
+  };
+
+  const handleNextPage = () => {
+    if (selectedList && nextCursor) {
+      setPageCursors([...pageCursors, nextCursor]);
+      fetchItems(selectedList, nextCursor, filters);
+    }
+  };
+
+  const handlePreviousPage = () => {
+    if (selectedList && pageCursors.length > 1) {
+      const cursors = pageCursors.slice(0, -1);
+      setPageCursors(cursors);
+      fetchItems(selectedList, cursors[cursors.length - 1], filters);
+    }
   };
 
   const handleConfirmDelete = () => {
@@ -194,7 +287,7 @@ const SavedListsPage: React.FC = () => {
                     
                     <Box sx={{ mb: 2 }}>
                       <Typography variant="body2" color="text.secondary">
-                        {list.leads?.length || 0} {list.leads?.length === 1 ? 'Lead' : 'Leads'}
+                        {list.count || 0} {list.count === 1 ? 'Lead' : 'Leads'}
                       </Typography>
                       {list.description && (
                         <Typography variant="body2" color="text.secondary" sx={{ mt: 1 }}>
@@ -253,7 +346,54 @@ const SavedListsPage: React.FC = () => {
             </IconButton>
           </DialogTitle>
           <DialogContent dividers>
-            {selectedList?.leads && (
+            <Box sx={{ display: 'flex', flexWrap: 'wrap', alignItems: 'center', gap: 2, mb: 2 }}>
+              <FormControlLabel
+                control={
+                  <Checkbox
+                    checked={filters.hasWebsite}
+                    onChange={(e) => handleFiltersChange({ hasWebsite: e.target.checked })}
+                  />
+                }
+                label="Has website"
+              />
+              <FormControlLabel
+                control={
+                  <Checkbox
+                    checked={filters.hasEmail}
+                    onChange={(e) => handleFiltersChange({ hasEmail: e.target.checked })}
+                  />
+                }
+                label="Has email"
+              />
+              <TextField
+                size="small"
+                label="Postal code"
+                value={filters.postalCode}
+                onChange={(e) => setFilters({ ...filters, postalCode: e.target.value })}
+                onKeyDown={(e) => {
+                  if (e.key === 'Enter') handleFiltersChange({});
+                }}
+              />
+              <FormControl size="small" sx={{ minWidth: 140 }}>
+                <InputLabel>Sort by</InputLabel>
+                <Select
+                  value={filters.sort}
+                  label="Sort by"
+                  onChange={(e) => handleFiltersChange({ sort: e.target.value as string })}
+                >
+                  <MenuItem value="newest">Newest</MenuItem>
+                  <MenuItem value="oldest">Oldest</MenuItem>
+                  <MenuItem value="name">Name</MenuItem>
+                  <MenuItem value="nearest">Nearest</MenuItem>
+                  <MenuItem value="farthest">Farthest</MenuItem>
+                </Select>
+              </FormControl>
+            </Box>
+            {itemsLoading ? (
+              <Box sx={{ display: 'flex', justifyContent: 'center', my: 4 }}>
+                <CircularProgress />
+              </Box>
+            ) : (
               <TableContainer>
                 <Table>
                   <TableHead>
@@ -265,7 +405,7 @@ const SavedListsPage: React.FC = () => {
                     </TableRow>
                   </TableHead>
                   <TableBody>
-                    {selectedList.leads.map((lead, index) => (
+                    {items.map((lead, index) => (
                       <TableRow key={index}>
                         <TableCell>{lead.business_name}</TableCell>
                         <TableCell>{lead.address}</TableCell>
@@ -310,6 +450,17 @@ const SavedListsPage: React.FC = () => {
             )}
           </DialogContent>
           <DialogActions>
+            <Typography variant="body2" color="text.secondary" sx={{ mr: 'auto', ml: 2 }}>
+              {total === 0
+                ? 'No leads'
+                : `${(pageCursors.length - 1) * PAGE_SIZE + 1}–${(pageCursors.length - 1) * PAGE_SIZE + items.length} of ${total}`}
+            </Typography>
+            <Button onClick={handlePreviousPage} disabled={itemsLoading || pageCursors.length <= 1}>
+              Previous
+            </Button>
+            <Button onClick={handleNextPage} disabled={itemsLoading || !nextCursor}>
+              Next
+            </Button>
             <Button onClick={handleCloseViewDialog}>Close</Button>
           </DialogActions>
         </Dialog>
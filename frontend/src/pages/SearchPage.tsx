@@ -222,32 +222,46 @@ const SearchPage: React.FC = () => {
     }
 
     setIsLoading(true);
-    try {
-      const queryParams = new URLSearchParams();
-      queryParams.append('query', searchTerm);
-      queryParams.append('locations', JSON.stringify(locations));
-      queryParams.append('radius', (radius * 1000).toString());
-      queryParams.append('exactPincodeSearch', exactPincodeSearch.toString());
-
-      const response = await fetch(`/api/search?${queryParams.toString()}`);
-      if (!response.ok) throw new Error('Search failed');
+    setSearchResults([]);
+    setNextPageToken(null);
+
+    const queryParams = new URLSearchParams();
+    queryParams.append('query', searchTerm);
+    queryParams.append('locations', JSON.stringify(locations));
+    queryParams.append('radius', (radius * 1000).toString());
+    queryParams.append('exactPincodeSearch', exactPincodeSearch.toString());
+
+    // Results stream in as each business's details resolve; keep them sorted by distance
+    const source = new EventSource(`/api/search/stream?${queryParams.toString()}`);
+    const streamed: BusinessResult[] = [];
+
+    source.addEventListener('result', (event) => {
+      const business: BusinessResult = JSON.parse((event as MessageEvent).data);
+      const index = streamed.findIndex(b => b.distance > business.distance);
+      streamed.splice(index === -1 ? streamed.length : index, 0, business);
+      setSearchResults([...streamed]);
+    });
+
+    source.addEventListener('summary', (event) => {
+      const summary = JSON.parse((event as MessageEvent).data);
+      source.close();
+      setNextPageToken(summary.next_page_token);
+      setIsLoading(false);
 
-      const data = await response.json();
-      setSearchResults(data.results);
-      setNextPageToken(data.next_page_token);
-      setDisplayedResults(data.results);
-      
-      if (data.results.length === 0) {
+      if (summary.total === 0) {
         showNotification('No results found', 'info');
       } else {
-        showNotification(`Found ${data.results.length} results`, 'success');
+        showNotification(`Found ${summary.total} results`, 'success');
       }
-    } catch (error) {
-      console.error('Error searching:', error);
-      showNotification('Failed to search businesses', 'error');
-    } finally {
+    });
+
+    source.onerror = () => {
+      // EventSource reconnects on its own; a search must not be replayed
+      source.close();
       setIsLoading(false);
-    }
+      console.error('Error searching: stream closed');
+      showNotification('Failed to search businesses', 'error');
+    };
   };
 
   const handleScrapeEmails = async (business: BusinessResult) => {
@@ -391,31 +405,31 @@ const SearchPage: React.FC = () => {
 
   const handleScrapeAllEmails = async () => {
     setIsScrapingAll(true);
-    let totalEmails = 0;
     
     try {
-      for (const business of searchResults) {
-        if (business.website) {
-          try {
-            const response = await fetch('/api/scrape-email', {
-              method: 'POST',
-              headers: {
-                'Content-Type': 'application/json',
-              },
-              body: JSON.stringify({ website: business.website }),
-            });
-            
-            const data = await response.json();
-            if (data.success && data.emails.length > 0) {
-              totalEmails += data.emails.length;
-              business.scraped_emails = data.emails;
-              setSearchResults([...searchResults]);
-            }
-          } catch (error) {
-            console.error('Error scraping emails:', error);
-          }
-        }
-      }
+      const websites = searchResults
+        .map(business => business.website)
+        .filter((website): website is string => Boolean(website));
+
+      // One bulk job instead of a request per website
+      const response = await fetch('/api/scrape-emails/bulk', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ websites }),
+      });
+      if (!response.ok) throw new Error('Failed to scrape emails');
+
+      const data = await response.json();
+      let totalEmails = 0;
+      const updatedResults = searchResults.map(business => {
+        const emails: string[] = (business.website && data.results[business.website]) || [];
+        if (emails.length === 0) return business;
+        totalEmails += emails.length;
+        return { ...business, scraped_emails: emails };
+      });
+      setSearchResults(updatedResults);
       
       if (totalEmails > 0) {
         showNotification(`Found ${totalEmails} new email(s)!`, 'success');
@@ -0,0 +1,92 @@
+"""
+Great-circle distance helpers.
+
+calculate_distance() is the scalar haversine both apps used to define for
+themselves. The NumPy functions compute distances from one or many origins
+to N places in a single call. They are used to rank merged multi-location
+result sets and to re-rank saved lists from a new origin without a Python
+loop per place.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Earth's radius in meters
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Distance in meters between two points."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+
+    a = math.sin(delta_phi/2) * math.sin(delta_phi/2) + \
+        math.cos(phi1) * math.cos(phi2) * \
+        math.sin(delta_lambda/2) * math.sin(delta_lambda/2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_M * c
+
+
+def as_coords(points):
+    """Turn a sequence of (lat, lng) pairs into an (N, 2) float array."""
+    coords = np.asarray(points, dtype=float)
+    return coords.reshape(-1, 2)
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Element-wise distance in meters between arrays of points; broadcasts like any ufunc."""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def paired_distances(origins, points):
+    """Distance in meters from origins[i] to points[i], for every i."""
+    origins = as_coords(origins)
+    points = as_coords(points)
+    return haversine(origins[:, 0], origins[:, 1], points[:, 0], points[:, 1])
+
+
+def distance_matrix(origins, points):
+    """Distances in meters from every origin to every point, shape (origins, points)."""
+    origins = as_coords(origins)
+    points = as_coords(points)
+    return haversine(origins[:, 0:1], origins[:, 1:2], points[np.newaxis, :, 0], points[np.newaxis, :, 1])
+
+
+def distances_from(origin, points):
+    """Distances in meters from one origin to every point, shape (points,)."""
+    return distance_matrix([origin], points)[0]
+
+
+def nearest_k(origin, points, k):
+    """
+    Indices and distances of the k points closest to origin, nearest first.
+
+    Uses a partial partition, so only the k winners are sorted rather than
+    all N points.
+    """
+    distances = distances_from(origin, points)
+    if k <= 0 or not len(distances):
+        return np.array([], dtype=int), np.array([])
+    if k < len(distances):
+        candidates = np.argpartition(distances, k - 1)[:k]
+    else:
+        candidates = np.arange(len(distances))
+    order = candidates[np.argsort(distances[candidates], kind='stable')]
+    return order, distances[order]
+
+
+def assign_nearest_origin(origins, points):
+    """
+    For every point, the index of its closest origin and the distance to it.
+
+    Used when several locations are searched at once, so each place is
+    attributed to (and measured from) the location it is actually nearest.
+    """
+    matrix = distance_matrix(origins, points)
+    if not matrix.size:
+        return np.array([], dtype=int), np.array([])
+    nearest = np.argmin(matrix, axis=0)
+    return nearest, matrix[nearest, np.arange(matrix.shape[1])]
@@ -0,0 +1,188 @@
+"""
+Two-tier cache for forward and reverse geocoding.
+
+Lookups go through an in-process LRU first and then an on-disk SQLite store
+shared by every process on the machine, so a pincode or city searched
+yesterday costs neither quota nor latency today. Entries expire after a
+configurable TTL; empty answers are cached for a shorter time so a typo'd
+location does not stay unresolvable for a month.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+GEOCODE_CACHE_PATH = os.getenv('GEOCODE_CACHE_PATH', os.path.join(CACHE_DIR, 'geocode_cache.db'))
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))  # 30 days
+GEOCODE_NEGATIVE_TTL = int(os.getenv('GEOCODE_NEGATIVE_TTL', 24 * 3600))  # 1 day
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', 2048))
+
+# Coordinates are rounded to ~1 m before being used as reverse lookup keys
+REVERSE_PRECISION = 5
+
+_MISSING = object()
+
+
+def normalize_location(location):
+    """
+    Canonical cache key for a forward lookup.
+
+    Case and whitespace are folded, spaces around commas are dropped and
+    pincodes written as "700 074" are joined so they share an entry with
+    "700074".
+    """
+    key = ' '.join(str(location).split()).lower()
+    key = re.sub(r'\s*,\s*', ', ', key).strip(', ')
+    return re.sub(r'\b(\d{3}) (\d{3})\b', r'\1\2', key)
+
+
+def normalize_coords(lat, lng):
+    """Canonical cache key for a reverse lookup."""
+    return f"{round(float(lat), REVERSE_PRECISION):.{REVERSE_PRECISION}f}," \
+           f"{round(float(lng), REVERSE_PRECISION):.{REVERSE_PRECISION}f}"
+
+
+class GeocodeCache:
+    """In-process LRU in front of a SQLite table, keyed by (kind, key)."""
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, ttl=GEOCODE_CACHE_TTL,
+                 negative_ttl=GEOCODE_NEGATIVE_TTL, max_entries=GEOCODE_CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _connection(self):
+        # Opened lazily and reopened after a fork so workers don't share a handle
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _remember(self, cache_key, value, expires_at):
+        self._memory[cache_key] = (value, expires_at)
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, kind, key):
+        """Return the cached value, or _MISSING if absent or expired."""
+        cache_key = (kind, key)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(cache_key)
+                self.stats['memory_hits'] += 1
+                return entry[0]
+            self._memory.pop(cache_key, None)
+
+            try:
+                row = self._connection().execute(
+                    'SELECT value, expires_at FROM geocode_cache WHERE kind = ? AND key = ?',
+                    (kind, key)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Geocode cache read error: {str(e)}")
+                row = None
+
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(cache_key, value, row[1])
+                self.stats['disk_hits'] += 1
+                return value
+
+            self.stats['misses'] += 1
+            return _MISSING
+
+    def set(self, kind, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember((kind, key), value, expires_at)
+            self.stats['stores'] += 1
+            try:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO geocode_cache (kind, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                    (kind, key, json.dumps(value), expires_at)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Geocode cache write error: {str(e)}")
+
+    def get_or_fetch(self, kind, key, fetch):
+        """Return the cached value for key, calling fetch() and storing its result on a miss."""
+        value = self.get(kind, key)
+        if value is not _MISSING:
+            return value
+        value = fetch()
+        self.set(kind, key, value)
+        return value
+
+    def purge_expired(self):
+        """Delete expired rows from the on-disk store."""
+        with self._lock:
+            conn = self._connection()
+            deleted = conn.execute('DELETE FROM geocode_cache WHERE expires_at <= ?', (time.time(),)).rowcount
+            conn.commit()
+            return deleted
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+geocode_cache = GeocodeCache()
+
+
+def cached_geocode(location, lookup):
+    """
+    Forward-geocode a location through the cache.
+
+    lookup(location) is only called on a miss and must return (lat, lng) or
+    None. Exceptions from lookup propagate and are never cached.
+    """
+    coords = geocode_cache.get_or_fetch('forward', normalize_location(location),
+                                        lambda: _as_coords(lookup(location)))
+    return tuple(coords) if coords else None
+
+
+def cached_reverse_geocode(lat, lng, lookup):
+    """
+    Reverse-geocode coordinates to a postal code through the cache.
+
+    lookup(lat, lng) is only called on a miss and must return the postal
+    code or None.
+    """
+    return geocode_cache.get_or_fetch('reverse', normalize_coords(lat, lng),
+                                      lambda: lookup(lat, lng))
+
+
+def _as_coords(coords):
+    return [coords[0], coords[1]] if coords else None
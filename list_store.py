@@ -0,0 +1,317 @@
+"""
+Saved lists in SQLite instead of one JSON file per list.
+
+The overview used to open and parse every file in saved_lists/, results and
+all, just to show names and counts. Lists now live in two tables: lists
+holds one row of metadata per list, including its item count, and
+list_items holds the saved results, one row each, in their original order.
+The overview is a single query over lists, ordered by an index on
+created_at, and never touches the items.
+
+The store is a SQLite file in WAL mode so readers don't wait on a save.
+Lists saved as JSON by earlier versions are imported once with
+
+    python list_store.py migrate [directory ...]
+
+which reads saved_lists/*.json and saved/leads/*.json by default and skips
+lists already in the store.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LIST_STORE_PATH = os.getenv('LIST_STORE_PATH', os.path.join(BASE_DIR, 'instance', 'saved_lists.db'))
+LEGACY_LIST_DIRS = (os.path.join(BASE_DIR, 'saved_lists'), os.path.join(BASE_DIR, 'saved', 'leads'))
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS lists (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        search_term TEXT,
+        locations TEXT,
+        category TEXT,
+        created_at TEXT NOT NULL,
+        item_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_lists_created_at ON lists (created_at DESC);
+    CREATE TABLE IF NOT EXISTS list_items (
+        list_id TEXT NOT NULL REFERENCES lists (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (list_id, position)
+    );
+'''
+
+# Sort orders for a list's items: the expression sorted on and its direction.
+# Items are stored in the order they were saved, so position stands in for
+# the creation time the backend sorts saved_leads on.
+ITEM_SORTS = {
+    'oldest': ('position', 'ASC'),
+    'newest': ('position', 'DESC'),
+    'name': ("IFNULL(json_extract(data, '$.business_name'), '')", 'ASC'),
+    'nearest': ("IFNULL(json_extract(data, '$.distance'), 0)", 'ASC'),
+    'farthest': ("IFNULL(json_extract(data, '$.distance'), 0)", 'DESC')
+}
+
+
+class ListStore:
+    """List metadata and items in one SQLite file shared between processes."""
+
+    def __init__(self, path=LIST_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def save(self, list_id, name, items, search_term='', locations=None, category=None,
+             created_at=None, replace=True):
+        """
+        Store a list and its items in one transaction.
+
+        An existing list with the same id is replaced, or left alone when
+        replace is False. Returns True if the list was written.
+        """
+        items = list(items)
+        conn = self._connection()
+        with conn:
+            if conn.execute('SELECT 1 FROM lists WHERE id = ?', (list_id,)).fetchone():
+                if not replace:
+                    return False
+                conn.execute('DELETE FROM lists WHERE id = ?', (list_id,))
+            conn.execute(
+                'INSERT INTO lists (id, name, search_term, locations, category, created_at, item_count) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (list_id, name, search_term, json.dumps(locations or []), category,
+                 created_at or datetime.now().isoformat(), len(items))
+            )
+            conn.executemany(
+                'INSERT INTO list_items (list_id, position, data) VALUES (?, ?, ?)',
+                ((list_id, position, json.dumps(item, ensure_ascii=False))
+                 for position, item in enumerate(items))
+            )
+        return True
+
+    def overview(self):
+        """Every list's metadata and item count, newest first."""
+        rows = self._connection().execute(
+            'SELECT id, name, search_term, locations, category, created_at, item_count '
+            'FROM lists ORDER BY created_at DESC'
+        ).fetchall()
+        return [_list_summary(row) for row in rows]
+
+    def names(self):
+        """(id, name) of every list, newest first."""
+        rows = self._connection().execute('SELECT id, name FROM lists ORDER BY created_at DESC').fetchall()
+        return [{'id': row['id'], 'name': row['name']} for row in rows]
+
+    def get_summary(self, list_id):
+        """A list's metadata and item count, or None."""
+        row = self._connection().execute(
+            'SELECT id, name, search_term, locations, category, created_at, item_count '
+            'FROM lists WHERE id = ?', (list_id,)
+        ).fetchone()
+        return _list_summary(row) if row is not None else None
+
+    def get(self, list_id):
+        """A list's metadata with its items under 'results', or None."""
+        saved_list = self.get_summary(list_id)
+        if saved_list is None:
+            return None
+        saved_list['results'] = [
+            json.loads(item['data']) for item in self._connection().execute(
+                'SELECT data FROM list_items WHERE list_id = ? ORDER BY position', (list_id,)
+            )
+        ]
+        return saved_list
+
+    def items(self, list_id, after=-1, limit=50):
+        """
+        Up to limit items of a list after position after, with their positions.
+
+        The last position returned is the cursor for the next page, so every
+        page is a range scan on the primary key however deep it is.
+        """
+        rows = self._connection().execute(
+            'SELECT position, data FROM list_items WHERE list_id = ? AND position > ? '
+            'ORDER BY position LIMIT ?', (list_id, after, limit)
+        ).fetchall()
+        return [(row['position'], json.loads(row['data'])) for row in rows]
+
+    def find_items(self, list_id, sort='oldest', after=None, limit=50, **filters):
+        """
+        Up to limit items of a list, filtered and sorted, as (key, item) pairs.
+
+        sort is one of ITEM_SORTS and filters are those item_filters() takes.
+        Each key is the (sort value, position) pair of its item; pass the
+        last one as after to get the next page.
+        """
+        expression, direction = ITEM_SORTS[sort]
+        clauses, params = item_filters(**filters)
+        clauses.insert(0, 'list_id = ?')
+        params.insert(0, list_id)
+        if after is not None:
+            value, position = after
+            operator = '<' if direction == 'DESC' else '>'
+            clauses.append(f"({expression}, position) {operator} (?, ?)")
+            params.extend([value, position])
+
+        rows = self._connection().execute(f"""
+            SELECT {expression} AS sort_value, position, data
+            FROM list_items
+            WHERE {' AND '.join(clauses)}
+            ORDER BY {expression} {direction}, position {direction}
+            LIMIT ?
+        """, params + [limit]).fetchall()
+        return [((row['sort_value'], row['position']), json.loads(row['data'])) for row in rows]
+
+    def count_items(self, list_id, **filters):
+        """How many items of a list match filters."""
+        clauses, params = item_filters(**filters)
+        return self._connection().execute(
+            f"SELECT COUNT(*) FROM list_items WHERE list_id = ? AND {' AND '.join(clauses or ['1'])}",
+            [list_id] + params
+        ).fetchone()[0]
+
+    def iter_items(self, list_id, batch_size=1000):
+        """Every item of a list in order, read a page at a time."""
+        after = -1
+        while True:
+            page = self.items(list_id, after, batch_size)
+            for _, item in page:
+                yield item
+            if len(page) < batch_size:
+                return
+            after = page[-1][0]
+
+    def delete(self, list_id):
+        """Delete a list and its items; returns False if there was no such list."""
+        conn = self._connection()
+        with conn:
+            return conn.execute('DELETE FROM lists WHERE id = ?', (list_id,)).rowcount > 0
+
+
+def item_filters(has_website=False, has_email=False, postal_code=None, status=None,
+                 min_distance=None, max_distance=None):
+    """WHERE clauses and parameters over list_items.data for the given filters."""
+    clauses, params = [], []
+    if has_website:
+        clauses.append("IFNULL(json_extract(data, '$.website'), '') != ''")
+    if has_email:
+        # Email lists save one address per item, lead lists the ones scraped for it
+        clauses.append("(IFNULL(json_extract(data, '$.email'), '') != '' "
+                       "OR IFNULL(json_array_length(data, '$.emails'), 0) > 0)")
+    if postal_code:
+        clauses.append("json_extract(data, '$.postal_code') = ?")
+        params.append(postal_code.replace(' ', ''))
+    if status:
+        clauses.append("json_extract(data, '$.business_status') = ?")
+        params.append(status)
+    if min_distance is not None:
+        clauses.append("IFNULL(json_extract(data, '$.distance'), 0) >= ?")
+        params.append(min_distance)
+    if max_distance is not None:
+        clauses.append("IFNULL(json_extract(data, '$.distance'), 0) <= ?")
+        params.append(max_distance)
+    return clauses, params
+
+
+def _list_summary(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'searchTerm': row['search_term'] or '',
+        'locations': json.loads(row['locations'] or '[]'),
+        'category': row['category'],
+        'createdAt': row['created_at'],
+        'count': row['item_count']
+    }
+
+
+def read_legacy_list(path):
+    """
+    Read a list saved as JSON by an earlier version.
+
+    Two shapes exist: saved_lists/*.json holds the list fields and its
+    'results' at the top level, saved/leads/*.json holds 'metadata' and
+    'leads'. The file name is the list id in both.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    list_id = os.path.splitext(os.path.basename(path))[0]
+    file_time = datetime.fromtimestamp(os.path.getctime(path)).isoformat()
+    if 'leads' in data and 'results' not in data:
+        metadata = data.get('metadata') or {}
+        return {
+            'list_id': list_id,
+            'name': list_id.strip(),
+            'items': data.get('leads') or [],
+            'category': metadata.get('category'),
+            'created_at': metadata.get('saved_at') or file_time
+        }
+    return {
+        'list_id': data.get('id') or list_id,
+        'name': data.get('name') or list_id,
+        'items': data.get('results') or [],
+        'search_term': data.get('searchTerm', ''),
+        'locations': data.get('locations') or [],
+        'category': data.get('category'),
+        'created_at': data.get('createdAt') or file_time
+    }
+
+
+def migrate(store, directories=LEGACY_LIST_DIRS):
+    """
+    Import every legacy JSON list under directories into store.
+
+    Lists whose id is already stored are skipped, so running it twice is
+    harmless. Returns counts of imported, skipped and failed files.
+    """
+    counts = {'imported': 0, 'skipped': 0, 'failed': 0}
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                saved_list = read_legacy_list(path)
+                if store.save(replace=False, **saved_list):
+                    counts['imported'] += 1
+                else:
+                    counts['skipped'] += 1
+            except (OSError, ValueError, sqlite3.Error) as e:
+                logging.error(f"Error importing {path}: {str(e)}")
+                counts['failed'] += 1
+    return counts
+
+
+list_store = ListStore()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        sys.exit('Usage: python list_store.py migrate [directory ...]')
+    logging.basicConfig(level=logging.INFO)
+    result = migrate(list_store, sys.argv[2:] or LEGACY_LIST_DIRS)
+    print(f"Imported {result['imported']} lists, skipped {result['skipped']} already stored, "
+          f"{result['failed']} failed")
@@ -0,0 +1,140 @@
+"""
+Long-lived Google Maps clients and HTTP sessions, shared by every request.
+
+Building a googlemaps.Client per call meant every search started with cold
+connections and a fresh TLS handshake. The registry keeps one pooled
+requests.Session and one client per API key for the life of the process,
+and hands them out round-robin when several keys are configured
+(GOOGLE_MAPS_API_KEYS, comma separated) to spread quota across them.
+Sessions keep their connections alive, so consecutive calls reuse them;
+get_stats() reports how often they did.
+"""
+import itertools
+import os
+import threading
+
+import googlemaps
+import requests
+from requests.adapters import HTTPAdapter
+
+from quota import ThrottledClient, maps_quota
+
+MAPS_POOL_SIZE = int(os.getenv('MAPS_POOL_SIZE', 32))
+MAPS_TIMEOUT = float(os.getenv('MAPS_TIMEOUT', 10))
+# The shared quota limiter does the real rate limiting; this only stops the
+# client's own per-instance throttle from serializing concurrent searches
+MAPS_CLIENT_QPS = int(os.getenv('MAPS_CLIENT_QPS', 500))
+
+
+def configured_keys():
+    """API keys from GOOGLE_MAPS_API_KEYS, falling back to GOOGLE_MAPS_API_KEY."""
+    keys = [key.strip() for key in os.getenv('GOOGLE_MAPS_API_KEYS', '').split(',') if key.strip()]
+    if not keys and os.getenv('GOOGLE_MAPS_API_KEY'):
+        keys = [os.getenv('GOOGLE_MAPS_API_KEY')]
+    return keys
+
+
+def pooled_session(pool_size=MAPS_POOL_SIZE):
+    """A keep-alive session whose pool can serve pool_size concurrent calls per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class MapsEntry:
+    """
+    The session and client that belong to one API key.
+
+    The googlemaps client is only built when first asked for, since callers
+    making raw web service requests need just the key and session.
+    """
+
+    def __init__(self, key, pool_size):
+        self.key = key
+        self.session = pooled_session(pool_size)
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # The quota limiter retries quota errors itself, with jitter, so the client mustn't
+                self._client = ThrottledClient(
+                    googlemaps.Client(key=self.key, requests_session=self.session, timeout=MAPS_TIMEOUT,
+                                      queries_per_second=MAPS_CLIENT_QPS, retry_over_query_limit=False),
+                    maps_quota
+                )
+            return self._client
+
+
+class MapsClientRegistry:
+    """Creates each key's client once and shares it between threads."""
+
+    def __init__(self, keys=None, pool_size=MAPS_POOL_SIZE):
+        self._keys = keys
+        self.pool_size = pool_size
+        self._entries = {}
+        self._cycle = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Keys are read lazily so load_dotenv() can run after import
+        if self._cycle is None:
+            keys = self._keys or configured_keys()
+            if not keys:
+                raise ValueError('GOOGLE_MAPS_API_KEY is not set')
+            self._keys = keys
+            self._cycle = itertools.cycle(keys)
+
+    def entry(self, key=None):
+        """The entry for key, or for the next key in turn when key is None."""
+        with self._lock:
+            self._load()
+            if key is None:
+                key = next(self._cycle)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = MapsEntry(key, self.pool_size)
+                self._entries[key] = entry
+            return entry
+
+    def client(self, key=None):
+        """A throttled googlemaps client; see entry()."""
+        return self.entry(key).client
+
+    def get_stats(self):
+        """Requests made and connections opened per key, and the reuse rate."""
+        with self._lock:
+            entries = list(self._entries.values())
+
+        stats = {'keys': len(self._keys or []), 'clients': []}
+        total_requests = total_connections = 0
+        for entry in entries:
+            requests_made = connections = 0
+            for adapter in set(entry.session.adapters.values()):
+                for pool_key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(pool_key)
+                    if pool is not None:
+                        requests_made += pool.num_requests
+                        connections += pool.num_connections
+            total_requests += requests_made
+            total_connections += connections
+            stats['clients'].append({
+                # Never report the key itself
+                'key': f"...{entry.key[-4:]}",
+                'requests': requests_made,
+                'connections_opened': connections
+            })
+
+        stats['requests'] = total_requests
+        stats['connections_opened'] = total_connections
+        stats['reuse_rate'] = (round(1 - total_connections / total_requests, 3)
+                               if total_requests else 0.0)
+        return stats
+
+
+# Shared by every request handled by this process
+maps_clients = MapsClientRegistry()
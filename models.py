@@ -29,17 +29,28 @@ class WhatsAppTemplate(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Also the outbound message queue; see outbox.py
 class MessageLog(Base):
     __tablename__ = 'message_logs'
     
     id = Column(Integer, primary_key=True)
     message_type = Column(String(20), nullable=False)  # email or whatsapp
-    template_id = Column(Integer, nullable=False)
+    template_id = Column(Integer)  # None for messages sent without a template
     recipient = Column(String(255), nullable=False)
     variables = Column(JSON)
-    status = Column(String(20), nullable=False)  # sent, failed
+    status = Column(String(20), nullable=False)  # pending, in_flight, sent, failed
     error_message = Column(String)
-    sent_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    campaign_id = Column(String(32))
+    idempotency_key = Column(String(255), unique=True)
+    sender = Column(String(64))
+    body = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, default=datetime.utcnow)  # next claimable; lease expiry while in_flight
+    lease_owner = Column(String(64))
+    provider_message_id = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 def init_db():
     engine = create_engine('sqlite:///lead_getter.db')
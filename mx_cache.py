@@ -0,0 +1,143 @@
+"""
+Per-domain MX record cache for email verification.
+
+verify_email() used to resolve the same domain's MX records once per
+candidate address. Answers are now cached per domain for as long as the DNS
+TTL allows, and negative answers (NXDOMAIN, no MX) are cached too, for a
+shorter fixed time. Transient failures (timeouts, no nameserver answering)
+are remembered for a few seconds, so a burst of addresses at a struggling
+domain raises at once instead of each waiting out its own timeout. Lookups
+for one domain are single-flight, so the threads of a domain search that
+ask at the same time share one query; a domain's lock only exists while
+someone is looking it up.
+resolve_many() warms the cache for many domains concurrently, for list-wide
+jobs.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import dns.exception
+import dns.resolver
+
+from concurrency import bounded_map
+
+MX_MIN_TTL = int(os.getenv('MX_MIN_TTL', 60))
+MX_MAX_TTL = int(os.getenv('MX_MAX_TTL', 24 * 3600))
+MX_NEGATIVE_TTL = int(os.getenv('MX_NEGATIVE_TTL', 300))
+MX_ERROR_TTL = int(os.getenv('MX_ERROR_TTL', 15))
+MX_LOOKUP_TIMEOUT = float(os.getenv('MX_LOOKUP_TIMEOUT', 5.0))
+MX_MAX_WORKERS = int(os.getenv('MX_MAX_WORKERS', 32))
+
+
+class MXCache:
+    """Caches MX exchanges per domain, honouring record TTLs."""
+
+    def __init__(self, min_ttl=MX_MIN_TTL, max_ttl=MX_MAX_TTL, negative_ttl=MX_NEGATIVE_TTL,
+                 timeout=MX_LOOKUP_TIMEOUT, error_ttl=MX_ERROR_TTL):
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self._entries = {}
+        self._domain_locks = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'lookups': 0, 'negative': 0, 'errors': 0}
+
+    @contextmanager
+    def _single_flight(self, domain):
+        """Hold the domain's lock; it is dropped once no thread holds or waits for it."""
+        with self._lock:
+            entry = self._domain_locks.get(domain)
+            if entry is None:
+                entry = self._domain_locks[domain] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._domain_locks[domain]
+
+    def _cached(self, domain):
+        """The cached exchanges, None if there are none, or the cached failure raised."""
+        entry = self._entries.get(domain)
+        if not entry or entry[1] <= time.time():
+            return None
+        with self._lock:
+            self.stats['hits'] += 1
+        if entry[2] is not None:
+            raise entry[2]
+        return entry[0]
+
+    def lookup(self, domain):
+        """
+        Return the domain's MX exchanges, or [] if it has none.
+
+        Raises dns.exception.DNSException on timeouts and other transient
+        failures, which are only cached for error_ttl seconds.
+        """
+        domain = domain.strip().lower().rstrip('.')
+        exchanges = self._cached(domain)
+        if exchanges is not None:
+            return exchanges
+
+        # Only one thread resolves a given domain; the others wait for its answer
+        with self._single_flight(domain):
+            exchanges = self._cached(domain)
+            if exchanges is not None:
+                return exchanges
+
+            with self._lock:
+                self.stats['lookups'] += 1
+            try:
+                answer = dns.resolver.resolve(domain, 'MX', lifetime=self.timeout)
+                exchanges = [record.exchange.to_text().rstrip('.')
+                             for record in sorted(answer, key=lambda record: record.preference)]
+                ttl = min(max(answer.rrset.ttl, self.min_ttl), self.max_ttl)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                exchanges = []
+                ttl = self.negative_ttl
+                with self._lock:
+                    self.stats['negative'] += 1
+            except dns.exception.DNSException as e:
+                # Includes NoNameservers: every server failed (SERVFAIL, refused), which may pass
+                with self._lock:
+                    self.stats['errors'] += 1
+                self._entries[domain] = (None, time.time() + self.error_ttl, e)
+                raise
+
+            self._entries[domain] = (exchanges, time.time() + ttl, None)
+            return exchanges
+
+    def has_mx(self, domain):
+        return bool(self.lookup(domain))
+
+    def resolve_many(self, domains, max_workers=MX_MAX_WORKERS):
+        """
+        Resolve many domains concurrently and return {domain: exchanges}.
+
+        Domains whose lookup failed map to None.
+        """
+        def resolve(domain):
+            try:
+                return self.lookup(domain)
+            except dns.exception.DNSException as e:
+                print(f"MX lookup error for {domain}: {str(e)}")
+                return None
+
+        domains = list(dict.fromkeys(domains))
+        return dict(zip(domains, bounded_map(resolve, domains, max_workers=max_workers)))
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['domains'] = len(self._entries)
+        return stats
+
+
+mx_cache = MXCache()
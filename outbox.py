@@ -0,0 +1,415 @@
+"""
+A durable outbox of outbound messages in the message_logs table.
+
+Campaigns used to live in memory, so a restart partway through lost track
+of who had already been messaged. Every message is now a message_logs row,
+written before anything is sent, which moves through
+
+    pending -> in_flight -> sent | failed
+
+Workers, threads or separate processes alike, claim pending rows in batches.
+A claim is one UPDATE ... RETURNING in a write transaction, so two workers
+can never claim the same row. It also leases the rows to the worker:
+available_at is pushed to the lease's expiry, and a row whose worker died
+becomes claimable again once its lease runs out. Results are written back
+a batch at a time with executemany, and only where the row is still leased
+to the worker reporting them, so a worker that overran its lease can't
+overwrite what the next one did.
+
+A retryable failure goes back to pending with available_at set to when it
+may be tried again, so backoff never holds a worker or a lease. Every claim
+counts as an attempt, and a claimable row that has already had
+OUTBOX_MAX_ATTEMPTS is failed instead of claimed again. That bounds a
+message whose sender keeps retrying it, and one whose workers keep dying
+before they report back, which no sender-side retry limit would see.
+
+Idempotency:
+- each row has a unique idempotency_key, (campaign, recipient) by default,
+  so enqueuing a campaign twice doesn't message anyone twice
+- a row is only ever sent by the worker holding its lease
+
+The one case that can still repeat a message is a worker dying after the
+API accepted it but before its batch was written back. Keep batches small
+next to OUTBOX_LEASE_SECONDS.
+
+OutboxWorker is the claim-send-report loop a sender runs over its message
+type (see whatsapp.py).
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The database models.py writes to
+MESSAGE_DB_PATH = os.getenv('MESSAGE_DB_PATH', os.path.join(BASE_DIR, 'lead_getter.db'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_LEASE_SECONDS = float(os.getenv('OUTBOX_LEASE_SECONDS', 120))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 10))
+# How long an idle worker waits before looking for due retries again
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', 1.0))
+
+# Stored the way SQLAlchemy stores DateTime in SQLite, so MessageLog can read
+# them; the fixed width keeps string comparison in time order
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+_COLUMNS = '''
+    id INTEGER PRIMARY KEY,
+    message_type VARCHAR(20) NOT NULL,
+    template_id INTEGER,
+    recipient VARCHAR(255) NOT NULL,
+    variables JSON,
+    status VARCHAR(20) NOT NULL,
+    error_message VARCHAR,
+    sent_at DATETIME,
+    campaign_id VARCHAR(32),
+    idempotency_key VARCHAR(255) UNIQUE,
+    sender VARCHAR(64),
+    body TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at DATETIME,
+    lease_owner VARCHAR(64),
+    provider_message_id VARCHAR(255),
+    created_at DATETIME,
+    updated_at DATETIME
+'''
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def _stamp(moment):
+    return moment.strftime(_TIME_FORMAT)
+
+
+def _create_message_logs(c):
+    """Create message_logs, or rebuild the original table as the outbox."""
+    columns = [row[1] for row in c.execute('PRAGMA table_info(message_logs)')]
+    if 'available_at' in columns:
+        return
+    if not columns:
+        c.execute(f'CREATE TABLE message_logs ({_COLUMNS})')
+        return
+    # The original table has template_id NOT NULL, which SQLite can only
+    # relax by copying into a new table
+    c.execute(f'CREATE TABLE message_logs_outbox ({_COLUMNS})')
+    c.execute('''
+        INSERT INTO message_logs_outbox (id, message_type, template_id, recipient, variables, status,
+                                         error_message, sent_at, created_at, updated_at)
+        SELECT id, message_type, template_id, recipient, variables, status,
+               error_message, sent_at, sent_at, sent_at
+        FROM message_logs
+    ''')
+    c.execute('DROP TABLE message_logs')
+    c.execute('ALTER TABLE message_logs_outbox RENAME TO message_logs')
+
+
+def _index_message_logs(c):
+    # Only rows a worker could claim are indexed, so the claim's scan stays
+    # small however much history the table holds
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_message_logs_claimable
+        ON message_logs (message_type, available_at, id)
+        WHERE status IN ('pending', 'in_flight')
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_message_logs_campaign ON message_logs (campaign_id, status)')
+
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _create_message_logs,
+    _index_message_logs,
+]
+
+
+class Outbox:
+    """The message_logs outbox in one SQLite file shared between processes."""
+
+    def __init__(self, path=MESSAGE_DB_PATH, lease_seconds=OUTBOX_LEASE_SECONDS,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._migrated = False
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode: transactions are begun explicitly with BEGIN IMMEDIATE,
+            # which takes the write lock up front so concurrent claims queue instead of deadlocking
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _connection(self):
+        conn = self._open()
+        if not self._migrated:
+            self.migrate()
+        return conn
+
+    @contextmanager
+    def _transaction(self, conn=None):
+        c = (conn or self._connection()).cursor()
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            yield c
+        except BaseException:
+            c.execute('ROLLBACK')
+            raise
+        else:
+            c.execute('COMMIT')
+
+    def migrate(self):
+        """Apply the migrations this database hasn't had yet; returns how many ran."""
+        with self._lock:
+            if self._migrated:
+                return 0
+            with self._transaction(self._open()) as c:
+                version = c.execute('PRAGMA user_version').fetchone()[0]
+                pending = MIGRATIONS[version:]
+                for migration in pending:
+                    migration(c)
+                if pending:
+                    c.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+            self._migrated = True
+        return len(pending)
+
+    def enqueue(self, message_type, messages, campaign_id=None, sender=None, template_id=None):
+        """
+        Add a campaign's messages to the outbox in one transaction.
+
+        messages are dicts with recipient and body, and optionally variables,
+        idempotency_key, and status and error for messages that are failed
+        before they are sent (an invalid number, say). Rows whose
+        idempotency key is already in the outbox are skipped. Returns
+        (campaign id, rows added).
+        """
+        campaign_id = campaign_id or uuid.uuid4().hex
+        now = _stamp(_now())
+        # A generator, so a large campaign streams into executemany; if
+        # messages raises partway, nothing of the campaign is queued
+        rows = ((
+            message_type, template_id, message['recipient'],
+            json.dumps(message['variables']) if message.get('variables') is not None else None,
+            message.get('status', 'pending'), message.get('error'), campaign_id,
+            message.get('idempotency_key') or f"{campaign_id}:{message['recipient']}",
+            sender, message.get('body'), now, now, now
+        ) for message in messages)
+        with self._transaction() as c:
+            before = c.execute('SELECT total_changes()').fetchone()[0]
+            c.executemany('''
+                INSERT OR IGNORE INTO message_logs
+                    (message_type, template_id, recipient, variables, status, error_message, campaign_id,
+                     idempotency_key, sender, body, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            added = c.execute('SELECT total_changes()').fetchone()[0] - before
+        return campaign_id, added
+
+    def claim(self, owner, message_type, limit=OUTBOX_BATCH_SIZE):
+        """
+        Lease up to limit claimable messages to owner and return them.
+
+        Claimable means pending and due, or in flight under a lease that has
+        run out. Each claim counts as an attempt; claimable messages that
+        have had max_attempts are failed rather than returned.
+        """
+        now = _now()
+        with self._transaction() as c:
+            c.execute('''
+                UPDATE message_logs
+                SET status = 'failed', lease_owner = NULL, updated_at = ?,
+                    error_message = 'Gave up after ' || attempts || ' attempts' ||
+                                    IFNULL(': ' || error_message, '')
+                WHERE message_type = ? AND status IN ('pending', 'in_flight') AND available_at <= ?
+                  AND attempts >= ?
+            ''', (_stamp(now), message_type, _stamp(now), self.max_attempts))
+            rows = c.execute('''
+                UPDATE message_logs
+                SET status = 'in_flight', lease_owner = ?, available_at = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id IN (
+                    SELECT id FROM message_logs
+                    WHERE message_type = ? AND status IN ('pending', 'in_flight') AND available_at <= ?
+                    ORDER BY available_at, id
+                    LIMIT ?
+                )
+                RETURNING id, campaign_id, recipient, sender, body, variables, attempts, idempotency_key
+            ''', (owner, _stamp(now + timedelta(seconds=self.lease_seconds)), _stamp(now),
+                  message_type, _stamp(now), limit)).fetchall()
+        return [dict(row, variables=json.loads(row['variables']) if row['variables'] else None)
+                for row in rows]
+
+    def complete(self, owner, results):
+        """
+        Write back a batch of send results in one transaction.
+
+        results are dicts with id and status: 'sent' (with
+        provider_message_id), 'failed' (with error), or 'retry' (with error
+        and retry_at, the datetime it may next be claimed). Rows no longer
+        leased to owner are left alone. Returns how many rows were updated.
+        """
+        now = _stamp(_now())
+        sent, failed, retry = [], [], []
+        for result in results:
+            if result['status'] == 'sent':
+                sent.append((now, result.get('provider_message_id'), now, result['id'], owner))
+            elif result['status'] == 'retry':
+                retry.append((result.get('error'), _stamp(result['retry_at']), now, result['id'], owner))
+            else:
+                failed.append((result.get('error'), now, result['id'], owner))
+
+        fence = "WHERE id = ? AND lease_owner = ? AND status = 'in_flight'"
+        with self._transaction() as c:
+            before = c.execute('SELECT total_changes()').fetchone()[0]
+            c.executemany(f'''
+                UPDATE message_logs
+                SET status = 'sent', sent_at = ?, provider_message_id = ?, error_message = NULL,
+                    lease_owner = NULL, updated_at = ?
+                {fence}
+            ''', sent)
+            c.executemany(f'''
+                UPDATE message_logs
+                SET status = 'pending', error_message = ?, available_at = ?, lease_owner = NULL, updated_at = ?
+                {fence}
+            ''', retry)
+            c.executemany(f'''
+                UPDATE message_logs
+                SET status = 'failed', error_message = ?, lease_owner = NULL, updated_at = ?
+                {fence}
+            ''', failed)
+            return c.execute('SELECT total_changes()').fetchone()[0] - before
+
+    def release(self, owner, ids):
+        """Hand leased messages back unsent, e.g. when a worker is stopping."""
+        now = _stamp(_now())
+        with self._transaction() as c:
+            c.executemany('''
+                UPDATE message_logs
+                SET status = 'pending', available_at = ?, attempts = MAX(attempts - 1, 0),
+                    lease_owner = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'in_flight'
+            ''', [(now, now, message_id, owner) for message_id in ids])
+
+    def campaign(self, campaign_id, details=False):
+        """
+        A campaign's progress from its rows, or None if it has none.
+
+        With details, every row's outcome is included under results;
+        otherwise only the failures are.
+        """
+        conn = self._connection()
+        summary = conn.execute('''
+            SELECT MIN(sender) AS sender, MIN(created_at) AS created_at, COUNT(*) AS total,
+                   SUM(status = 'pending') AS pending, SUM(status = 'in_flight') AS in_flight,
+                   SUM(status = 'sent') AS sent, SUM(status = 'failed') AS failed,
+                   SUM(MAX(attempts - 1, 0)) AS retries,
+                   MAX(CASE WHEN status IN ('sent', 'failed') THEN updated_at END) AS finished_at
+            FROM message_logs WHERE campaign_id = ?
+        ''', (campaign_id,)).fetchone()
+        if not summary['total']:
+            return None
+
+        unfinished = summary['pending'] + summary['in_flight']
+        progress = {
+            'id': campaign_id,
+            'status': 'running' if unfinished else 'completed',
+            'senderNumber': summary['sender'],
+            'total': summary['total'],
+            'sent': summary['sent'],
+            'failed': summary['failed'],
+            'pending': unfinished,
+            'inFlight': summary['in_flight'],
+            'retries': summary['retries'],
+            'createdAt': summary['created_at'],
+            'finishedAt': None if unfinished else summary['finished_at']
+        }
+        rows = conn.execute(f'''
+            SELECT recipient, status, error_message, provider_message_id
+            FROM message_logs WHERE campaign_id = ? {'' if details else "AND status = 'failed'"}
+            ORDER BY id
+        ''', (campaign_id,)).fetchall()
+        outcomes = [_outcome(row) for row in rows]
+        progress['results' if details else 'failures'] = outcomes
+        return progress
+
+
+def _outcome(row):
+    outcome = {'number': row['recipient'], 'status': row['status']}
+    if row['status'] == 'sent':
+        outcome['status'] = 'success'
+        outcome['message_id'] = row['provider_message_id']
+    elif row['error_message']:
+        outcome['error'] = row['error_message']
+    return outcome
+
+
+class OutboxWorker(ABC):
+    """
+    Sends one message type from an outbox on a background thread.
+
+    Subclasses implement run_once(), which claims a batch as self.owner,
+    sends it and reports the results, returning how many rows it claimed.
+    """
+
+    def __init__(self, outbox, batch_size=OUTBOX_BATCH_SIZE, poll_seconds=OUTBOX_POLL_SECONDS):
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        # Names this process's leases in the outbox
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the background worker unless it's already running."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Look for work now rather than at the next poll."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        """Send from the outbox until stopped, idling while there's nothing due."""
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logging.error(f"{type(self).__name__} {self.owner}: {str(e)}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    @abstractmethod
+    def run_once(self):
+        """Claim, send and report one batch; returns how many rows were claimed."""
+
+
+# Shared by every request handled by this process
+outbox = Outbox()
@@ -0,0 +1,66 @@
+"""
+Pipelined pagination for Places searches.
+
+A next_page_token only becomes valid a second or two after the page that
+carried it. Instead of sleeping for a fixed two seconds and doing nothing,
+pipelined_pages() hands the current page to the caller straight away and
+polls for the next one on a background thread with backoff, so the details
+work for page N overlaps the wait for page N+1.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from concurrency import submit_in_context
+
+PAGE_TOKEN_INITIAL_DELAY = float(os.getenv('PAGE_TOKEN_INITIAL_DELAY', 1.0))
+PAGE_TOKEN_MAX_DELAY = float(os.getenv('PAGE_TOKEN_MAX_DELAY', 1.0))
+PAGE_TOKEN_TIMEOUT = float(os.getenv('PAGE_TOKEN_TIMEOUT', 10.0))
+# The Places API never returns more than three pages (60 results)
+MAX_PAGES = 3
+
+
+class PageTokenPending(Exception):
+    """Raised by a page fetcher when the API says the token isn't valid yet."""
+
+
+def poll_page(fetch_page, token, initial_delay=PAGE_TOKEN_INITIAL_DELAY,
+              max_delay=PAGE_TOKEN_MAX_DELAY, timeout=PAGE_TOKEN_TIMEOUT):
+    """
+    Fetch the page for token, retrying with backoff while it's still pending.
+
+    The first attempt waits initial_delay, since a token is never ready
+    immediately; later attempts start at a quarter of that and grow by half
+    each time up to max_delay. Raises PageTokenPending after timeout.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    retry_delay = initial_delay / 4
+    while True:
+        time.sleep(delay)
+        try:
+            return fetch_page(token)
+        except PageTokenPending:
+            if time.monotonic() + retry_delay > deadline:
+                raise
+            delay = retry_delay
+            retry_delay = min(retry_delay * 1.5, max_delay)
+
+
+def pipelined_pages(first_page, fetch_page, max_pages=MAX_PAGES, **poll_options):
+    """
+    Yield first_page and every page after it, prefetching the next one.
+
+    fetch_page(token) must return the page dict or raise PageTokenPending.
+    While the caller is busy with the page just yielded, the next page is
+    already being polled for in the background.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = first_page
+        pages = 0
+        while page:
+            pages += 1
+            token = page.get('next_page_token') if pages < max_pages else None
+            next_page = submit_in_context(executor, poll_page, fetch_page, token, **poll_options) if token else None
+            yield page
+            page = next_page.result() if next_page else None
@@ -0,0 +1,150 @@
+"""
+Field-aware cache for Place Details responses, keyed by place_id.
+
+Each field of a place is stored as its own row with the time it was
+fetched, so a request for a subset of fields already held is answered
+locally and only the missing or stale fields go to the API. Volatile fields
+such as business_status expire sooner than name or address. The store is a
+SQLite file in WAL mode, so every gunicorn worker on the machine shares it.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+PLACE_CACHE_PATH = os.getenv('PLACE_CACHE_PATH', os.path.join(CACHE_DIR, 'place_cache.db'))
+PLACE_CACHE_DEFAULT_TTL = int(os.getenv('PLACE_CACHE_DEFAULT_TTL', 30 * 24 * 3600))  # 30 days
+
+# Fields that change more often than the default TTL allows for
+FIELD_TTLS = {
+    'business_status': 24 * 3600,
+    'opening_hours': 3 * 24 * 3600,
+    'rating': 7 * 24 * 3600,
+    'user_ratings_total': 7 * 24 * 3600,
+}
+
+# Stored for fields the API returned nothing for, so they aren't refetched
+_ABSENT = None
+
+
+class PlaceDetailsCache:
+    """Per-field store of place details shared between processes."""
+
+    def __init__(self, path=PLACE_CACHE_PATH, default_ttl=PLACE_CACHE_DEFAULT_TTL, field_ttls=None):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.field_ttls = dict(FIELD_TTLS, **(field_ttls or {}))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {'full_hits': 0, 'partial_hits': 0, 'misses': 0,
+                      'fields_served': 0, 'fields_fetched': 0}
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS place_fields (
+                    place_id TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    value TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (place_id, field)
+                )
+            ''')
+            conn.commit()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def ttl_for(self, field):
+        return self.field_ttls.get(field, self.default_ttl)
+
+    def lookup(self, place_id, fields):
+        """Return ({field: value} for fresh cached fields, [missing or stale fields])."""
+        placeholders = ','.join('?' * len(fields))
+        rows = self._connection().execute(
+            f'SELECT field, value, fetched_at FROM place_fields WHERE place_id = ? AND field IN ({placeholders})',
+            (place_id, *fields)
+        ).fetchall()
+
+        now = time.time()
+        cached = {}
+        for field, value, fetched_at in rows:
+            if now - fetched_at < self.ttl_for(field):
+                cached[field] = json.loads(value) if value is not None else _ABSENT
+        missing = [field for field in fields if field not in cached]
+        return cached, missing
+
+    def store(self, place_id, fields, result):
+        """Record the requested fields of a details result, including the absent ones."""
+        now = time.time()
+        rows = [
+            (place_id, field, json.dumps(result[field]) if field in result else None, now)
+            for field in fields
+        ]
+        conn = self._connection()
+        conn.executemany(
+            'INSERT OR REPLACE INTO place_fields (place_id, field, value, fetched_at) VALUES (?, ?, ?, ?)',
+            rows
+        )
+        conn.commit()
+
+    def get(self, place_id, fields, fetch):
+        """
+        Return the requested details for place_id, fetching only what's missing.
+
+        fetch(place_id, missing_fields) is called with the fields that are not
+        cached or have gone stale and must return the API's result dict, or
+        None if the call failed (nothing is cached then). The returned dict
+        only contains fields the API has a value for, like a real Place
+        Details result.
+        """
+        fields = list(dict.fromkeys(fields))
+        try:
+            cached, missing = self.lookup(place_id, fields)
+        except sqlite3.Error as e:
+            print(f"Place cache read error: {str(e)}")
+            cached, missing = {}, fields
+
+        if missing:
+            fetched = fetch(place_id, missing)
+            # None means the call failed, which says nothing about the place
+            if fetched is not None:
+                try:
+                    self.store(place_id, missing, fetched)
+                except sqlite3.Error as e:
+                    print(f"Place cache write error: {str(e)}")
+            for field in missing:
+                cached[field] = (fetched or {}).get(field, _ABSENT)
+
+        with self._stats_lock:
+            if not missing:
+                self.stats['full_hits'] += 1
+            elif len(missing) < len(fields):
+                self.stats['partial_hits'] += 1
+            else:
+                self.stats['misses'] += 1
+            self.stats['fields_served'] += len(fields) - len(missing)
+            self.stats['fields_fetched'] += len(missing)
+
+        return {field: value for field, value in cached.items() if value is not _ABSENT}
+
+    def clear(self):
+        """Drop every cached field."""
+        conn = self._connection()
+        conn.execute('DELETE FROM place_fields')
+        conn.commit()
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+place_cache = PlaceDetailsCache()
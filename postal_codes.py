@@ -0,0 +1,146 @@
+"""
+Postal/zip code extraction from free-form addresses.
+
+All supported formats and the country names used as locale hints are
+compiled into one pattern, so an address is scanned exactly once.
+When several candidates appear, the one from the most likely country wins:
+the country passed in by the caller first, then a country named in the
+address itself, then the default order (India, US, UK, Canada,
+Netherlands, generic 4-digit), with the earliest match breaking ties.
+"""
+import re
+
+# Checked in this order when nothing hints at a country
+COUNTRY_PATTERNS = [
+    ('IN', r'\b\d{6}\b'),
+    ('US', r'\b\d{5}(?:-\d{4})?\b'),
+    ('GB', r'\b[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}\b'),
+    ('CA', r'\b[ABCEGHJ-NPRSTVXY]\d[A-Z] ?\d[A-Z]\d\b'),
+    ('NL', r'\b\d{4} ?[A-Z]{2}\b'),
+    ('ANY', r'\b\d{4}\b'),  # Many countries
+]
+
+COUNTRY_NAMES = {
+    'india': 'IN',
+    'usa': 'US',
+    'united states': 'US',
+    'united kingdom': 'GB',
+    'uk': 'GB',
+    'england': 'GB',
+    'scotland': 'GB',
+    'wales': 'GB',
+    'canada': 'CA',
+    'netherlands': 'NL',
+    'nederland': 'NL',
+}
+
+COUNTRY_ALIASES = {'UK': 'GB'}
+
+_RANK = {country: rank for rank, (country, _) in enumerate(COUNTRY_PATTERNS)}
+
+# The formats above, factored so each word boundary is tried against three
+# branches instead of seven: country names (tried first so "UK" is read as a
+# hint), anything that starts with digits, and the UK/Canadian alphanumerics.
+# Only one group of each findall() tuple is set; _classify() tells the
+# digit-led and alphanumeric matches apart. A match can only start where a
+# word starts; a plain \b would also try every branch again where a word
+# ends. Each digit-led form matches exactly what its own pattern would: the
+# Dutch form is tried first, so "1234 AB" isn't cut short to four digits, a
+# ZIP+4 suffix only follows five digits, and a digit run must end on a word
+# boundary, so "12345uk" is nothing rather than a US ZIP.
+_COMBINED = re.compile(
+    r'(?<!\w)(?=\w)(?:'
+    r'(?P<hint>' + '|'.join(sorted(map(re.escape, COUNTRY_NAMES), key=len, reverse=True)) + r')\b'
+    r'|(?P<num>\d{4} ?[A-Z]{2}|\d{5}-\d{4}|\d{4,6})\b'
+    r'|(?P<alnum>[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}|[ABCEGHJ-NPRSTVXY]\d[A-Z] ?\d[A-Z]\d)\b'
+    r')',
+    re.IGNORECASE
+)
+_STRICT = {country: re.compile(pattern, re.IGNORECASE) for country, pattern in COUNTRY_PATTERNS}
+
+
+def _classify(num, alnum):
+    """Return (country, code) for a digit-led or alphanumeric match."""
+    if alnum:
+        # Canadian codes end in a digit, UK postcodes in two letters
+        return ('CA' if alnum[-1].isdigit() else 'GB'), alnum
+    if num[-1].isalpha():
+        return 'NL', num
+    if '-' in num:
+        return 'US', num
+    return {6: 'IN', 5: 'US'}.get(len(num), 'ANY'), num
+
+
+def normalize_country(country):
+    if not country:
+        return None
+    country = country.strip()
+    code = COUNTRY_NAMES.get(country.lower(), country.upper())
+    return COUNTRY_ALIASES.get(code, code)
+
+
+def extract_postal_code(address, country=None, strict=False):
+    """
+    Return the postal code in an address, or None.
+
+    country is an ISO code or country name for the searched locale; its
+    format is preferred over the others. With strict=True only that
+    country's format is accepted.
+    """
+    if not address:
+        return None
+    if country:
+        country = normalize_country(country)
+
+    if strict and country in _STRICT:
+        match = _STRICT[country].search(address)
+        return match.group().strip() if match else None
+
+    # One scan: remember the first candidate of each format and the last
+    # country named, which is usually the one at the end of the address
+    first = {}
+    hinted = None
+    for hint, num, alnum in _COMBINED.findall(address):
+        if hint:
+            hinted = COUNTRY_NAMES[hint.lower()]
+            continue
+        if len(num) == 6 and num.isdigit():
+            kind, code = 'IN', num
+        else:
+            kind, code = _classify(num, alnum)
+        if kind not in first:
+            first[kind] = code
+
+    if not first:
+        return None
+    if country in first:
+        return first[country]
+    if hinted in first:
+        return first[hinted]
+    if len(first) == 1:
+        return next(iter(first.values()))
+    return first[min(first, key=_RANK.get)]
+
+
+def extract_postal_codes(addresses, country=None, strict=False):
+    """Extract the postal code of every address in a batch, in order."""
+    return [extract_postal_code(address, country, strict) for address in addresses]
+
+
+def annotate_postal_codes(results, country=None, address_key='address', overwrite=False):
+    """
+    Fill in 'postal_code' for a whole result set or saved list in one pass.
+
+    Rows that already have a postal code are left alone unless overwrite is
+    set. Returns the same list for convenience.
+    """
+    rows = [row for row in results if overwrite or not row.get('postal_code')]
+    codes = extract_postal_codes((row.get(address_key) or '' for row in rows), country)
+    for row, code in zip(rows, codes):
+        row['postal_code'] = code
+    return results
+
+
+def get_pincode_from_address(address):
+    """Extract an Indian 6-digit pincode from an address string."""
+    return extract_postal_code(address, 'IN', strict=True)
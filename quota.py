@@ -0,0 +1,238 @@
+"""
+Quota-aware rate limiting for Google Maps calls.
+
+Every Maps call goes through one process-wide MapsQuota, which keeps a
+token bucket per API (geocoding, nearby search, text search and place
+details are billed and rate limited separately). A call waits for a token
+instead of firing straight away, and if Google still answers
+OVER_QUERY_LIMIT the call is retried with jittered exponential backoff
+rather than being swallowed by the caller's except block.
+
+A request can cap what it spends with `with maps_quota.budget(details=40):`.
+The budget lives in a context variable, so it follows the work onto the
+pool threads started through concurrency.bounded_imap() and friends; a call
+past the budget raises BudgetExceeded before anything is sent.
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+APIS = ('geocode', 'nearby', 'text', 'details')
+
+# Sustained calls per second and burst size for each API
+DEFAULT_RATES = {api: float(os.getenv(f'MAPS_RATE_{api.upper()}', 50)) for api in APIS}
+DEFAULT_BURSTS = {api: float(os.getenv(f'MAPS_BURST_{api.upper()}', 20)) for api in APIS}
+QUOTA_MAX_RETRIES = int(os.getenv('MAPS_QUOTA_MAX_RETRIES', 4))
+QUOTA_BACKOFF_BASE = float(os.getenv('MAPS_QUOTA_BACKOFF_BASE', 0.5))
+QUOTA_BACKOFF_MAX = float(os.getenv('MAPS_QUOTA_BACKOFF_MAX', 8.0))
+# Window for the spend-rate metrics
+RATE_WINDOW_SECONDS = 60
+
+QUOTA_STATUSES = ('OVER_QUERY_LIMIT', 'RESOURCE_EXHAUSTED')
+
+
+class OverQueryLimit(Exception):
+    """Raised by a call when Google answered with a quota error."""
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of making a call the current request has no budget for."""
+
+
+def is_quota_error(error):
+    """True for our own OverQueryLimit and googlemaps' ApiError on quota statuses."""
+    return isinstance(error, OverQueryLimit) or getattr(error, 'status', None) in QUOTA_STATUSES
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity; acquire() blocks for one."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until it's available. Returns the time waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Budget:
+    """Per-request call limits, shared by every thread working on the request."""
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.spent = {api: 0 for api in self.limits}
+        self._lock = threading.Lock()
+
+    def charge(self, api):
+        if api not in self.limits:
+            return
+        with self._lock:
+            if self.spent[api] >= self.limits[api]:
+                raise BudgetExceeded(f"{api} budget of {self.limits[api]} calls spent")
+            self.spent[api] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {api: {'limit': self.limits[api], 'spent': self.spent[api]} for api in self.limits}
+
+
+_current_budget = contextvars.ContextVar('maps_budget', default=None)
+
+
+class MapsQuota:
+    """Token buckets, retries, budgets and spend metrics for every Maps API."""
+
+    def __init__(self, rates=None, bursts=None, max_retries=QUOTA_MAX_RETRIES,
+                 backoff_base=QUOTA_BACKOFF_BASE, backoff_max=QUOTA_BACKOFF_MAX):
+        rates = dict(DEFAULT_RATES, **(rates or {}))
+        bursts = dict(DEFAULT_BURSTS, **(bursts or {}))
+        self.buckets = {api: TokenBucket(rates[api], bursts[api]) for api in APIS}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._recent = {api: deque() for api in APIS}
+        self.stats = {api: {'calls': 0, 'quota_errors': 0, 'retries': 0, 'failures': 0,
+                            'budget_rejections': 0, 'throttled_seconds': 0.0} for api in APIS}
+        self._lock = threading.Lock()
+
+    def _record(self, api, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                self.stats[api][key] += value
+
+    def _note_call(self, api, now):
+        # Caller holds the lock
+        recent = self._recent[api]
+        recent.append(now)
+        while recent[0] < now - RATE_WINDOW_SECONDS:
+            recent.popleft()
+
+    def _backoff(self, attempt):
+        # Full jitter, so clients that failed together don't retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, api, fn, *args, **kwargs):
+        """
+        Make one Maps call through the api's bucket and the current budget.
+
+        fn must raise on quota errors (OverQueryLimit, or googlemaps' ApiError
+        with an OVER_QUERY_LIMIT status); those are retried up to max_retries
+        times and then re-raised. Any other error is raised straight away.
+        """
+        budget = _current_budget.get()
+        if budget is not None:
+            try:
+                budget.charge(api)
+            except BudgetExceeded:
+                self._record(api, budget_rejections=1)
+                raise
+
+        attempt = 0
+        while True:
+            waited = self.buckets[api].acquire()
+            self._record(api, calls=1, throttled_seconds=waited)
+            with self._lock:
+                self._note_call(api, time.monotonic())
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_quota_error(e):
+                    raise
+                self._record(api, quota_errors=1)
+                if attempt >= self.max_retries:
+                    self._record(api, failures=1)
+                    raise
+                self._record(api, retries=1)
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    @contextmanager
+    def budget(self, **limits):
+        """Cap the calls made per API inside the block, e.g. budget(details=40)."""
+        budget = Budget(limits)
+        token = _current_budget.set(budget)
+        try:
+            yield budget
+        finally:
+            _current_budget.reset(token)
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = {}
+            for api in APIS:
+                recent = self._recent[api]
+                while recent and recent[0] < now - RATE_WINDOW_SECONDS:
+                    recent.popleft()
+                stats[api] = dict(self.stats[api],
+                                  throttled_seconds=round(self.stats[api]['throttled_seconds'], 3),
+                                  calls_last_minute=len(recent),
+                                  rate_per_second=round(len(recent) / RATE_WINDOW_SECONDS, 3))
+        return stats
+
+
+def parse_budget(value):
+    """
+    Read a request's budget: {api: max_calls}, or the same as a JSON string.
+
+    Unknown API names are ignored.
+    """
+    if not value:
+        return {}
+    if isinstance(value, str):
+        value = json.loads(value)
+    return {api: int(limit) for api, limit in value.items() if api in APIS}
+
+
+class ThrottledClient:
+    """
+    Wraps a googlemaps.Client so its Maps calls go through a MapsQuota.
+
+    Methods that aren't Maps searches or lookups are passed through as is.
+    """
+
+    METHOD_APIS = {
+        'geocode': 'geocode',
+        'reverse_geocode': 'geocode',
+        'places_nearby': 'nearby',
+        'places': 'text',
+        'place': 'details',
+    }
+
+    def __init__(self, client, quota):
+        self._client = client
+        self._quota = quota
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        api = self.METHOD_APIS.get(name)
+        if api is None:
+            return attr
+
+        def throttled(*args, **kwargs):
+            return self._quota.call(api, attr, *args, **kwargs)
+        return throttled
+
+
+# Shared by every request handled by this process
+maps_quota = MapsQuota()
@@ -0,0 +1,238 @@
+"""
+Relevance of a place to a search keyword, decided in two phases.
+
+is_relevant_place() only looks at a place's name and types, and a nearby or
+text search hit already carries both. summary_verdict() therefore judges
+the hit first, at no API cost, and only places it can't rule out go on to a
+details call, after which is_relevant_place() confirms them on the full
+record. A hit missing the fields the check needs is never dropped on
+phase one; it is left for the details to decide.
+
+The name and type rules are compiled once at import. Each category's name
+indicators become one trie-factored regex, types are matched by set
+intersection, and classify() labels a whole batch of places with one scan
+per category over all their names at once.
+"""
+import bisect
+import re
+from functools import lru_cache
+
+# Common business type mappings
+TYPE_MAPPINGS = {
+    'school': ['school', 'primary_school', 'secondary_school', 'education'],
+    'college': ['university', 'college', 'education'],
+    'hospital': ['hospital', 'doctor', 'health', 'medical_care'],
+    'restaurant': ['restaurant', 'food', 'meal_delivery', 'meal_takeaway'],
+    'shop': ['store', 'shop', 'shopping_mall', 'retail'],
+    'cafe': ['cafe', 'restaurant', 'food', 'coffee'],
+    'gym': ['gym', 'health', 'fitness_center'],
+    'hotel': ['lodging', 'hotel', 'resort'],
+    'bank': ['bank', 'finance', 'atm'],
+    'pharmacy': ['pharmacy', 'drugstore', 'health'],
+    'market': ['market', 'grocery_or_supermarket', 'store'],
+    'salon': ['beauty_salon', 'hair_care', 'spa'],
+    'dentist': ['dentist', 'health', 'doctor'],
+    'park': ['park', 'amusement_park', 'tourist_attraction'],
+    'library': ['library', 'book_store', 'education'],
+    'cinema': ['movie_theater', 'entertainment'],
+    'mall': ['shopping_mall', 'store', 'retail'],
+    'temple': ['hindu_temple', 'place_of_worship', 'religious'],
+    'church': ['church', 'place_of_worship', 'religious'],
+    'mosque': ['mosque', 'place_of_worship', 'religious']
+}
+
+
+CAKE_SHOP_INDICATORS = [
+    'cake', 'bakery', 'bake', 'pastry', 'patisserie',
+    'mio amore', 'monginis', 'ribbons and balloons',
+    'britannia', 'karachi bakery', 'snacks', 'canteen',
+    'cafe', 'coffee', 'tea', 'restaurant', 'hotel',
+    'catering', 'ice cream', 'gelato', 'frozen'
+]
+
+SWEET_SHOP_INDICATORS = [
+    'mithai', 'mishtan', 'mishtann',
+    'halwai', 'confectioner',
+    'mistan', 'bhandar', 'bhog', 'naivedyam',
+    'bengali sweet', 'gujarati sweet',
+    'indian sweet', 'traditional sweet'
+]
+
+# Category -> name indicators (substrings of the lowercased name) and/or
+# Google place types; a place gets every label whose rule it meets
+CATEGORY_RULES = {
+    'cake_shop': {'names': CAKE_SHOP_INDICATORS},
+    'sweet_shop': {'names': SWEET_SHOP_INDICATORS},
+}
+CATEGORY_RULES.update({category: {'types': types} for category, types in TYPE_MAPPINGS.items()})
+
+
+def _trie_pattern(words):
+    """
+    One regex matching any of words, factored into a prefix trie.
+
+    The regex engine tries alternatives one by one, so sharing prefixes
+    ('bake', 'bakery') means each position is only tested once per branch.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A word ends here too, so the rest is optional
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+class Classifier:
+    """Labels places by category rules compiled once."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self._names = {category: re.compile(_trie_pattern(rule['names']))
+                       for category, rule in rules.items() if rule.get('names')}
+        self._types = {category: frozenset(rule['types'])
+                       for category, rule in rules.items() if rule.get('types')}
+
+    def matches(self, place, category):
+        """True if place meets category's name or type rule."""
+        pattern = self._names.get(category)
+        if pattern is not None and pattern.search((place.get('name') or '').lower()):
+            return True
+        types = self._types.get(category)
+        return types is not None and not types.isdisjoint(place.get('types') or ())
+
+    def labels(self, place):
+        """Every category place belongs to."""
+        name = (place.get('name') or '').lower()
+        labels = {category for category, pattern in self._names.items() if pattern.search(name)}
+        types = place.get('types')
+        if types:
+            labels.update(category for category, rule_types in self._types.items()
+                          if not rule_types.isdisjoint(types))
+        return labels
+
+    def classify(self, places):
+        """
+        Label a batch of places; returns one set of categories per place.
+
+        The names are lowercased and joined into one text, so each category
+        pattern scans the whole batch once instead of once per place.
+        """
+        places = list(places)
+        labels = [set() for _ in places]
+        if not places:
+            return labels
+
+        names = [(place.get('name') or '').lower().replace('\n', ' ') for place in places]
+        starts = []
+        offset = 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + 1
+        text = '\n'.join(names)
+
+        for category, pattern in self._names.items():
+            index = 0
+            for match in pattern.finditer(text):
+                # Matches come in order, so the owning name only moves forward
+                if match.start() >= starts[index] + len(names[index]) + 1:
+                    index = bisect.bisect_right(starts, match.start(), index) - 1
+                labels[index].add(category)
+
+        for place, place_labels in zip(places, labels):
+            types = place.get('types')
+            if types:
+                place_labels.update(category for category, rule_types in self._types.items()
+                                    if not rule_types.isdisjoint(types))
+        return labels
+
+
+classifier = Classifier(CATEGORY_RULES)
+
+
+def classify(places):
+    """Label a batch of places with the default category rules."""
+    return classifier.classify(places)
+
+
+def is_cake_shop(place):
+    return classifier.matches(place, 'cake_shop')
+
+
+def is_sweet_shop(place):
+    return classifier.matches(place, 'sweet_shop')
+
+
+@lru_cache(maxsize=256)
+def _mapped_types(keyword_lower):
+    """The TYPE_MAPPINGS types a keyword maps to, or None if it maps to none."""
+    for key, mapped_types in TYPE_MAPPINGS.items():
+        if keyword_lower in key or key in keyword_lower:
+            return frozenset(mapped_types)
+    return None
+
+
+def is_relevant_place(place_details, keyword):
+    """
+    Determine if a place is relevant to the search keyword.
+    Uses Google Places types and name matching.
+    """
+    if not place_details:
+        return False
+
+    keyword_lower = keyword.lower()
+    name = place_details.get('name', '').lower()
+    types = place_details.get('types', [])
+
+    # Direct name match
+    if keyword_lower in name:
+        return True
+
+    # Check if the keyword is a business type
+    if keyword_lower in types:
+        return True
+
+    # Check if any of the place's types match our mapped types
+    mapped_types = _mapped_types(keyword_lower)
+    if mapped_types is not None:
+        return not mapped_types.isdisjoint(types)
+
+    # If no specific mapping, check if it's a valid business
+    return 'establishment' in types and (
+        keyword_lower in name or
+        any(keyword_lower in t for t in types)
+    )
+
+
+def summary_verdict(place, keyword):
+    """
+    Phase one: judge a search hit before its details are fetched.
+
+    Returns True or False when the hit carries the name and types that
+    is_relevant_place() looks at, and None when it doesn't, so only the
+    details can tell.
+    """
+    if not place:
+        return False
+    if 'name' in place and 'types' in place:
+        return is_relevant_place(place, keyword)
+    # A name match is enough on its own; anything else needs the types
+    if keyword.lower() in place.get('name', '').lower():
+        return True
+    return None
+
+
+def passes_prefilter(place, keyword):
+    """Keep every hit that phase one can't rule out."""
+    return summary_verdict(place, keyword) is not False
@@ -0,0 +1,203 @@
+"""
+Precompiled message templates, rendered a batch of recipients at a time.
+
+Templates (email_templates, whatsapp_templates) hold content with
+{{ variable }} placeholders. Searching content for placeholders and
+checking every variable for every recipient is the bulk of the cost of a
+large send, so the work is split:
+
+- A template is compiled once into a positional str.format string plus the
+  distinct variables it uses. Compiled templates are cached by
+  (kind, template id, field, updated_at), so an edited template is
+  recompiled on its next use and the old entry ages out of the LRU.
+- Rows are rendered in batches, column-wise. Each variable's values are
+  pulled out of the batch in one pass and checked once: a variable that
+  none of the batch's rows has, and that has no default, fails the whole
+  batch. Rows whose value is empty are reported per variable, not raised
+  per row. Every message in the batch is then one str.format call, mapped
+  over the columns in C.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+
+from outbox import MESSAGE_DB_PATH
+
+TEMPLATE_CACHE_SIZE = int(os.getenv('TEMPLATE_CACHE_SIZE', 256))
+RENDER_BATCH_SIZE = int(os.getenv('RENDER_BATCH_SIZE', 1000))
+
+TEMPLATE_TABLES = {'email': 'email_templates', 'whatsapp': 'whatsapp_templates'}
+
+# {{ name }}; names may be numbered, like the API's own {{1}}
+PLACEHOLDER = re.compile(r'\{\{\s*([A-Za-z0-9_.-]+)\s*\}\}')
+
+# messages: the rendered text for each row, or None where a variable was
+# empty; missing: {variable: [row indices]} for those rows
+RenderedBatch = namedtuple('RenderedBatch', ['rows', 'messages', 'missing'])
+
+
+class TemplateError(ValueError):
+    """A template that can't be found or can't be rendered for a batch."""
+
+
+def _text(value):
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+class CompiledTemplate:
+    """A template's content parsed once into a format string and its variables."""
+
+    def __init__(self, content, defaults=None):
+        self.content = content
+        self.defaults = dict(defaults or {})
+        parts = PLACEHOLDER.split(content)
+        # Literals at even indices, variable names at odd ones
+        self.variables = tuple(dict.fromkeys(parts[1::2]))
+        position = {name: index for index, name in enumerate(self.variables)}
+        self._format = ''.join(
+            part.replace('{', '{{').replace('}', '}}') if index % 2 == 0 else f'{{{position[part]}}}'
+            for index, part in enumerate(parts)
+        )
+
+    def render(self, values):
+        """One message from a dict of values; raises TemplateError if one is missing."""
+        batch = self.render_batch([values])
+        if batch.missing:
+            raise TemplateError(f"Missing values for {', '.join(sorted(batch.missing))}")
+        return batch.messages[0]
+
+    def render_batch(self, rows, mapping=None, defaults=None):
+        """
+        Render rows (dicts) in one pass per variable.
+
+        mapping renames variables to row keys ({'name': 'business_name'}),
+        and defaults, over the template's own, fill in empty or absent
+        values. Raises TemplateError if a variable is in none of the rows
+        and has no default.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not self.variables:
+            return RenderedBatch(rows, [self.content] * len(rows), {})
+
+        mapping = mapping or {}
+        defaults = dict(self.defaults, **(defaults or {}))
+        present = set().union(*(row.keys() for row in rows)) if rows else set()
+        absent = [name for name in self.variables
+                  if mapping.get(name, name) not in present and defaults.get(name) in (None, '')]
+        if absent and rows:
+            raise TemplateError(f"No values or defaults for {', '.join(absent)}")
+
+        columns = []
+        missing = {}
+        for name in self.variables:
+            key = mapping.get(name, name)
+            default = defaults.get(name)
+            column = [row.get(key) for row in rows]
+            # Counted in C; only a column with gaps is walked in Python
+            if column.count(None) or column.count(''):
+                empty = [index for index, value in enumerate(column) if value is None or value == '']
+                if default not in (None, ''):
+                    for index in empty:
+                        column[index] = default
+                else:
+                    missing[name] = empty
+            if set(map(type, column)) != {str}:
+                column = [value if type(value) is str else _text(value) if value is not None else ''
+                          for value in column]
+            columns.append(column)
+
+        messages = list(map(self._format.format, *columns))
+        if missing:
+            for index in set().union(*missing.values()):
+                messages[index] = None
+        return RenderedBatch(rows, messages, missing)
+
+    def render_all(self, rows, mapping=None, defaults=None, batch_size=RENDER_BATCH_SIZE):
+        """render_batch() over any iterable of rows, a batch at a time."""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield self.render_batch(batch, mapping, defaults)
+                batch = []
+        if batch:
+            yield self.render_batch(batch, mapping, defaults)
+
+
+class TemplateCache:
+    """Compiled templates by key, least recently used dropped first."""
+
+    def __init__(self, max_entries=TEMPLATE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key, load):
+        """
+        The compiled template cached under key, or load()'s compiled and cached.
+
+        load returns (content, defaults) and is only called on a miss.
+        """
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                self.stats['hits'] += 1
+                return compiled
+            self.stats['misses'] += 1
+        compiled = CompiledTemplate(*load())
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_entries:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._compiled))
+
+
+def _defaults(variables):
+    """A template's variables column as defaults: only a dict of name: value carries any."""
+    if isinstance(variables, str):
+        variables = json.loads(variables) if variables else None
+    return variables if isinstance(variables, dict) else {}
+
+
+def load_template(kind, template_id, field='content', path=MESSAGE_DB_PATH, cache=None):
+    """
+    Template template_id of kind ('email' or 'whatsapp'), compiled.
+
+    field is the column to compile, content or, for email, subject. While
+    the cached copy is current only updated_at is read. Raises
+    TemplateError if there is no such template.
+    """
+    if kind not in TEMPLATE_TABLES or field not in ('content', 'subject') or \
+            (field == 'subject' and kind != 'email'):
+        raise TemplateError(f"Unknown template {kind} {field}")
+    cache = cache or template_cache
+    table = TEMPLATE_TABLES[kind]
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        row = conn.execute(f'SELECT updated_at FROM {table} WHERE id = ?', (template_id,)).fetchone()
+        if row is None:
+            raise TemplateError(f"No {kind} template {template_id}")
+
+        def load():
+            content, variables = conn.execute(f'SELECT {field}, variables FROM {table} WHERE id = ?',
+                                              (template_id,)).fetchone()
+            return content, _defaults(variables)
+
+        return cache.get((kind, template_id, field, row[0]), load)
+    finally:
+        conn.close()
+
+
+# Shared by every request handled by this process
+template_cache = TemplateCache()
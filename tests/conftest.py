@@ -0,0 +1,30 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The shared modules live in the repository root, the backend's next to its app
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+# Every store the modules open by default goes to a scratch directory, never
+# the checkout's databases; set before any of them is imported
+SCRATCH = tempfile.mkdtemp(prefix='lead-getter-tests-')
+for name, filename in (('GEOCODE_CACHE_PATH', 'geocode_cache.db'), ('PLACE_CACHE_PATH', 'place_cache.db'),
+                       ('LIST_STORE_PATH', 'saved_lists.db'), ('MESSAGE_DB_PATH', 'messages.db'),
+                       ('LEADS_DB_PATH', 'leads.db')):
+    os.environ[name] = os.path.join(SCRATCH, filename)
+# The root app builds its Maps client on import; nothing in the tests calls Google
+os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'AIzaTEST')
+
+
+@pytest.fixture(scope='session')
+def root_app():
+    """The root app.py module, imported by path since the backend has an app.py too."""
+    spec = importlib.util.spec_from_file_location('root_app', os.path.join(ROOT, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,89 @@
+import pytest
+
+from candidates import CandidateSet
+
+ORIGIN = (22.5726, 88.3639)
+
+
+def place(place_id, lat, lng, **fields):
+    return dict(fields, place_id=place_id, geometry={'location': {'lat': lat, 'lng': lng}})
+
+
+def test_radius_clips_far_hits():
+    candidates = CandidateSet()
+    # About 1.1 km and 11 km north of the origin
+    near = place('near', ORIGIN[0] + 0.01, ORIGIN[1])
+    far = place('far', ORIGIN[0] + 0.1, ORIGIN[1])
+
+    new = candidates.add([near, far], 'kolkata', *ORIGIN, 'nearby', radius_km=5)
+
+    assert [candidate.place_id for candidate in new] == ['near']
+    assert new[0].origin[3] == pytest.approx(1.11, abs=0.01)
+    assert candidates.stats['out_of_radius'] == 1
+
+
+def test_hits_without_place_id_or_geometry_are_dropped():
+    candidates = CandidateSet()
+    hits = [{'place_id': 'a'}, {'geometry': {'location': {'lat': 1, 'lng': 2}}}, place('b', *ORIGIN)]
+
+    new = candidates.add(hits, 'kolkata', *ORIGIN, 'nearby')
+
+    assert [candidate.place_id for candidate in new] == ['b']
+    assert candidates.stats['no_geometry'] == 2
+
+
+def test_duplicates_only_gain_an_origin():
+    candidates = CandidateSet()
+    hit = place('a', *ORIGIN)
+    candidates.add([hit], 'first', *ORIGIN, 'nearby')
+
+    new = candidates.add([hit], 'second', ORIGIN[0] + 0.01, ORIGIN[1], 'text')
+
+    assert new == []
+    assert len(candidates) == 1
+    candidate, = candidates
+    assert candidate.source == 'nearby'
+    assert [origin[0] for origin in candidate.origins] == ['first', 'second']
+    assert candidates.stats['duplicates'] == 1
+
+
+def test_per_origin_keeps_one_candidate_per_location():
+    candidates = CandidateSet(per_origin=True)
+    hit = place('a', *ORIGIN)
+    candidates.add([hit], 'first', *ORIGIN, 'nearby')
+    candidates.add([hit], 'first', *ORIGIN, 'text')
+    new = candidates.add([hit], 'second', *ORIGIN, 'nearby')
+
+    assert len(new) == 1
+    assert len(candidates) == 2
+    assert candidates.stats['duplicates'] == 1
+
+
+def test_prefilter_rejects_new_places_only():
+    candidates = CandidateSet()
+    kept = place('kept', *ORIGIN, name='Sweet Shop')
+    candidates.add([kept], 'first', *ORIGIN, 'nearby')
+
+    def prefilter(hit):
+        return hit['name'] != 'Sweet Shop'
+
+    new = candidates.add([kept, place('rejected', *ORIGIN, name='Sweet Shop')], 'second', *ORIGIN, 'text',
+                         prefilter=prefilter)
+
+    assert new == []
+    assert candidates.stats['filtered'] == 1
+    assert candidates.stats['duplicates'] == 1
+
+
+def test_report_counts_details_calls_saved():
+    candidates = CandidateSet()
+    hits = [place('a', *ORIGIN), place('b', *ORIGIN)]
+    candidates.add(hits, 'first', *ORIGIN, 'nearby')
+    candidates.add(hits, 'second', *ORIGIN, 'text')
+
+    report = candidates.report()
+
+    assert report['hits'] == 4
+    assert report['candidates'] == 2
+    assert report['details_calls_saved'] == 2
+    assert report['by_source'] == {'nearby': {'hits': 2, 'new': 2}, 'text': {'hits': 2, 'new': 0}}
@@ -0,0 +1,79 @@
+import io
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from columnar import SCHEMA, iter_saved_leads, iter_saved_list_items, parse_since, write_columnar
+from leads_db import Database
+from list_store import ListStore
+
+ITEM = {'business_name': 'Ganguram Sweets', 'distance': 0.22, 'business_status': 'OPERATIONAL',
+        'types': ['store', 'food'], 'rating': '4.4', 'user_ratings_total': 120, 'email': 'a@x.com',
+        'opening_hours': ['Monday: 8 AM-10 PM']}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListStore(str(tmp_path / 'saved_lists.db'))
+    store.save('old', 'Old', [ITEM], created_at='2024-01-01T10:00:00+00:00')
+    store.save('new', 'New', [ITEM, {'name': 'Balaram Mullick'}], created_at='2024-03-01T10:00:00+00:00')
+    return store
+
+
+def test_saved_list_items_are_typed_under_the_schema(store):
+    records = list(iter_saved_list_items(store, list_id='old'))
+
+    assert len(records) == 1
+    record = records[0]
+    assert (record['distance_km'], record['rating'], record['status']) == (0.22, 4.4, 'OPERATIONAL')
+    assert record['emails'] == ['a@x.com'] and record['types'] == ['store', 'food']
+    assert record['created_at'] == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    assert pa.RecordBatch.from_pylist(records, schema=SCHEMA).num_rows == 1
+
+
+def test_since_skips_older_lists_and_the_watermark_is_the_next_since(store):
+    buffer = io.BytesIO()
+    rows, watermark = write_columnar(iter_saved_list_items(store, since='2024-02-01'), 'parquet', buffer)
+
+    table = pq.read_table(io.BytesIO(buffer.getvalue()))
+    assert rows == table.num_rows == 2
+    assert table.column('business_name').to_pylist() == ['Ganguram Sweets', 'Balaram Mullick']
+    assert table.schema.field('emails').type == pa.list_(pa.string())
+    assert watermark == parse_since('2024-03-01T10:00:00Z')
+
+
+def test_saved_leads_are_read_in_batches(tmp_path):
+    db = Database(str(tmp_path / 'leads.db'))
+    db.migrate()
+    with db.transaction() as c:
+        c.executemany('''
+            INSERT INTO saved_leads (list_name, business_name, distance, scraped_emails, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [('a' if i % 2 else 'b', f'Shop {i}', i / 10, '["s@x.com"]', f'2024-01-0{1 + i % 3} 00:00:00')
+              for i in range(9)])
+
+    records = list(iter_saved_leads(db, since='2024-01-02', list_name='a', batch_size=2))
+
+    assert [record['business_name'] for record in records] == ['Shop 1', 'Shop 5', 'Shop 7']
+    assert all(record['emails'] == ['s@x.com'] for record in records)
+
+
+def test_an_empty_export_still_has_the_schema():
+    buffer = io.BytesIO()
+
+    assert write_columnar([], 'arrow', buffer) == (0, None)
+    assert pa.ipc.open_file(io.BytesIO(buffer.getvalue())).schema == SCHEMA
+    with pytest.raises(ValueError):
+        write_columnar([], 'csv', io.BytesIO())
+
+
+def test_columnar_export_route_sends_rows_and_watermark(root_app, store, monkeypatch):
+    monkeypatch.setattr(root_app, 'list_store', store)
+
+    response = root_app.app.test_client().get('/api/columnar-export?format=parquet&list_id=new')
+
+    assert response.headers['X-Export-Rows'] == '2'
+    assert response.headers['X-Export-Watermark'] == '2024-03-01T10:00:00+00:00'
+    assert pq.read_table(io.BytesIO(response.data)).num_rows == 2
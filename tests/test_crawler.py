@@ -0,0 +1,88 @@
+import threading
+import time
+
+from concurrency import HostLimiter, bounded_map
+from crawler import EmailCrawler
+
+PAGES = {
+    'https://shop.example/': '<p>sales@shop.in</p>\n<a href="/contact">Contact us</a>\n<a href="/menu">Menu</a>',
+    'https://shop.example/contact': '<p>orders@shop.in</p>',
+    'https://other.example': '<p>hello@other.in</p>',
+}
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeSession:
+    """Serves PAGES and records the most fetches it ever saw in flight at once."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.fetched = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout):
+        with self._lock:
+            self.fetched.append(url)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return FakePage(PAGES.get(url, ''))
+
+
+def crawler_with(session, **kwargs):
+    crawler = EmailCrawler(**kwargs)
+    crawler.session = session
+    return crawler
+
+
+def test_host_limiter_caps_each_host_and_drops_idle_hosts():
+    limiter = HostLimiter(per_host=2)
+    in_flight = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+    lock = threading.Lock()
+
+    def call(host):
+        with limiter.slot(host):
+            with lock:
+                in_flight[host] += 1
+                peak[host] = max(peak[host], in_flight[host])
+            time.sleep(0.01)
+            with lock:
+                in_flight[host] -= 1
+
+    bounded_map(call, ['a', 'b'] * 6, max_workers=12)
+
+    assert peak == {'a': 2, 'b': 2}
+    assert limiter._semaphores == {}
+
+
+def test_get_counts_against_the_global_fetch_cap():
+    session = FakeSession(delay=0.01)
+    crawler = crawler_with(session, max_fetches=2, per_domain=10)
+
+    urls = [f'https://site{i}.example/' for i in range(8)]
+    bounded_map(crawler.get, urls, max_workers=8)
+
+    assert sorted(session.fetched) == sorted(urls)
+    assert session.peak == 2
+
+
+def test_scrape_many_follows_contact_links_and_crawls_each_site_once():
+    session = FakeSession()
+    crawler = crawler_with(session, contact_pages=2)
+
+    found = crawler.scrape_many(['https://shop.example/', 'https://shop.example/', 'other.example', ''])
+
+    assert sorted(found['https://shop.example/']) == ['orders@shop.in', 'sales@shop.in']
+    assert found['other.example'] == ['hello@other.in']
+    assert '' not in found
+    assert sorted(session.fetched) == ['https://other.example', 'https://shop.example/',
+                                       'https://shop.example/contact']
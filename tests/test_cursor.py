@@ -0,0 +1,131 @@
+import importlib.util
+import os
+
+import pytest
+
+import leads_db
+from leads_db import Database
+from list_store import ITEM_SORTS, ListStore
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+
+@pytest.fixture(scope='module')
+def backend(tmp_path_factory):
+    # The backend migrates leads_db.db on import; keep it off the real database
+    previous = leads_db.db
+    leads_db.db = Database(str(tmp_path_factory.mktemp('import') / 'leads.db'))
+    try:
+        # By path: the root app is an importable 'app' too
+        spec = importlib.util.spec_from_file_location('backend_app', os.path.join(BACKEND, 'app.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        leads_db.db = previous
+
+
+@pytest.fixture
+def client(backend, tmp_path, monkeypatch):
+    db = Database(str(tmp_path / 'leads.db'))
+    db.migrate()
+    with db.transaction() as c:
+        # Ties on distance and on created_at, so pages have to break them by id
+        c.executemany('''
+            INSERT INTO saved_leads (list_name, business_name, distance, created_at) VALUES ('a', ?, ?, ?)
+        ''', [(f'Shop {i:02d}', None if i % 7 == 0 else float(i % 4), f'2024-01-0{1 + i % 3} 00:00:00')
+              for i in range(23)])
+        c.execute("INSERT INTO saved_leads (list_name, business_name) VALUES ('b', 'Elsewhere')")
+    monkeypatch.setattr(backend, 'db', db)
+    return backend.app.test_client(), db
+
+
+@pytest.mark.parametrize('values', [[1.5, 7], ['2024-01-02 00:00:00', 3], ["Shop's é", 12], [None, 1]])
+def test_cursor_round_trips(backend, values):
+    assert backend.decode_cursor(backend.encode_cursor(values)) == values
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', 'WzFd', 'eyJhIjogMX0='])
+def test_bad_cursors_are_rejected(backend, cursor):
+    with pytest.raises(ValueError):
+        backend.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('sort', ['newest', 'oldest', 'name', 'nearest', 'farthest'])
+def test_pages_cover_the_list_once_in_order(client, backend, sort):
+    client, db = client
+    expression, direction = backend.SAVED_LEAD_SORTS[sort]
+    expected = [row[0] for row in db.query(f'''
+        SELECT id FROM saved_leads WHERE list_name = 'a' ORDER BY {expression} {direction}, id {direction}
+    ''')]
+
+    seen, cursor = [], None
+    while True:
+        query = {'sort': sort, 'limit': 5}
+        if cursor:
+            query['cursor'] = cursor
+        page = client.get('/api/saved-lists/a/items', query_string=query).get_json()
+        assert ('total' in page) == (cursor is None)
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['nextCursor']
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_bad_cursor_is_a_client_error(client):
+    client, _ = client
+    response = client.get('/api/saved-lists/a/items', query_string={'cursor': 'WzFd'})
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def saved_list(root_app, tmp_path, monkeypatch):
+    store = ListStore(str(tmp_path / 'saved_lists.db'))
+    # Ties on distance and on name, so pages have to break them by position
+    store.save('l', 'List', [
+        {'business_name': f'Shop {i % 5}', 'distance': None if i % 7 == 0 else float(i % 4),
+         'website': 'https://shop.example' if i % 2 else '', 'postal_code': '70001' + str(i % 3),
+         'business_status': 'OPERATIONAL' if i % 4 else 'CLOSED_TEMPORARILY', 'n': i}
+        for i in range(23)
+    ])
+    monkeypatch.setattr(root_app, 'list_store', store)
+    return root_app.app.test_client()
+
+
+def read_saved_list(client, **query):
+    seen, cursor, total = [], None, None
+    while True:
+        page = client.get('/api/saved-lists/l/items', query_string=dict(query, limit=4, cursor=cursor or '')).get_json()
+        total = page.get('total', total)
+        seen.extend(item['n'] for item in page['items'])
+        cursor = page['nextCursor']
+        if cursor is None:
+            return seen, total
+
+
+@pytest.mark.parametrize('sort', list(ITEM_SORTS))
+def test_root_list_items_page_through_every_sort(saved_list, sort):
+    def key(n):
+        distance = 0 if n % 7 == 0 else float(n % 4)
+        return {'oldest': n, 'newest': -n, 'name': (f'Shop {n % 5}', n),
+                'nearest': (distance, n), 'farthest': (-distance, -n)}[sort]
+
+    seen, total = read_saved_list(saved_list, sort=sort)
+
+    assert seen == sorted(range(23), key=key)
+    assert total == 23
+
+
+def test_root_list_items_filter_like_the_backend(saved_list):
+    seen, total = read_saved_list(saved_list, hasWebsite='true', postalCode='700 011', status='OPERATIONAL',
+                                  maxDistance='2.5', sort='nearest')
+
+    expected = [n for n in range(23) if n % 2 and n % 3 == 1 and n % 4 and (0 if n % 7 == 0 else n % 4) <= 2.5]
+    assert sorted(seen) == expected and total == len(expected)
+
+
+def test_root_list_items_reject_unknown_sorts_and_bad_cursors(saved_list):
+    assert saved_list.get('/api/saved-lists/l/items', query_string={'sort': 'rating'}).status_code == 400
+    assert saved_list.get('/api/saved-lists/l/items', query_string={'cursor': 'WzFd'}).status_code == 400
@@ -0,0 +1,74 @@
+import base64
+import io
+import json
+
+import openpyxl
+import pytest
+
+import export
+from export import RESULT_COLUMNS, iter_csv, iter_ndjson
+from list_store import ListStore
+
+RESULTS = [
+    {'business_name': 'Ganguram Sweets', 'address': 'Park Street', 'distance': 220, 'emails': ['a@x.com']},
+    {'business_name': 'Balaram Mullick', 'phone': '033 2475 9403', 'website': 'https://balarammullick.com'},
+]
+
+
+@pytest.fixture
+def client(root_app):
+    return root_app.app.test_client()
+
+
+def read_xlsx(data):
+    sheet = openpyxl.load_workbook(io.BytesIO(data)).active
+    return [[cell if cell is not None else '' for cell in row] for row in sheet.iter_rows(values_only=True)]
+
+
+def test_export_excel_returns_base64_json_by_default(client):
+    response = client.post('/api/export-excel', json={'results': RESULTS})
+
+    body = response.get_json()
+    assert response.status_code == 200 and body['status'] == 'success'
+    assert body['filename'].startswith('lead_getter_results_') and body['filename'].endswith('.xlsx')
+    rows = read_xlsx(base64.b64decode(body['file']))
+    assert rows[0] == [header for _, header, _ in RESULT_COLUMNS]
+    assert rows[1][:3] == ['Ganguram Sweets', 'Park Street', ''] and rows[1][5] == '0.22 km'
+
+
+def test_export_excel_sends_the_file_when_asked(client):
+    response = client.post('/api/export-excel?download=true', json={'results': RESULTS})
+
+    assert response.headers['Content-Type'] == export.MIMETYPES['xlsx']
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert read_xlsx(response.data)[2][0] == 'Balaram Mullick'
+
+    response = client.post('/api/export-excel', json={'results': RESULTS, 'download': True, 'format': 'csv'})
+    assert response.data.decode('utf-8-sig').splitlines()[2].startswith('Balaram Mullick,,033 2475 9403')
+
+
+def test_export_excel_rejects_empty_exports_and_unknown_formats(client):
+    assert client.post('/api/export-excel', json={'results': []}).status_code == 400
+    assert client.post('/api/export-excel', json={'results': RESULTS, 'format': 'pdf'}).status_code == 400
+
+
+def test_streams_come_in_chunks(monkeypatch):
+    monkeypatch.setattr(export, 'STREAM_CHUNK_ROWS', 2)
+    records = [{'business_name': str(i)} for i in range(5)]
+
+    assert len(list(iter_csv(records, RESULT_COLUMNS))) == 3
+    chunks = list(iter_ndjson(records))
+    assert len(chunks) == 3
+    assert [json.loads(line) for line in b''.join(chunks).decode().splitlines()] == records
+
+
+def test_saved_lists_export_from_the_store(root_app, client, tmp_path, monkeypatch):
+    store = ListStore(str(tmp_path / 'saved_lists.db'))
+    store.save('l', 'List', RESULTS)
+    monkeypatch.setattr(root_app, 'list_store', store)
+
+    response = client.get('/api/saved-lists/l/export?format=ndjson')
+
+    assert [json.loads(line) for line in response.data.decode().splitlines()] == RESULTS
+    assert 'filename="l.ndjson"' in response.headers['Content-Disposition']
+    assert client.get('/api/saved-lists/missing/export').status_code == 404
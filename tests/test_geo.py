@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from geo import (assign_nearest_origin, calculate_distance, distance_matrix, distances_from, nearest_k,
+                 paired_distances)
+
+PARK_STREET = (22.5500, 88.3500)
+PLACES = [(22.5600, 88.3500), (22.5520, 88.3500), (22.6400, 88.3500), (22.5500, 88.3600)]
+
+
+def test_vectorized_distances_match_the_scalar_one():
+    expected = [calculate_distance(*PARK_STREET, *place) for place in PLACES]
+
+    assert distances_from(PARK_STREET, PLACES) == pytest.approx(expected)
+    assert paired_distances([PARK_STREET] * len(PLACES), PLACES) == pytest.approx(expected)
+    assert distance_matrix([PARK_STREET, PLACES[2]], PLACES).shape == (2, 4)
+
+
+def test_nearest_k_sorts_only_the_winners():
+    order, distances = nearest_k(PARK_STREET, PLACES, 2)
+
+    assert list(order) == [1, 3]
+    assert list(distances) == sorted(distances)
+    assert len(nearest_k(PARK_STREET, PLACES, 10)[0]) == 4
+    assert len(nearest_k(PARK_STREET, [], 3)[0]) == 0
+
+
+def test_each_place_is_measured_from_its_nearest_origin():
+    origins = [PARK_STREET, (22.6400, 88.3500)]
+
+    nearest, distances = assign_nearest_origin(origins, PLACES)
+
+    assert list(nearest) == [0, 0, 1, 0]
+    assert distances[2] == pytest.approx(0)
+    assert np.all(distances <= distance_matrix(origins, PLACES).min(axis=0) + 1e-9)
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import geocache
+from geocache import GeocodeCache, cached_geocode, normalize_location
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(str(tmp_path / 'geocode_cache.db'), ttl=60, negative_ttl=1, max_entries=2)
+
+
+def test_locations_written_differently_share_an_entry():
+    assert normalize_location(' Park  Street ,Kolkata, 700 016 ') == 'park street, kolkata, 700016'
+
+
+def test_memory_keeps_the_most_recently_used_entries(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set('forward', key, [1, 2])
+    cache.get('forward', 'b')
+    cache.set('forward', 'd', [3, 4])
+
+    assert list(cache._memory) == [('forward', 'b'), ('forward', 'd')]
+    # Evicted from memory only; the disk tier still answers
+    assert cache.get('forward', 'a') == [1, 2]
+    assert cache.get_stats()['disk_hits'] == 1
+
+
+def test_entries_expire_after_their_ttl(cache, monkeypatch):
+    cache.set('forward', 'known', [1, 2])
+    cache.set('forward', 'typo', None)
+    now = time.time()
+
+    monkeypatch.setattr(geocache.time, 'time', lambda: now + 30)
+    assert cache.get('forward', 'known') == [1, 2]
+    # Empty answers are kept for the shorter negative TTL
+    assert cache.get('forward', 'typo') is geocache._MISSING
+
+    monkeypatch.setattr(geocache.time, 'time', lambda: now + 61)
+    assert cache.get('forward', 'known') is geocache._MISSING
+    assert cache.purge_expired() == 2
+
+
+def test_cached_geocode_calls_the_lookup_once_and_never_caches_errors(cache, monkeypatch):
+    monkeypatch.setattr(geocache, 'geocode_cache', cache)
+    calls = []
+
+    def lookup(location):
+        calls.append(location)
+        if location == 'down':
+            raise RuntimeError('timeout')
+        return (22.5, 88.3)
+
+    assert cached_geocode('Salt Lake', lookup) == (22.5, 88.3)
+    assert cached_geocode('salt  lake', lookup) == (22.5, 88.3)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cached_geocode('down', lookup)
+    assert calls == ['Salt Lake', 'down', 'down']
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from leads_db import MIGRATIONS, Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'leads.db'))
+    database.migrate()
+    return database
+
+
+def test_migrations_run_once(db):
+    assert db.query_one('PRAGMA user_version')[0] == len(MIGRATIONS)
+    assert db.migrate() == 0
+
+
+def test_migrations_resume_from_user_version(tmp_path):
+    database = Database(str(tmp_path / 'leads.db'), MIGRATIONS[:2])
+    assert database.migrate() == 2
+    database.connection().execute(
+        "INSERT INTO saved_leads (list_name, business_name, address) VALUES ('a', 'Shop', 'Park Street 700016')")
+
+    upgraded = Database(database.path)
+    assert upgraded.migrate() == len(MIGRATIONS) - 2
+    # The backfill and the lists summary ran over the existing row
+    assert upgraded.query_one('SELECT postal_code FROM saved_leads')[0] == '700016'
+    assert upgraded.query_one("SELECT lead_count FROM lists WHERE name = 'a'")[0] == 1
+
+
+def test_connections_are_per_thread_and_in_wal_mode(db):
+    assert db.query_one('PRAGMA journal_mode')[0] == 'wal'
+    assert db.connection() is db.connection()
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not db.connection()
+
+
+def test_transaction_rolls_back_when_the_block_raises(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as c:
+            c.execute("INSERT INTO saved_leads (list_name, business_name) VALUES ('a', 'Shop')")
+            raise RuntimeError('abort')
+
+    assert db.query_one('SELECT COUNT(*) FROM saved_leads')[0] == 0
+    # The connection is usable again afterwards
+    with db.transaction() as c:
+        c.execute("INSERT INTO saved_leads (list_name, business_name) VALUES ('a', 'Shop')")
+    assert db.query_one('SELECT COUNT(*) FROM saved_leads')[0] == 1
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from list_store import ListStore, migrate
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ListStore(str(tmp_path / 'saved_lists.db'))
+
+
+def items(count):
+    return [{'business_name': f'Shop {i}', 'distance': i / 10} for i in range(count)]
+
+
+def test_save_replaces_a_list_unless_told_not_to(store):
+    assert store.save('l', 'Sweets', items(3), search_term='sweets', locations=['700016'],
+                      created_at='2024-01-01T00:00:00')
+    assert not store.save('l', 'Other', items(1), replace=False)
+    assert store.get_summary('l') == {'id': 'l', 'name': 'Sweets', 'searchTerm': 'sweets',
+                                      'locations': ['700016'], 'category': None,
+                                      'createdAt': '2024-01-01T00:00:00', 'count': 3}
+
+    assert store.save('l', 'Other', items(1))
+    assert store.get('l')['results'] == items(1)
+
+
+def test_overview_is_newest_first_without_items(store):
+    store.save('old', 'Old', items(2), created_at='2024-01-01')
+    store.save('new', 'New', items(5), created_at='2024-02-01')
+
+    assert [(saved['id'], saved['count']) for saved in store.overview()] == [('new', 5), ('old', 2)]
+    assert all('results' not in saved for saved in store.overview())
+    assert store.names() == [{'id': 'new', 'name': 'New'}, {'id': 'old', 'name': 'Old'}]
+
+
+def test_items_page_by_position(store):
+    store.save('l', 'List', items(7))
+
+    first = store.items('l', limit=3)
+    second = store.items('l', first[-1][0], 3)
+
+    assert [position for position, _ in first + second] == [0, 1, 2, 3, 4, 5]
+    assert list(store.iter_items('l', batch_size=2)) == items(7)
+    assert store.items('missing') == []
+
+
+def test_delete_removes_the_items_too(store):
+    store.save('l', 'List', items(2))
+
+    assert store.delete('l')
+    assert not store.delete('l')
+    assert store.get('l') is None and store.items('l') == []
+
+
+def test_migrate_imports_both_legacy_shapes_once(store, tmp_path):
+    lists_dir, leads_dir = tmp_path / 'saved_lists', tmp_path / 'saved' / 'leads'
+    lists_dir.mkdir()
+    leads_dir.mkdir(parents=True)
+    (lists_dir / 'a.json').write_text(json.dumps({
+        'id': 'a', 'name': 'Sweets', 'results': items(2), 'searchTerm': 'sweets',
+        'locations': ['700016'], 'createdAt': '2024-01-01'}))
+    (leads_dir / 'b.json').write_text(json.dumps({
+        'metadata': {'category': 'email', 'saved_at': '2024-02-01'}, 'leads': [{'email': 'a@x.com'}]}))
+    (leads_dir / 'broken.json').write_text('{')
+    (leads_dir / 'notes.txt').write_text('')
+
+    assert migrate(store, [str(lists_dir), str(leads_dir), str(tmp_path / 'missing')]) == {
+        'imported': 2, 'skipped': 0, 'failed': 1}
+    assert store.get('a')['results'] == items(2)
+    assert store.get_summary('b')['category'] == 'email'
+    assert migrate(store, [str(lists_dir), str(leads_dir)])['skipped'] == 2
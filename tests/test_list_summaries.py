@@ -0,0 +1,66 @@
+import pytest
+
+from leads_db import Database, check_list_summaries, rebuild_list_summaries
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'leads.db'))
+    database.migrate()
+    return database
+
+
+def save(db, list_name, business_name, created_at):
+    with db.transaction() as c:
+        c.execute('INSERT INTO saved_leads (list_name, business_name, address, created_at) VALUES (?, ?, ?, ?)',
+                  (list_name, business_name, f'{business_name} Road, Kolkata 700001', created_at))
+        return c.lastrowid
+
+
+def summary(db, name):
+    return db.query_one('SELECT lead_count, first_id, last_updated FROM lists WHERE name = ?', (name,))
+
+
+def test_insert_counts_into_list(db):
+    first = save(db, 'a', 'One', '2024-01-01 00:00:00')
+    save(db, 'a', 'Two', '2024-01-02 00:00:00')
+
+    assert summary(db, 'a') == (2, first, '2024-01-02 00:00:00')
+
+
+def test_delete_recomputes_held_values_and_drops_empty_lists(db):
+    first = save(db, 'a', 'One', '2024-01-01 00:00:00')
+    second = save(db, 'a', 'Two', '2024-01-02 00:00:00')
+
+    with db.transaction() as c:
+        c.execute('DELETE FROM saved_leads WHERE id = ?', (first,))
+    assert summary(db, 'a') == (1, second, '2024-01-02 00:00:00')
+
+    with db.transaction() as c:
+        c.execute('DELETE FROM saved_leads WHERE id = ?', (second,))
+    assert summary(db, 'a') is None
+
+
+def test_move_counts_out_of_one_list_into_another(db):
+    first = save(db, 'a', 'One', '2024-01-01 00:00:00')
+    second = save(db, 'a', 'Two', '2024-01-02 00:00:00')
+    save(db, 'b', 'Three', '2024-01-03 00:00:00')
+
+    with db.transaction() as c:
+        c.execute("UPDATE saved_leads SET list_name = 'b' WHERE id = ?", (first,))
+
+    assert summary(db, 'a') == (1, second, '2024-01-02 00:00:00')
+    assert summary(db, 'b') == (2, first, '2024-01-03 00:00:00')
+    with db.transaction() as c:
+        assert check_list_summaries(c) == []
+
+
+def test_check_reports_drift_and_rebuild_repairs_it(db):
+    save(db, 'a', 'One', '2024-01-01 00:00:00')
+    with db.transaction() as c:
+        c.execute("UPDATE lists SET lead_count = 5 WHERE name = 'a'")
+        c.execute("INSERT INTO lists (name, lead_count) VALUES ('gone', 1)")
+
+        assert [mismatch['name'] for mismatch in check_list_summaries(c)] == ['a', 'gone']
+        rebuild_list_summaries(c)
+        assert check_list_summaries(c) == []
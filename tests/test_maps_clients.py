@@ -0,0 +1,62 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from concurrency import bounded_map
+from maps_clients import MapsClientRegistry
+from quota import ThrottledClient
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(('127.0.0.1', 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+
+
+def test_keys_are_handed_out_in_turn_with_one_client_each():
+    registry = MapsClientRegistry(keys=['AIzaKEY1', 'AIzaKEY2'])
+
+    clients = bounded_map(lambda _: registry.client(), range(8), max_workers=8)
+
+    assert len({id(client) for client in clients}) == 2
+    assert all(isinstance(client, ThrottledClient) for client in clients)
+    assert registry.client('AIzaKEY1') is registry.client('AIzaKEY1')
+
+
+def test_keys_are_read_when_first_needed(monkeypatch):
+    monkeypatch.delenv('GOOGLE_MAPS_API_KEYS', raising=False)
+    monkeypatch.delenv('GOOGLE_MAPS_API_KEY', raising=False)
+    registry = MapsClientRegistry()
+    with pytest.raises(ValueError):
+        registry.entry()
+
+    monkeypatch.setenv('GOOGLE_MAPS_API_KEYS', 'AIzaKEY1, AIzaKEY2,')
+    assert [registry.entry().key for _ in range(3)] == ['AIzaKEY1', 'AIzaKEY2', 'AIzaKEY1']
+
+
+def test_stats_count_reused_connections_without_the_key(server):
+    registry = MapsClientRegistry(keys=['AIzaSECRET'])
+    session = registry.entry().session
+
+    for _ in range(4):
+        session.get(server, timeout=5)
+
+    stats = registry.get_stats()
+    assert stats['clients'] == [{'key': '...CRET', 'requests': 4, 'connections_opened': 1}]
+    assert stats['reuse_rate'] == 0.75
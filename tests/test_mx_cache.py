@@ -0,0 +1,116 @@
+import threading
+import time
+
+import dns.exception
+import dns.name
+import dns.resolver
+import pytest
+
+import mx_cache as mx_cache_module
+from concurrency import bounded_map
+from mx_cache import MXCache
+
+
+class FakeRecord:
+    def __init__(self, preference, exchange):
+        self.preference = preference
+        self.exchange = dns.name.from_text(exchange)
+
+
+class FakeAnswer(list):
+    def __init__(self, records, ttl):
+        super().__init__(records)
+        self.rrset = type('RRset', (), {'ttl': ttl})()
+
+
+class FakeResolver:
+    """Answers per domain after a delay and counts the queries."""
+
+    def __init__(self, answers, delay=0):
+        self.answers = answers
+        self.delay = delay
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def resolve(self, domain, rdtype, lifetime):
+        with self._lock:
+            self.queries.append(domain)
+        time.sleep(self.delay)
+        answer = self.answers[domain]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    resolver = FakeResolver({
+        'shop.in': FakeAnswer([FakeRecord(20, 'mx2.shop.in.'), FakeRecord(10, 'mx1.shop.in.')], ttl=5),
+        'typo.in': dns.resolver.NXDOMAIN(),
+        'down.in': dns.exception.Timeout(),
+    })
+    monkeypatch.setattr(dns.resolver, 'resolve', resolver.resolve)
+    return resolver
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {'now': time.time()}
+    monkeypatch.setattr(mx_cache_module.time, 'time', lambda: clock['now'])
+    return clock
+
+
+def test_answers_are_cached_for_their_ttl_within_bounds(resolver, clock):
+    cache = MXCache(min_ttl=60, max_ttl=3600)
+
+    assert cache.lookup('Shop.in.') == ['mx1.shop.in', 'mx2.shop.in']
+    clock['now'] += 59
+    assert cache.lookup('shop.in') == ['mx1.shop.in', 'mx2.shop.in']
+    # The record's 5 s TTL was raised to min_ttl
+    clock['now'] += 2
+    cache.lookup('shop.in')
+
+    assert resolver.queries == ['shop.in', 'shop.in']
+
+
+def test_missing_domains_are_cached_for_the_negative_ttl(resolver, clock):
+    cache = MXCache(negative_ttl=300)
+
+    assert not cache.has_mx('typo.in')
+    clock['now'] += 299
+    assert cache.lookup('typo.in') == []
+    clock['now'] += 2
+    cache.lookup('typo.in')
+
+    assert resolver.queries == ['typo.in', 'typo.in']
+    assert cache.get_stats()['negative'] == 2
+
+
+def test_failures_are_remembered_briefly_and_raised_again(resolver, clock):
+    cache = MXCache(error_ttl=15)
+
+    for _ in range(2):
+        with pytest.raises(dns.exception.Timeout):
+            cache.lookup('down.in')
+    assert resolver.queries == ['down.in']
+
+    clock['now'] += 16
+    with pytest.raises(dns.exception.Timeout):
+        cache.lookup('down.in')
+    assert resolver.queries == ['down.in', 'down.in']
+
+
+def test_concurrent_lookups_of_a_domain_share_one_query(resolver):
+    resolver.delay = 0.05
+    cache = MXCache()
+
+    answers = bounded_map(cache.lookup, ['shop.in'] * 8, max_workers=8)
+
+    assert answers == [['mx1.shop.in', 'mx2.shop.in']] * 8
+    assert resolver.queries == ['shop.in']
+    assert cache._domain_locks == {}
+
+
+def test_resolve_many_maps_failures_to_none(resolver):
+    assert MXCache().resolve_many(['shop.in', 'typo.in', 'down.in', 'shop.in']) == {
+        'shop.in': ['mx1.shop.in', 'mx2.shop.in'], 'typo.in': [], 'down.in': None}
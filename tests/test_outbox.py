@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from outbox import Outbox, OutboxWorker
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / 'messages.db'))
+
+
+def queue(outbox, count=3, campaign_id='c1'):
+    messages = [{'recipient': f'91980000000{i}', 'body': 'Hello'} for i in range(count)]
+    return outbox.enqueue('whatsapp', messages, campaign_id=campaign_id, sender='sender')
+
+
+def rows(outbox):
+    conn = outbox._connection()
+    return {row['id']: dict(row) for row in conn.execute('SELECT * FROM message_logs')}
+
+
+def test_enqueue_is_idempotent(outbox):
+    assert queue(outbox) == ('c1', 3)
+    assert queue(outbox) == ('c1', 0)
+    assert outbox.campaign('c1')['total'] == 3
+
+
+def test_claims_are_exclusive(outbox):
+    queue(outbox, count=5)
+
+    first = outbox.claim('worker-1', 'whatsapp', limit=3)
+    second = outbox.claim('worker-2', 'whatsapp', limit=3)
+
+    assert len(first) == 3 and len(second) == 2
+    assert not {row['id'] for row in first} & {row['id'] for row in second}
+    assert outbox.claim('worker-3', 'whatsapp') == []
+    assert outbox.claim('worker-3', 'email') == []
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    outbox = Outbox(str(tmp_path / 'messages.db'), lease_seconds=0)
+    queue(outbox, count=1)
+
+    first, = outbox.claim('worker-1', 'whatsapp')
+    second, = outbox.claim('worker-2', 'whatsapp')
+
+    assert first['id'] == second['id']
+    assert second['attempts'] == 2
+    # The first worker's late result is fenced off
+    assert outbox.complete('worker-1', [{'id': first['id'], 'status': 'sent'}]) == 0
+    assert outbox.complete('worker-2', [{'id': second['id'], 'status': 'sent', 'provider_message_id': 'm'}]) == 1
+    assert rows(outbox)[second['id']]['provider_message_id'] == 'm'
+
+
+def test_release_hands_back_without_counting_an_attempt(outbox):
+    queue(outbox, count=1)
+    claimed, = outbox.claim('worker-1', 'whatsapp')
+
+    outbox.release('worker-2', [claimed['id']])
+    assert rows(outbox)[claimed['id']]['status'] == 'in_flight'
+
+    outbox.release('worker-1', [claimed['id']])
+    row = rows(outbox)[claimed['id']]
+    assert (row['status'], row['attempts'], row['lease_owner']) == ('pending', 0, None)
+    assert outbox.claim('worker-2', 'whatsapp')[0]['id'] == claimed['id']
+
+
+def test_retry_waits_until_due(outbox):
+    queue(outbox, count=1)
+    claimed, = outbox.claim('worker-1', 'whatsapp')
+
+    outbox.complete('worker-1', [{'id': claimed['id'], 'status': 'retry', 'error': 'HTTP 429',
+                                  'retry_at': datetime.utcnow() + timedelta(hours=1)}])
+    assert outbox.claim('worker-1', 'whatsapp') == []
+
+    conn = outbox._connection()
+    conn.execute("UPDATE message_logs SET available_at = '2000-01-01 00:00:00.000000'")
+    retried, = outbox.claim('worker-1', 'whatsapp')
+    assert retried['attempts'] == 2
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    outbox = Outbox(str(tmp_path / 'messages.db'), lease_seconds=0, max_attempts=2)
+    queue(outbox, count=1)
+
+    assert len(outbox.claim('worker-1', 'whatsapp')) == 1
+    assert len(outbox.claim('worker-1', 'whatsapp')) == 1
+    assert outbox.claim('worker-1', 'whatsapp') == []
+
+    campaign = outbox.campaign('c1')
+    assert campaign['failed'] == 1
+    assert campaign['failures'][0]['error'].startswith('Gave up after 2 attempts')
+
+
+def test_worker_without_run_once_fails_on_construction(outbox):
+    class Forgetful(OutboxWorker):
+        pass
+
+    with pytest.raises(TypeError):
+        Forgetful(outbox)
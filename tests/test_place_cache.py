@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+import place_cache as place_cache_module
+from place_cache import PlaceDetailsCache
+
+DETAILS = {'name': 'Ganguram Sweets', 'formatted_address': 'Park Street', 'business_status': 'OPERATIONAL'}
+
+
+class FakeDetails:
+    def __init__(self, result=DETAILS):
+        self.result = result
+        self.calls = []
+
+    def __call__(self, place_id, fields):
+        self.calls.append(sorted(fields))
+        if self.result is None:
+            return None
+        return {field: self.result[field] for field in fields if field in self.result}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlaceDetailsCache(str(tmp_path / 'place_cache.db'))
+
+
+def test_a_subset_of_cached_fields_is_answered_locally(cache):
+    fetch = FakeDetails()
+    cache.get('p', ['name', 'formatted_address', 'website'], fetch)
+
+    assert cache.get('p', ['name', 'website'], fetch) == {'name': 'Ganguram Sweets'}
+    # Only the field never asked for goes to the API
+    assert cache.get('p', ['name', 'business_status'], fetch) == {
+        'name': 'Ganguram Sweets', 'business_status': 'OPERATIONAL'}
+    assert fetch.calls == [['formatted_address', 'name', 'website'], ['business_status']]
+    assert cache.get_stats() == {'full_hits': 1, 'partial_hits': 1, 'misses': 1,
+                                 'fields_served': 3, 'fields_fetched': 4}
+
+
+def test_volatile_fields_go_stale_first(cache, monkeypatch):
+    fetch = FakeDetails()
+    cache.get('p', ['name', 'business_status'], fetch)
+    now = time.time()
+
+    monkeypatch.setattr(place_cache_module.time, 'time', lambda: now + 2 * 24 * 3600)
+    cache.get('p', ['name', 'business_status'], fetch)
+
+    assert fetch.calls == [['business_status', 'name'], ['business_status']]
+
+
+def test_a_failed_call_caches_nothing(cache):
+    assert cache.get('p', ['name'], FakeDetails(None)) == {}
+
+    fetch = FakeDetails()
+    assert cache.get('p', ['name'], fetch) == {'name': 'Ganguram Sweets'}
+    assert fetch.calls == [['name']]
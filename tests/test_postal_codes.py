@@ -0,0 +1,64 @@
+import random
+import re
+
+import pytest
+
+from postal_codes import extract_postal_code, get_pincode_from_address
+
+# The six patterns extract_postal_code() replaced, tried in turn
+OLD_PATTERNS = [
+    r'\b\d{6}\b',  # India
+    r'\b\d{5}(?:-\d{4})?\b',  # US
+    r'\b[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}\b',  # UK
+    r'\b[ABCEGHJ-NPRSTVXY]\d[A-Z] ?\d[A-Z]\d\b',  # Canada
+    r'\b\d{4} ?[A-Z]{2}\b',  # Netherlands
+    r'\b\d{4}\b',  # Many countries
+]
+
+
+def old_extract(address):
+    for pattern in OLD_PATTERNS:
+        match = re.search(pattern, address, re.IGNORECASE)
+        if match:
+            return match.group().strip()
+    return None
+
+
+@pytest.mark.parametrize('address, expected', [
+    ('12345uk, ', None),
+    ('123456ab-x, ', None),
+    ('ab  , 1234-5678 ab-', '5678 ab'),
+    ('Shop 12, Lake Market, Kolkata 700029', '700029'),
+    ('12 Main St, Springfield, IL 62704-1234', '62704-1234'),
+    ('221B Baker Street, London NW1 6XE', 'NW1 6XE'),
+    ('290 Bremner Blvd, Toronto, ON M5V 3L9', 'M5V 3L9'),
+    ('Damrak 1, 1012 LG Amsterdam', '1012 LG'),
+    ('Suite 4, 2000 Sydney NSW', '2000'),
+    ('Unnamed Road, Near Bus Stand', None),
+])
+def test_matches_old_patterns(address, expected):
+    assert old_extract(address) == expected
+    assert extract_postal_code(address) == expected
+
+
+def test_matches_old_patterns_on_generated_addresses():
+    # Fragments that put the formats next to, inside and overlapping each
+    # other; no country names, which are hints the old patterns didn't have
+    fragments = ['1', '12', '1234', '12345', '123456', '1234567', '-', '-1234', ' ', '  ', ',',
+                 'ab', 'AB', 'q', 'a1', 'W1', 'SW1A', ' 1AA', 'A1A', '1A1', 'K1A', '0AA', 'M5V', '3L1']
+    rng = random.Random(11)
+    for _ in range(20000):
+        address = ''.join(rng.choice(fragments) for _ in range(rng.randint(1, 9)))
+        assert extract_postal_code(address) == old_extract(address), address
+
+
+def test_country_hints_rank_candidates():
+    address = '10 Downing Street, London SW1A 2AA, 12345'
+    assert extract_postal_code(address) == '12345'
+    assert extract_postal_code(address, 'GB') == 'SW1A 2AA'
+    assert extract_postal_code(address + ', United Kingdom') == 'SW1A 2AA'
+
+
+def test_strict_only_accepts_the_country_format():
+    assert get_pincode_from_address('Kolkata 700029, India') == '700029'
+    assert get_pincode_from_address('Springfield, IL 62704') is None
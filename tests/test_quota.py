@@ -0,0 +1,94 @@
+import googlemaps.exceptions
+import pytest
+
+from concurrency import bounded_map
+from quota import BudgetExceeded, MapsQuota, OverQueryLimit, ThrottledClient, TokenBucket, parse_budget
+
+
+@pytest.fixture
+def quota():
+    return MapsQuota(max_retries=2, backoff_base=0)
+
+
+class Flaky:
+    """Answers with quota errors a number of times, then with 'ok'."""
+
+    def __init__(self, failures, error=OverQueryLimit):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error()
+        return 'ok'
+
+
+def test_quota_errors_are_retried_then_raised(quota):
+    assert quota.call('details', Flaky(2)) == 'ok'
+
+    flaky = Flaky(5)
+    with pytest.raises(OverQueryLimit):
+        quota.call('details', flaky)
+
+    assert flaky.calls == 3
+    stats = quota.get_stats()['details']
+    assert (stats['calls'], stats['retries'], stats['quota_errors'], stats['failures']) == (6, 4, 5, 1)
+
+
+def test_googlemaps_quota_errors_are_retried_and_other_errors_are_not(quota):
+    flaky = Flaky(1, lambda: googlemaps.exceptions.ApiError('OVER_QUERY_LIMIT'))
+    assert quota.call('nearby', flaky) == 'ok'
+
+    denied = Flaky(1, lambda: googlemaps.exceptions.ApiError('REQUEST_DENIED'))
+    with pytest.raises(googlemaps.exceptions.ApiError):
+        quota.call('nearby', denied)
+    assert denied.calls == 1
+
+
+def test_a_budget_rejects_calls_past_it_on_every_thread(quota):
+    with quota.budget(details=3) as budget:
+        def call(_):
+            try:
+                return quota.call('details', lambda: 'ok')
+            except BudgetExceeded:
+                return 'rejected'
+
+        answers = bounded_map(call, range(5), max_workers=5)
+        # Other APIs aren't capped
+        assert quota.call('geocode', lambda: 'ok') == 'ok'
+
+    assert sorted(answers) == ['ok'] * 3 + ['rejected'] * 2
+    assert budget.get_stats() == {'details': {'limit': 3, 'spent': 3}}
+    assert quota.get_stats()['details']['budget_rejections'] == 2
+    # Outside the block nothing is capped
+    assert quota.call('details', lambda: 'ok') == 'ok'
+
+
+def test_the_bucket_throttles_past_its_burst():
+    bucket = TokenBucket(rate=100, capacity=2)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert all(wait > 0 for wait in waits[2:])
+
+
+def test_the_throttled_client_only_wraps_maps_calls(quota):
+    class Client:
+        def place(self, place_id, fields):
+            return {'result': {'place_id': place_id}}
+
+        key = 'AIza'
+
+    client = ThrottledClient(Client(), quota)
+
+    assert client.place('p', fields=['name']) == {'result': {'place_id': 'p'}}
+    assert client.key == 'AIza'
+    assert quota.get_stats()['details']['calls'] == 1
+
+
+def test_parse_budget_ignores_unknown_apis():
+    assert parse_budget('{"details": "40", "directions": 5}') == {'details': 40}
+    assert parse_budget(None) == {}
@@ -0,0 +1,53 @@
+import random
+import re
+
+from relevance import (CATEGORY_RULES, Classifier, _trie_pattern, classify, is_cake_shop, is_relevant_place,
+                       is_sweet_shop, passes_prefilter)
+
+NAMES = ['Mio Amore', 'Bhim Chandra Nag Mishtan Bhandar', 'Bakery & Cafe', 'City Hospital', '', None,
+         'Karachi Bakery', 'Balaram Mullick', 'Gelato Italiano', 'Bake House', 'Shree Halwai Sweets']
+TYPES = [['store'], ['bakery', 'food'], [], None, ['hindu_temple'], ['doctor', 'health']]
+
+
+def naive_labels(place):
+    """The rules as the shop checks used to apply them, one substring test at a time."""
+    name = (place.get('name') or '').lower()
+    types = place.get('types') or []
+    return {category for category, rule in CATEGORY_RULES.items()
+            if any(indicator in name for indicator in rule.get('names', ()))
+            or any(t in rule.get('types', ()) for t in types)}
+
+
+def test_the_trie_pattern_matches_exactly_its_words():
+    pattern = re.compile(f"^{_trie_pattern(['bake', 'bakery', 'bhog', 'b'])}$")
+
+    assert all(pattern.match(word) for word in ['bake', 'bakery', 'bhog', 'b'])
+    assert not any(pattern.match(word) for word in ['bak', 'baker', 'bh', ''])
+
+
+def test_classify_labels_a_batch_like_the_per_place_rules():
+    rng = random.Random(7)
+    places = [{'name': rng.choice(NAMES), 'types': rng.choice(TYPES)} for _ in range(500)]
+
+    labels = classify(places)
+
+    assert labels == [naive_labels(place) for place in places]
+    assert labels == [Classifier(CATEGORY_RULES).labels(place) for place in places]
+    assert classify([]) == []
+
+
+def test_shop_checks_use_names_and_types():
+    assert is_cake_shop({'name': 'Monginis Cake Shop'})
+    assert is_sweet_shop({'name': 'Shree Halwai'})
+    assert not is_sweet_shop({'name': 'Shree Tailors'})
+    assert Classifier(CATEGORY_RULES).matches({'name': 'X', 'types': ['lodging']}, 'hotel')
+
+
+def test_relevance_and_the_prefilter():
+    bakery = {'name': 'Bake House', 'types': ['bakery', 'food', 'establishment']}
+
+    assert is_relevant_place(bakery, 'restaurant')
+    assert not is_relevant_place(bakery, 'hospital')
+    assert not passes_prefilter(bakery, 'hospital')
+    # A hit without types is left for the details call
+    assert passes_prefilter({'name': 'Bake House'}, 'hospital')
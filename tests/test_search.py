@@ -0,0 +1,140 @@
+import itertools
+import json
+
+import pytest
+
+# Caches persist across tests, so every test searches its own places
+_run = itertools.count()
+
+BASE_KEYS = {'business_name', 'address', 'phone', 'website', 'distance', 'google_maps_url', 'opening_hours'}
+
+
+class FakeMaps:
+    """
+    Two locations a few hundred meters apart. The first nearby page has a
+    sweet shop both locations find, a shop whose name lacks the keyword and
+    one 10 km out; a second page and the text search add one place each.
+    """
+
+    def __init__(self):
+        self.run = run = next(_run)
+        self.locations = {f'Park Street {run}': (22.5500, 88.3500), f'Esplanade {run}': (22.5600, 88.3500)}
+        self.catalog = {
+            f'sweets-{run}': ('Ganguram Sweets', (22.5520, 88.3500), 'Park Street, Kolkata 700016', ['store']),
+            f'mullick-{run}': ('Balaram Mullick', (22.5540, 88.3500), 'Bhowanipore, Kolkata 700020',
+                               ['bakery', 'food']),
+            f'far-{run}': ('Far Sweets', (22.6400, 88.3500), 'Dum Dum, Kolkata 700028', ['store']),
+            f'page2-{run}': ('Page Two Sweets', (22.5510, 88.3500), 'Park Street, Kolkata 700016', ['store']),
+            f'text-{run}': ('Text Sweets', (22.5505, 88.3500), 'Park Street, Kolkata 700016', ['store']),
+        }
+        self.page_token = f'token-{run}'
+        self.calls = []
+
+    def hit(self, place_id):
+        name, (lat, lng), _, types = self.catalog[place_id]
+        return {'place_id': place_id, 'name': name, 'types': types,
+                'geometry': {'location': {'lat': lat, 'lng': lng}}}
+
+    def geocode(self, location):
+        self.calls.append(('geocode', location))
+        lat, lng = self.locations[location]
+        return [{'geometry': {'location': {'lat': lat, 'lng': lng}}}]
+
+    def places_nearby(self, location=None, radius=None, keyword=None, page_token=None):
+        self.calls.append(('places_nearby', page_token))
+        if page_token:
+            return {'results': [self.hit(place_id) for place_id in self.catalog if place_id.startswith('page2')]}
+        return {'results': [self.hit(place_id) for place_id in self.catalog
+                            if place_id.split('-')[0] in ('sweets', 'mullick', 'far')],
+                'next_page_token': self.page_token}
+
+    def places(self, query, location, radius):
+        self.calls.append(('places', query))
+        return {'results': [self.hit(place_id) for place_id in self.catalog if place_id.startswith('text')]}
+
+    def place(self, place_id, fields):
+        self.calls.append(('place', place_id))
+        name, (lat, lng), address, types = self.catalog[place_id]
+        return {'result': {'name': name, 'formatted_address': address, 'types': types,
+                           'geometry': {'location': {'lat': lat, 'lng': lng}}}}
+
+    def reverse_geocode(self, coords):
+        self.calls.append(('reverse_geocode', coords))
+        return [{'address_components': [{'long_name': '700016', 'types': ['postal_code']}]}]
+
+    def count(self, method):
+        return sum(1 for call in self.calls if call[0] == method)
+
+
+@pytest.fixture
+def maps(root_app, monkeypatch):
+    maps = FakeMaps()
+    monkeypatch.setattr(root_app.maps_clients, 'client', lambda: maps)
+    return maps
+
+
+def search(root_app, maps, **params):
+    query = dict({'query': 'sweets', 'locations': json.dumps(list(maps.locations)), 'radius': 3000}, **params)
+    response = root_app.app.test_client().get('/api/search', query_string=query)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_default_search_makes_the_same_calls_and_returns_the_same_results(root_app, maps):
+    data = search(root_app, maps)
+
+    assert set(data) == {'results', 'next_page_token'}
+    # One nearby page per location and at most a details call per place it
+    # found, fewer when the other location's call has already cached it; no
+    # further pages, text search or reverse geocoding
+    assert maps.count('geocode') == 2
+    assert [call for call in maps.calls if call[0] == 'places_nearby'] == [('places_nearby', None)] * 2
+    assert 3 <= maps.count('place') <= 6
+    assert maps.count('places') == maps.count('reverse_geocode') == 0
+
+    results = data['results']
+    assert all(set(result) == BASE_KEYS | {'postal_code'} for result in results)
+    # Nothing is clipped to the radius or filtered for relevance, and each
+    # location keeps its own copy of a place they both found
+    assert sorted(result['business_name'] for result in results) == [
+        'Balaram Mullick', 'Balaram Mullick', 'Far Sweets', 'Far Sweets', 'Ganguram Sweets', 'Ganguram Sweets']
+    assert [result['distance'] for result in results] == sorted(result['distance'] for result in results)
+    assert results[0] == {
+        'business_name': 'Ganguram Sweets', 'address': 'Park Street, Kolkata 700016', 'phone': '', 'website': '',
+        'distance': 0.22, 'opening_hours': [], 'postal_code': '700016',
+        'google_maps_url': f'https://www.google.com/maps/place/?q=place_id:sweets-{maps.run}'}
+
+
+def test_default_exact_pincode_search_filters_by_address_only(root_app, maps):
+    maps.locations = {'700016': (22.5500, 88.3500)}
+
+    data = search(root_app, maps, exactPincodeSearch='true')
+
+    assert [result['business_name'] for result in data['results']] == ['Ganguram Sweets']
+    assert maps.count('reverse_geocode') == 0
+
+
+def test_thorough_search_is_opt_in(root_app, maps):
+    data = search(root_app, maps, thorough='true')
+
+    assert maps.count('places') == 2
+    assert ('places_nearby', maps.page_token) in maps.calls
+    # Clipped to the radius, kept to relevant places and deduplicated across locations
+    assert sorted(result['business_name'] for result in data['results']) == [
+        'Ganguram Sweets', 'Page Two Sweets', 'Text Sweets']
+    assert data['candidates']['out_of_radius'] == 2
+
+
+def test_stream_sends_the_default_results(root_app, maps):
+    expected = search(root_app, maps)['results']
+    maps.calls.clear()
+
+    query = {'query': 'sweets', 'locations': json.dumps(list(maps.locations)), 'radius': 3000}
+    body = root_app.app.test_client().get('/api/search/stream', query_string=query).get_data(as_text=True)
+    events = [(block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+              for block in body.strip().split('\n\n')]
+
+    streamed = [data for event, data in events if event == 'result']
+    assert sorted(streamed, key=lambda result: result['distance']) == expected
+    assert events[-1][0] == 'summary' and events[-1][1]['total'] == len(expected)
+    assert maps.count('places') == 0
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+
+import templates
+from templates import CompiledTemplate, TemplateCache, TemplateError, load_template
+
+
+def create_email_templates(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS email_templates (
+            id INTEGER PRIMARY KEY, name VARCHAR(255), subject VARCHAR(255), content TEXT,
+            variables JSON, created_at DATETIME, updated_at DATETIME
+        )
+    ''')
+    conn.commit()
+    return conn
+
+
+def test_compiles_distinct_variables_and_escapes_literal_braces():
+    template = CompiledTemplate('Hi {{ name }}, {"json": true} {{name}} {{ 1 }}')
+
+    assert template.variables == ('name', '1')
+    assert template.render({'name': 'Asha', '1': 'x'}) == 'Hi Asha, {"json": true} Asha x'
+
+
+def test_render_batch_fills_defaults_and_reports_missing_rows():
+    template = CompiledTemplate('{{ name }} at {{ address }}: {{ offer }}', {'offer': '10% off'})
+    rows = [
+        {'business_name': 'A', 'address': 'Park Street', 'rating': 4.5},
+        {'business_name': 'B', 'address': ''},
+        {'business_name': 'C', 'address': 'Lake Town', 'offer': '20% off'},
+    ]
+
+    batch = template.render_batch(rows, mapping={'name': 'business_name'})
+
+    assert batch.messages == ['A at Park Street: 10% off', None, 'C at Lake Town: 20% off']
+    assert batch.missing == {'address': [1]}
+
+
+def test_render_batch_formats_values_that_are_not_strings():
+    template = CompiledTemplate('{{ rating }} / {{ emails }}')
+
+    batch = template.render_batch([{'rating': 4.5, 'emails': ['a@x.com', 'b@x.com']}])
+
+    assert batch.messages == ['4.5 / a@x.com, b@x.com']
+
+
+def test_a_variable_no_row_has_fails_the_batch():
+    template = CompiledTemplate('Hi {{ name }}')
+
+    with pytest.raises(TemplateError):
+        template.render_batch([{'phone': '1'}, {'phone': '2'}])
+    # A default covers it
+    assert template.render_batch([{'phone': '1'}], defaults={'name': 'there'}).messages == ['Hi there']
+
+
+def test_render_all_batches_any_iterable():
+    template = CompiledTemplate('#{{ n }}')
+
+    batches = list(template.render_all(({'n': i} for i in range(5)), batch_size=2))
+
+    assert [len(batch.messages) for batch in batches] == [2, 2, 1]
+    assert [message for batch in batches for message in batch.messages] == [f'#{i}' for i in range(5)]
+
+
+def test_load_template_recompiles_after_an_edit(tmp_path):
+    path = str(tmp_path / 'templates.db')
+    conn = create_email_templates(path)
+    conn.execute("INSERT INTO email_templates VALUES (1, 't', 'For {{ name }}', 'Hello {{ name }}', "
+                 "'{\"name\": \"there\"}', '2024-01-01', '2024-01-01')")
+    conn.commit()
+    cache = TemplateCache(max_entries=2)
+
+    subject = load_template('email', 1, 'subject', path=path, cache=cache)
+    assert load_template('email', 1, 'subject', path=path, cache=cache) is subject
+    assert subject.render({}) == 'For there'
+
+    conn.execute("UPDATE email_templates SET subject = 'To {{ name }}', updated_at = '2024-01-02' WHERE id = 1")
+    conn.commit()
+    assert load_template('email', 1, 'subject', path=path, cache=cache).render({'name': 'Asha'}) == 'To Asha'
+    assert cache.get_stats() == {'hits': 1, 'misses': 2, 'entries': 2}
+
+
+@pytest.mark.parametrize('kind, template_id, field', [
+    ('email', 99, 'content'), ('sms', 1, 'content'), ('whatsapp', 1, 'subject'), ('email', 1, 'name'),
+])
+def test_load_template_rejects_unknown_templates(tmp_path, kind, template_id, field):
+    path = str(tmp_path / 'templates.db')
+    create_email_templates(path).close()
+
+    with pytest.raises(TemplateError):
+        load_template(kind, template_id, field, path=path, cache=TemplateCache())
+
+
+def test_send_emails_renders_but_does_not_claim_delivery(root_app):
+    conn = create_email_templates(templates.MESSAGE_DB_PATH)
+    conn.execute("INSERT OR REPLACE INTO email_templates VALUES (7, 't', 'Offer for {{ name }}', "
+                 "'Dear {{ name }}', NULL, '2024-01-01', '2024-01-01')")
+    conn.commit()
+    client = root_app.app.test_client()
+
+    response = client.post('/api/send-emails', json={
+        'templateId': 7,
+        'recipients': [{'email': 'a@x.com', 'name': 'A'}, {'email': 'b@x.com', 'name': ''}]
+    })
+
+    assert response.status_code == 501
+    assert response.get_json()['rendered'] == 1
+    assert response.get_json()['missingValues'] == ['b@x.com']
+    assert client.post('/api/send-emails', json={'templateId': 8}).status_code == 400
@@ -0,0 +1,79 @@
+import threading
+
+from geo import calculate_distance
+from tiling import Tile, summarize_tiles, tiled_search
+
+CENTER = (22.5500, 88.3500)
+
+
+def place(place_id, lat, lng):
+    return {'place_id': place_id, 'geometry': {'location': {'lat': lat, 'lng': lng}}}
+
+
+class FakeNearby:
+    """Returns at most cap of the places inside a tile, like the API's result cap."""
+
+    def __init__(self, places, cap):
+        self.places = places
+        self.cap = cap
+        self.tiles = []
+        self._lock = threading.Lock()
+
+    def __call__(self, lat, lng, radius):
+        with self._lock:
+            self.tiles.append((lat, lng, radius))
+        inside = [p for p in self.places
+                  if calculate_distance(lat, lng, p['geometry']['location']['lat'],
+                                        p['geometry']['location']['lng']) <= radius]
+        return inside[:self.cap], 1
+
+
+def test_children_cover_the_parent():
+    tile = Tile(*CENTER, 2000)
+
+    children = tile.split()
+
+    assert [child.depth for child in children] == [1] * 4
+    # Points on the parent's edge and inside it each fall in some child
+    for bearing_lat, bearing_lng in [(1, 0), (0, 1), (-1, 0), (0, -1), (0.7, 0.7), (0.3, -0.2)]:
+        lat = CENTER[0] + bearing_lat * 0.99 * tile.radius / 111320
+        lng = CENTER[1] + bearing_lng * 0.99 * tile.radius / (111320 * 0.9237)
+        assert any(calculate_distance(child.lat, child.lng, lat, lng) <= child.radius for child in children)
+
+
+def test_only_saturated_tiles_are_split():
+    # A dense block north-east of the center and a few places elsewhere
+    dense = [place(f'dense-{i}', 22.5560 + i * 0.0002, 88.3560) for i in range(8)]
+    sparse = [place('west', 22.5500, 88.3400), place('south', 22.5420, 88.3500)]
+    nearby = FakeNearby(dense + sparse, cap=5)
+
+    places, tiles = tiled_search(*CENTER, 2000, nearby, cap=5, min_radius=100, max_depth=2)
+
+    assert sorted(p['place_id'] for p in places) == sorted(p['place_id'] for p in dense + sparse)
+    assert tiles[0]['saturated'] and tiles[0]['subdivided']
+    # Only the children that were still full were split again
+    children = [tile for tile in tiles if tile['depth'] == 1]
+    assert len(children) == 4
+    assert sum(tile['subdivided'] for tile in children) == sum(tile['saturated'] for tile in children) >= 1
+    assert len(tiles) == 1 + 4 + 4 * sum(tile['subdivided'] for tile in children)
+    assert summarize_tiles(tiles)['api_calls'] == len(nearby.tiles) == len(tiles)
+
+
+def test_splitting_stops_at_the_minimum_radius_and_clips_to_the_circle():
+    inside = [place(f'in-{i}', CENTER[0], CENTER[1] + i * 0.00001) for i in range(10)]
+    outside = [place('corner', 22.5580, 88.3580)]
+    nearby = FakeNearby(inside + outside, cap=5)
+
+    places, tiles = tiled_search(*CENTER, 1000, nearby, cap=5, min_radius=800)
+
+    assert summarize_tiles(tiles) == {'tiles': 1, 'api_calls': 1, 'subdivided': 0, 'max_depth': 0}
+    assert len(places) == 5 and all(p['place_id'].startswith('in-') for p in places)
+
+
+def test_a_failing_tile_is_reported_not_raised():
+    def search_tile(lat, lng, radius):
+        raise RuntimeError('INVALID_REQUEST')
+
+    places, tiles = tiled_search(*CENTER, 1000, search_tile)
+
+    assert places == [] and tiles[0]['api_calls'] == 0
@@ -0,0 +1,106 @@
+import pytest
+
+from outbox import Outbox
+from templates import CompiledTemplate
+from whatsapp import CampaignDispatcher, campaign_messages, template_messages
+
+
+class FakeResponse:
+    def __init__(self, status_code, data, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+
+class FakeSession:
+    """Answers each recipient with its scripted responses in turn, then 200s."""
+
+    def __init__(self, scripts=None):
+        self.scripts = scripts or {}
+        self.posts = []
+
+    def post(self, url, headers, json, timeout):
+        self.posts.append((url, headers['Authorization'], json['to']))
+        script = self.scripts.get(json['to'])
+        if script:
+            return script.pop(0)
+        return FakeResponse(200, {'messages': [{'id': f"wamid.{json['to']}"}]})
+
+
+@pytest.fixture
+def dispatcher(tmp_path, monkeypatch):
+    monkeypatch.delenv('WHATSAPP_TOKEN', raising=False)
+    dispatcher = CampaignDispatcher(Outbox(str(tmp_path / 'messages.db'), lease_seconds=0, max_attempts=3),
+                                    api_base='https://graph.test/v17.0', backoff_max=0, token_wait_seconds=0)
+    dispatcher.session = FakeSession()
+    # Sent by run_once() from the test, not by the background thread
+    dispatcher.start = lambda: None
+    return dispatcher
+
+
+def statuses(dispatcher, campaign_id):
+    return {result['number']: result['status'] for result in dispatcher.get(campaign_id, details=True)['results']}
+
+
+def test_campaign_messages_dedupe_and_fail_bad_numbers():
+    messages = list(campaign_messages(['98300 12345', '919830012345', '12'], 'Hi'))
+
+    assert [message['recipient'] for message in messages] == ['919830012345', '12']
+    assert messages[1]['status'] == 'failed'
+
+
+def test_template_messages_queue_rows_missing_values_as_failed():
+    compiled = CompiledTemplate('Hi {{ name }}')
+    rows = [{'phone': '9830012345', 'name': 'A'}, {'phone': '9830012346', 'name': ''}]
+
+    messages = list(template_messages(compiled, rows))
+
+    assert messages[0] == {'recipient': '919830012345', 'body': 'Hi A', 'variables': {'name': 'A'}}
+    assert messages[1]['status'] == 'failed' and messages[1]['error'] == 'Missing values for name'
+
+
+def test_sends_and_retries_by_response(dispatcher):
+    dispatcher.session.scripts = {
+        '919830000002': [FakeResponse(429, {}, {'Retry-After': '0'})],
+        '919830000003': [FakeResponse(400, {'error': {'message': 'Invalid parameter', 'code': 100}})],
+    }
+    campaign_id = dispatcher.submit('sender', 'token', ['9830000001', '9830000002', '9830000003'], 'Hi')
+
+    dispatcher.run_once()
+    assert statuses(dispatcher, campaign_id) == {
+        '919830000001': 'success', '919830000002': 'pending', '919830000003': 'failed'}
+
+    dispatcher.run_once()
+    assert statuses(dispatcher, campaign_id)['919830000002'] == 'success'
+    assert dispatcher.get(campaign_id)['status'] == 'completed'
+
+
+def test_messages_without_a_token_wait_for_one(dispatcher):
+    campaign_id = dispatcher.submit('sender', None, ['9830000001'], 'Hi')
+
+    dispatcher.run_once()
+    campaign = dispatcher.get(campaign_id, details=True)
+    # Put back, not failed, and nothing was posted
+    assert campaign['pending'] == 1 and campaign['failed'] == 0
+    assert campaign['results'][0]['error'] == 'No WhatsApp access token for sender'
+    assert dispatcher.session.posts == []
+
+    # As after a restart: the campaign is resubmitted with its token
+    dispatcher.submit('sender', 'token', ['9830000001'], 'Hi', campaign_id=campaign_id)
+    dispatcher.run_once()
+    assert statuses(dispatcher, campaign_id) == {'919830000001': 'success'}
+    assert dispatcher.session.posts == [('https://graph.test/v17.0/sender/messages', 'Bearer token',
+                                         '919830000001')]
+
+
+def test_messages_without_a_token_fail_after_max_attempts(dispatcher):
+    campaign_id = dispatcher.submit('sender', None, ['9830000001'], 'Hi')
+
+    for _ in range(4):
+        dispatcher.run_once()
+
+    failure, = dispatcher.get(campaign_id)['failures']
+    assert failure['error'].startswith('Gave up after 3 attempts')
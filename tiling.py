@@ -0,0 +1,122 @@
+"""
+Adaptive tiling for searches wider than one Nearby Search can cover.
+
+Nearby Search never returns more than 60 results (three pages of 20), so a
+single query over a large radius in a dense city silently drops most of
+the businesses in it. tiled_search() starts with the whole circle as one
+tile and only splits tiles that came back full: each is replaced by four
+overlapping child circles covering its quadrants (a quadtree), one level
+at a time, with every tile of a level searched concurrently. Sparse tiles
+are never split, so quota is only spent where the cap was actually hit.
+Results are deduplicated by place_id and clipped to the original circle.
+"""
+import math
+import os
+
+from concurrency import bounded_map
+from geo import distances_from
+
+# The most results the Places API returns for one query, across all pages
+RESULT_CAP = 60
+TILE_MIN_RADIUS = int(os.getenv('TILE_MIN_RADIUS', 500))  # meters
+TILE_MAX_DEPTH = int(os.getenv('TILE_MAX_DEPTH', 3))
+
+METERS_PER_DEGREE_LAT = 111320
+
+
+class Tile:
+    """One circle of the search plan; radius is in meters."""
+
+    __slots__ = ('lat', 'lng', 'radius', 'depth')
+
+    def __init__(self, lat, lng, radius, depth=0):
+        self.lat = lat
+        self.lng = lng
+        self.radius = radius
+        self.depth = depth
+
+    def split(self):
+        """
+        Return the four child tiles covering this tile's quadrants.
+
+        Each child is the circle around one quadrant of the tile's bounding
+        square, so together they cover the parent with some overlap.
+        """
+        offset = self.radius / 2
+        dlat = offset / METERS_PER_DEGREE_LAT
+        dlng = offset / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(self.lat)), 1e-6))
+        radius = self.radius / math.sqrt(2)
+        return [
+            Tile(self.lat + sign_lat * dlat, self.lng + sign_lng * dlng, radius, self.depth + 1)
+            for sign_lat in (1, -1) for sign_lng in (1, -1)
+        ]
+
+
+def tiled_search(lat, lng, radius, search_tile, cap=RESULT_CAP, min_radius=TILE_MIN_RADIUS,
+                 max_depth=TILE_MAX_DEPTH, max_workers=None, host=None):
+    """
+    Cover a circle of radius meters around (lat, lng) with adaptive tiles.
+
+    search_tile(lat, lng, radius) must return (places, api_calls) for one
+    tile, fetching all of its pages. A tile that returns cap results or more
+    is split, unless its children would be smaller than min_radius or
+    deeper than max_depth. host is passed on to bounded_map for rate
+    limiting; leave it unset if search_tile already takes a host slot.
+
+    Returns (places, tiles): the unique places inside the circle, in the
+    order they were found, and one report per tile searched.
+    """
+    def run(tile):
+        try:
+            places, calls = search_tile(tile.lat, tile.lng, tile.radius)
+        except Exception as e:
+            print(f"Error searching tile {tile.lat},{tile.lng}: {str(e)}")
+            places, calls = [], 0
+        return tile, places, calls
+
+    found = {}
+    tiles = []
+    level = [Tile(lat, lng, radius)]
+    while level:
+        next_level = []
+        for tile, places, calls in bounded_map(run, level, host=host, max_workers=max_workers):
+            saturated = len(places) >= cap
+            subdivide = (saturated and tile.depth < max_depth and
+                         tile.radius / math.sqrt(2) >= min_radius)
+            new = 0
+            for place in places:
+                place_id = place.get('place_id')
+                if place_id and place_id not in found:
+                    found[place_id] = place
+                    new += 1
+            tiles.append({
+                'lat': round(tile.lat, 6),
+                'lng': round(tile.lng, 6),
+                'radius': round(tile.radius),
+                'depth': tile.depth,
+                'api_calls': calls,
+                'results': len(places),
+                'new_results': new,
+                'saturated': saturated,
+                'subdivided': subdivide
+            })
+            if subdivide:
+                next_level.extend(tile.split())
+        level = next_level
+
+    # Child tiles reach past the original circle; drop what they found out there
+    places = [place for place in found.values() if place.get('geometry')]
+    distances = distances_from((lat, lng), [
+        (place['geometry']['location']['lat'], place['geometry']['location']['lng']) for place in places
+    ])
+    return [place for place, distance in zip(places, distances) if distance <= radius], tiles
+
+
+def summarize_tiles(tiles):
+    """Totals for a tile report: tiles searched, API calls spent, tiles split."""
+    return {
+        'tiles': len(tiles),
+        'api_calls': sum(tile['api_calls'] for tile in tiles),
+        'subdivided': sum(1 for tile in tiles if tile['subdivided']),
+        'max_depth': max((tile['depth'] for tile in tiles), default=0)
+    }
@@ -0,0 +1,293 @@
+"""
+Background WhatsApp campaigns sent through the Cloud (Graph) API.
+
+/api/send-whatsapp used to post to every number in turn from the request
+handler, with a fresh connection each time, so a campaign of a few thousand
+numbers held a worker until the proxy gave up on it. A campaign is now
+written to the message_logs outbox (see outbox.py) and its id returned
+straight away; the dispatcher's worker drains the outbox in the background:
+
+- every message goes through one pooled keep-alive session,
+- up to WHATSAPP_MAX_WORKERS requests are in flight at once, but each
+  sender number has its own token bucket, so its sends stay within the
+  API's per-number throughput (WHATSAPP_SEND_RATE messages per second),
+- numbers are deduplicated, so nobody is sent the same campaign twice
+  inside the API's per-recipient pair rate limit,
+- 429s, 5xx, connection errors and the API's rate-limit error codes are
+  retried with jittered exponential backoff, honouring Retry-After; the
+  retry waits in the outbox, not in a worker.
+
+Because the campaign is in the outbox, a restart picks up where it left off,
+and more worker processes can be added with
+
+    python whatsapp.py worker
+
+each claiming its own batches. The token buckets are per process, so with
+several workers set WHATSAPP_SEND_RATE to the number's limit divided by
+the number of processes. A token given with a campaign is only known to
+the process that received it. A worker without a token for a message's
+sender puts it back for WHATSAPP_TOKEN_WAIT_SECONDS, so a process that has
+the token, or this one once the campaign is resubmitted after a restart,
+can send it; OUTBOX_MAX_ATTEMPTS bounds how long it waits. Set
+WHATSAPP_TOKEN for every process to avoid the wait. WHATSAPP_API_BASE
+points the dispatcher at another server, e.g. a local stub of the Graph
+API.
+"""
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import requests
+
+from concurrency import bounded_map
+from maps_clients import pooled_session
+from outbox import OUTBOX_BATCH_SIZE, OutboxWorker, outbox as default_outbox
+from quota import TokenBucket
+
+WHATSAPP_API_BASE = os.getenv('WHATSAPP_API_BASE', 'https://graph.facebook.com/v17.0').rstrip('/')
+# The Cloud API's default throughput is 80 messages per second per business number
+WHATSAPP_SEND_RATE = float(os.getenv('WHATSAPP_SEND_RATE', 80))
+WHATSAPP_SEND_BURST = float(os.getenv('WHATSAPP_SEND_BURST', 20))
+WHATSAPP_MAX_WORKERS = int(os.getenv('WHATSAPP_MAX_WORKERS', 16))
+WHATSAPP_TIMEOUT = float(os.getenv('WHATSAPP_TIMEOUT', 15))
+WHATSAPP_MAX_RETRIES = int(os.getenv('WHATSAPP_MAX_RETRIES', 5))
+WHATSAPP_BACKOFF_BASE = float(os.getenv('WHATSAPP_BACKOFF_BASE', 1.0))
+WHATSAPP_BACKOFF_MAX = float(os.getenv('WHATSAPP_BACKOFF_MAX', 30.0))
+# How long an idle worker waits before looking for due retries again
+WHATSAPP_POLL_SECONDS = float(os.getenv('WHATSAPP_POLL_SECONDS', 1.0))
+# How long a message waits for a worker that has its sender's token
+WHATSAPP_TOKEN_WAIT_SECONDS = float(os.getenv('WHATSAPP_TOKEN_WAIT_SECONDS', 60.0))
+
+MESSAGE_TYPE = 'whatsapp'
+
+# Graph error codes that mean "slow down" rather than "this message is bad":
+# app and account rate limits, per-number throughput and per-recipient pair rate
+RETRYABLE_ERROR_CODES = {4, 80007, 130429, 131056}
+
+
+def normalize_number(number):
+    """
+    A number as the API expects it, 91 followed by ten digits, or None.
+
+    Numbers without the country code are assumed to be Indian.
+    """
+    cleaned = ''.join(filter(str.isdigit, str(number)))
+    if not cleaned.startswith('91'):
+        cleaned = '91' + cleaned
+    return cleaned if len(cleaned) == 12 else None
+
+
+def campaign_messages(numbers, message):
+    """
+    Outbox rows for message to numbers: one per distinct valid number, and
+    one already failed for each invalid one.
+    """
+    return recipient_messages((number, message, None, None) for number in numbers)
+
+
+def recipient_messages(recipients, seen=None):
+    """
+    Outbox rows for (number, body, variables, error) tuples, deduplicated by
+    number. A message with an error, one that couldn't be rendered, is
+    queued as failed.
+    """
+    seen = set() if seen is None else seen
+    for number, body, variables, error in recipients:
+        cleaned = normalize_number(number) if number else None
+        if cleaned is None:
+            yield {
+                'recipient': str(number or ''),
+                'body': body,
+                'status': 'failed',
+                'error': 'Invalid phone number format - must be 10 digits with country code 91'
+            }
+        elif cleaned in seen:
+            continue
+        elif error:
+            seen.add(cleaned)
+            yield {'recipient': cleaned, 'body': body, 'status': 'failed', 'error': error}
+        else:
+            seen.add(cleaned)
+            yield {'recipient': cleaned, 'body': body, 'variables': variables}
+
+
+def template_messages(compiled, rows, number_key='phone', mapping=None, defaults=None):
+    """
+    Outbox rows for a compiled template (templates.CompiledTemplate) rendered
+    over rows, such as a saved list's results, a batch at a time.
+
+    Each row's number is read from number_key. Rows missing a variable are
+    queued as failed, and each message keeps the values it was rendered with.
+    Raises templates.TemplateError for a batch the template can't render.
+    """
+    mapping = mapping or {}
+    fallbacks = dict(compiled.defaults, **(defaults or {}))
+    keys = [(name, mapping.get(name, name), fallbacks.get(name)) for name in compiled.variables]
+
+    def used(row):
+        values = {}
+        for name, key, fallback in keys:
+            value = row.get(key)
+            values[name] = fallback if value is None or value == '' else value
+        return values
+
+    def recipients():
+        for batch in compiled.render_all(rows, mapping, defaults):
+            errors = {}
+            for name, indices in batch.missing.items():
+                for index in indices:
+                    errors.setdefault(index, []).append(name)
+            for index, (row, body) in enumerate(zip(batch.rows, batch.messages)):
+                if body is None:
+                    yield row.get(number_key), None, None, f"Missing values for {', '.join(errors[index])}"
+                else:
+                    yield row.get(number_key), body, used(row), None
+
+    return recipient_messages(recipients())
+
+
+class CampaignDispatcher(OutboxWorker):
+    """Queues campaigns in the outbox and sends them, rate limited per sender number."""
+
+    def __init__(self, outbox=default_outbox, api_base=WHATSAPP_API_BASE, rate=WHATSAPP_SEND_RATE,
+                 burst=WHATSAPP_SEND_BURST, max_workers=WHATSAPP_MAX_WORKERS, timeout=WHATSAPP_TIMEOUT,
+                 max_retries=WHATSAPP_MAX_RETRIES, backoff_base=WHATSAPP_BACKOFF_BASE,
+                 backoff_max=WHATSAPP_BACKOFF_MAX, batch_size=OUTBOX_BATCH_SIZE,
+                 poll_seconds=WHATSAPP_POLL_SECONDS, token_wait_seconds=WHATSAPP_TOKEN_WAIT_SECONDS):
+        super().__init__(outbox, batch_size, poll_seconds)
+        self.token_wait_seconds = token_wait_seconds
+        self.api_base = api_base.rstrip('/')
+        self.rate = rate
+        self.burst = burst
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = pooled_session(max_workers)
+        self._buckets = {}
+        # Tokens given with campaigns, by sender number; WHATSAPP_TOKEN covers the rest
+        self._tokens = {}
+
+    def _bucket(self, sender_number):
+        with self._lock:
+            bucket = self._buckets.get(sender_number)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[sender_number] = bucket
+            return bucket
+
+    def _token(self, sender_number):
+        return self._tokens.get(sender_number) or os.getenv('WHATSAPP_TOKEN')
+
+    def submit(self, sender_number, token, numbers, message, campaign_id=None):
+        """
+        Queue message to numbers and make sure the worker is running.
+
+        Submitting again with the same campaign_id adds no duplicates.
+        Returns the campaign id.
+        """
+        return self.submit_messages(sender_number, token, campaign_messages(numbers, message), campaign_id)
+
+    def submit_messages(self, sender_number, token, messages, campaign_id=None, template_id=None):
+        """Queue outbox rows (see recipient_messages()) as one campaign; returns its id."""
+        if token:
+            self._tokens[sender_number] = token
+        campaign_id, _ = self.outbox.enqueue(MESSAGE_TYPE, messages, campaign_id=campaign_id,
+                                             sender=sender_number, template_id=template_id)
+        self.start()
+        self.wake()
+        return campaign_id
+
+    def get(self, campaign_id, details=False):
+        """A campaign's progress, or None if there's no such campaign."""
+        return self.outbox.campaign(campaign_id, details=details)
+
+    def run_once(self):
+        """Claim one batch, send it and write back the results; returns the batch size."""
+        batch = self.outbox.claim(self.owner, MESSAGE_TYPE, self.batch_size)
+        if not batch:
+            return 0
+
+        sendable = [row for row in batch if self._token(row['sender'])]
+        # Another worker, or this one after the campaign is resubmitted, may
+        # have the token; the claim counted an attempt, so this can't repeat forever
+        retry_at = datetime.utcnow() + timedelta(seconds=self.token_wait_seconds)
+        results = [{'id': row['id'], 'status': 'retry', 'retry_at': retry_at,
+                    'error': f"No WhatsApp access token for {row['sender']}"}
+                   for row in batch if not self._token(row['sender'])]
+        results.extend(bounded_map(self._send, sendable, max_workers=self.max_workers))
+        self.outbox.complete(self.owner, results)
+        return len(batch)
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # Full jitter, so the messages that were throttled together don't retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _send(self, row):
+        """One attempt at one outbox row; returns its result for Outbox.complete()."""
+        headers = {'Authorization': f"Bearer {self._token(row['sender'])}", 'Content-Type': 'application/json'}
+        payload = {
+            'messaging_product': 'whatsapp',
+            'to': row['recipient'],
+            'type': 'text',
+            'text': {'body': row['body']},
+            # Echoed back in status webhooks, so they can be matched to the row
+            'biz_opaque_callback_data': row['idempotency_key']
+        }
+        self._bucket(row['sender']).acquire()
+        retry_after = None
+        try:
+            response = self.session.post(f"{self.api_base}/{row['sender']}/messages", headers=headers,
+                                         json=payload, timeout=self.timeout)
+            try:
+                response_data = response.json()
+            except ValueError:
+                response_data = {}
+            if response.status_code == 200:
+                return {
+                    'id': row['id'],
+                    'status': 'sent',
+                    'provider_message_id': response_data.get('messages', [{}])[0].get('id', 'unknown')
+                }
+            error = response_data.get('error', {}) if isinstance(response_data, dict) else {}
+            error_message = error.get('message') or f'HTTP {response.status_code}'
+            retryable = (response.status_code == 429 or response.status_code >= 500 or
+                         error.get('code') in RETRYABLE_ERROR_CODES)
+            try:
+                retry_after = float(response.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                pass
+        except requests.RequestException as e:
+            error_message = str(e)
+            retryable = True
+
+        # attempts counts this one
+        if not retryable or row['attempts'] > self.max_retries:
+            logging.warning(f"WhatsApp send to {row['recipient']} failed: {error_message}")
+            return {'id': row['id'], 'status': 'failed', 'error': error_message}
+        return {
+            'id': row['id'],
+            'status': 'retry',
+            'error': error_message,
+            # The outbox keeps its times in UTC
+            'retry_at': datetime.utcnow() + timedelta(seconds=self._backoff(row['attempts'] - 1, retry_after))
+        }
+
+
+# Shared by every request handled by this process
+whatsapp_dispatcher = CampaignDispatcher()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'worker':
+        sys.exit('Usage: python whatsapp.py worker')
+    if not os.getenv('WHATSAPP_TOKEN'):
+        sys.exit('WHATSAPP_TOKEN must be set for a standalone worker')
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"WhatsApp outbox worker {whatsapp_dispatcher.owner} started")
+    whatsapp_dispatcher.run()